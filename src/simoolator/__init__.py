@@ -1,4 +1,4 @@
-from simoolator.cow import Cow
-from simoolator.herd import Herd
-from simoolator.model_registry import ModelRegistry
+from simoolator.cow import CompactCow, Cow
+from simoolator.herd import Herd
+from simoolator.model_registry import ModelRegistry
 from simoolator.utils import print_nested_dict_tree
\ No newline at end of file
@@ -0,0 +1,490 @@
+import math
+from typing import Any, Dict, Iterable, List, Sequence, Tuple
+
+try:
+    import numpy as np
+except ImportError: # numpy is only required for vectorized aggregation
+    np = None
+
+DEFAULT_STATS = ("count", "mean", "std", "min", "max")
+_NUMBER_TYPES = (bool, int, float)
+
+
+def _is_number(value: Any) -> bool:
+    if isinstance(value, _NUMBER_TYPES):
+        return True
+    return np is not None and isinstance(value, np.number)
+
+
+class TDigest:
+    """
+    Mergeable sketch of a distribution for approximate quantiles.
+
+    Values are summarized by centroids (mean, weight). Centroids near the
+    tails of the distribution hold fewer values than those near the median,
+    so extreme quantiles stay accurate. Added values are buffered and merged
+    into the centroids in batches, with numpy when it is installed.
+    """
+    __slots__ = ("compression", "means", "weights", "_buffer")
+
+    def __init__(self, compression: int = 100) -> None:
+        """
+        Initialize an empty TDigest.
+
+        Args:
+            compression: Controls the number of centroids, about
+                         compression / 2. Higher values are more accurate.
+        """
+        if compression < 10:
+            raise ValueError("compression must be at least 10.")
+        self.compression = compression
+        self.means: List[float] = []
+        self.weights: List[float] = []
+        self._buffer: List[float] = []
+
+    def __getstate__(self) -> Tuple[int, List[float], List[float]]:
+        self._compress()
+        return self.compression, self.means, self.weights
+
+    def __setstate__(self, state: Tuple[int, List[float], List[float]]) -> None:
+        self.compression, self.means, self.weights = state
+        self._buffer = []
+
+    def add(self, value: float) -> None:
+        """
+        Add a value.
+
+        Args:
+            value: Value to add.
+        """
+        self._buffer.append(value)
+        if len(self._buffer) >= 10 * self.compression:
+            self._compress()
+
+    def add_many(self, values: Iterable[float]) -> None:
+        """
+        Add several values at once.
+
+        Args:
+            values: Values to add, a numpy array is not copied to a list.
+        """
+        if np is not None:
+            values = np.asarray(values, dtype=float)
+            self._compress(values, np.ones(len(values)))
+        else:
+            self._buffer.extend(values)
+            self._compress()
+
+    def merge(self, other: "TDigest") -> None:
+        """
+        Add the values summarized by another TDigest.
+
+        Args:
+            other: TDigest to merge into self.
+        """
+        other._compress()
+        self._compress(other.means, other.weights)
+
+    def _k(self, q: float) -> float:
+        # Scale function k1, centroids span at most one unit of k
+        return self.compression / (2 * math.pi) * math.asin(2 * q - 1)
+
+    def _compress(self, means: Sequence[float] = (), weights: Sequence[float] = ()) -> None:
+        """
+        Merge the buffer and the given centroids into the centroids.
+        """
+        if self._buffer:
+            means = list(means) + self._buffer
+            weights = list(weights) + [1.0] * len(self._buffer)
+            self._buffer = []
+        if not len(means):
+            return
+
+        if np is not None:
+            means = np.concatenate([np.asarray(self.means, dtype=float),
+                                    np.asarray(means, dtype=float)])
+            weights = np.concatenate([np.asarray(self.weights, dtype=float),
+                                      np.asarray(weights, dtype=float)])
+            order = np.argsort(means, kind="stable")
+            means, weights = means[order], weights[order]
+            cumulative = np.cumsum(weights)
+            q = (cumulative - weights / 2) / cumulative[-1]
+            k = np.floor(self.compression / (2 * np.pi) * np.arcsin(2 * q - 1))
+            starts = np.flatnonzero(np.concatenate([[True], k[1:] != k[:-1]]))
+            merged_weights = np.add.reduceat(weights, starts)
+            self.means = (np.add.reduceat(means * weights, starts) / merged_weights).tolist()
+            self.weights = merged_weights.tolist()
+            return
+
+        centroids = sorted(zip(list(self.means) + list(means),
+                               list(self.weights) + list(weights)))
+        total = sum(weight for _, weight in centroids)
+        self.means, self.weights = [], []
+        seen = 0.0
+        current_k = None
+        for mean, weight in centroids:
+            k = math.floor(self._k((seen + weight / 2) / total))
+            if k == current_k:
+                merged_weight = self.weights[-1] + weight
+                self.means[-1] += (mean - self.means[-1]) * weight / merged_weight
+                self.weights[-1] = merged_weight
+            else:
+                self.means.append(mean)
+                self.weights.append(weight)
+                current_k = k
+            seen += weight
+
+    def quantile(self, q: float, minimum: float, maximum: float) -> float:
+        """
+        Return the approximate q-th quantile.
+
+        Args:
+            q: Quantile between 0 and 1.
+            minimum: Smallest value added, the 0th quantile.
+            maximum: Largest value added, the 1st quantile.
+        """
+        self._compress()
+        if not self.weights:
+            return math.nan
+        total = sum(self.weights)
+        rank = q * total
+        # Interpolate between centroid means, each centroid is centred on
+        # its cumulative weight
+        previous_rank, previous_mean = 0.0, minimum
+        seen = 0.0
+        for mean, weight in zip(self.means, self.weights):
+            centre = seen + weight / 2
+            if rank <= centre:
+                if centre == previous_rank:
+                    return mean
+                fraction = (rank - previous_rank) / (centre - previous_rank)
+                return previous_mean + fraction * (mean - previous_mean)
+            previous_rank, previous_mean = centre, mean
+            seen += weight
+        if total == previous_rank:
+            return maximum
+        fraction = (rank - previous_rank) / (total - previous_rank)
+        return previous_mean + fraction * (maximum - previous_mean)
+
+    def cdf(self, x: float, minimum: float, maximum: float) -> float:
+        """
+        Return the approximate fraction of values less than or equal to x.
+
+        Args:
+            x: Value to evaluate.
+            minimum: Smallest value added.
+            maximum: Largest value added.
+        """
+        self._compress()
+        if not self.weights or x < minimum:
+            return 0.0
+        if x >= maximum:
+            return 1.0
+        total = sum(self.weights)
+        previous_rank, previous_mean = 0.0, minimum
+        seen = 0.0
+        for mean, weight in zip(self.means, self.weights):
+            centre = seen + weight / 2
+            if x < mean:
+                fraction = (x - previous_mean) / (mean - previous_mean)
+                return (previous_rank + fraction * (centre - previous_rank)) / total
+            previous_rank, previous_mean = centre, mean
+            seen += weight
+        fraction = (x - previous_mean) / (maximum - previous_mean)
+        return (previous_rank + fraction * (total - previous_rank)) / total
+
+
+class StreamingStats:
+    """
+    Mergeable statistics of a stream of numbers.
+
+    Count, mean and variance are updated with Welford's algorithm, batches
+    and other StreamingStats are combined with Chan's parallel formula.
+    Quantiles and histograms are approximated from a TDigest.
+    """
+    __slots__ = ("count", "mean", "m2", "min", "max", "digest")
+
+    def __init__(self, compression: int = 100) -> None:
+        """
+        Initialize empty statistics.
+
+        Args:
+            compression: Compression of the TDigest used for quantiles.
+        """
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = None
+        self.max = None
+        self.digest = TDigest(compression)
+
+    def __getstate__(self) -> Dict[str, Any]:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        for name, value in state.items():
+            setattr(self, name, value)
+
+    def add(self, value: float) -> None:
+        """
+        Add a value.
+
+        Args:
+            value: Value to add.
+        """
+        value = float(value)
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+        self.digest.add(value)
+
+    def _combine(self, count: int, mean: float, m2: float,
+                 minimum: float, maximum: float) -> None:
+        total = self.count + count
+        delta = mean - self.mean
+        self.m2 += m2 + delta * delta * self.count * count / total
+        self.mean += delta * count / total
+        self.count = total
+        self.min = minimum if self.min is None else min(self.min, minimum)
+        self.max = maximum if self.max is None else max(self.max, maximum)
+
+    def add_many(self, values: Iterable[float]) -> None:
+        """
+        Add several values at once, vectorized with numpy when installed.
+
+        Args:
+            values: Values to add.
+        """
+        if np is None:
+            for value in values:
+                self.add(value)
+            return
+        values = np.asarray(values, dtype=float).ravel()
+        if not len(values):
+            return
+        mean = float(values.mean())
+        self._combine(len(values), mean, float(((values - mean) ** 2).sum()),
+                      float(values.min()), float(values.max()))
+        self.digest.add_many(values)
+
+    def merge(self, other: "StreamingStats") -> None:
+        """
+        Add the values summarized by another StreamingStats, e.g. one from a
+        worker process or another shard.
+
+        Args:
+            other: StreamingStats to merge into self.
+        """
+        if not other.count:
+            return
+        self._combine(other.count, other.mean, other.m2, other.min, other.max)
+        self.digest.merge(other.digest)
+
+    @property
+    def variance(self) -> float:
+        """Sample variance, nan for fewer than two values."""
+        return self.m2 / (self.count - 1) if self.count > 1 else math.nan
+
+    def quantile(self, q: float) -> float:
+        """
+        Return the approximate q-th quantile.
+
+        Args:
+            q: Quantile between 0 and 1.
+        """
+        if not self.count:
+            return math.nan
+        return self.digest.quantile(q, self.min, self.max)
+
+    def histogram(self, bins: int = 10) -> Dict[str, List[float]]:
+        """
+        Return an approximate histogram with equal width bins between the
+        smallest and largest value.
+
+        Args:
+            bins: Number of bins.
+
+        Returns:
+            Dictionary with the bin "edges" and the "counts" in each bin.
+        """
+        if not self.count:
+            return {"edges": [], "counts": []}
+        width = (self.max - self.min) / bins
+        edges = [self.min + width * index for index in range(bins)] + [self.max]
+        cumulative = [self.digest.cdf(edge, self.min, self.max) * self.count
+                      for edge in edges[1:-1]]
+        cumulative = [0.0] + cumulative + [float(self.count)]
+        counts = [round(high - low, 6) for low, high in zip(cumulative, cumulative[1:])]
+        return {"edges": edges, "counts": counts}
+
+    def summary(self, stats: Sequence[str] = DEFAULT_STATS, bins: int = 10) -> Dict[str, Any]:
+        """
+        Return the requested statistics.
+
+        Args:
+            stats: Names of the statistics: "count", "sum", "mean",
+                   "variance", "std", "min", "max", "median", "histogram"
+                   or a percentile such as "p90" or "p99.9".
+            bins: Number of bins for "histogram".
+        """
+        summary = {}
+        for stat in stats:
+            if stat == "count":
+                summary[stat] = self.count
+            elif stat == "sum":
+                summary[stat] = self.mean * self.count
+            elif stat == "mean":
+                summary[stat] = self.mean if self.count else math.nan
+            elif stat == "variance":
+                summary[stat] = self.variance
+            elif stat == "std":
+                summary[stat] = math.sqrt(self.variance)
+            elif stat in ("min", "max"):
+                summary[stat] = getattr(self, stat)
+            elif stat == "median":
+                summary[stat] = self.quantile(0.5)
+            elif stat == "histogram":
+                summary[stat] = self.histogram(bins)
+            else:
+                summary[stat] = self.quantile(_parse_percentile(stat) / 100)
+        return summary
+
+
+def _parse_percentile(stat: str) -> float:
+    try:
+        percentile = float(stat[1:]) if stat.startswith("p") else None
+    except ValueError:
+        percentile = None
+    if percentile is None or not 0 <= percentile <= 100:
+        raise ValueError(
+            f"Unknown statistic {stat!r}. Choose from count, sum, mean, variance, "
+            "std, min, max, median, histogram or a percentile such as 'p90'."
+            )
+    return percentile
+
+
+def validate_stats(stats: Sequence[str]) -> None:
+    """
+    Raise a ValueError if stats holds an unknown statistic.
+
+    Args:
+        stats: Names of statistics for StreamingStats.summary.
+    """
+    known = ("count", "sum", "mean", "variance", "std", "min", "max", "median", "histogram")
+    for stat in stats:
+        if stat not in known:
+            _parse_percentile(stat)
+
+
+class ResultAggregator:
+    """
+    Accumulates StreamingStats for each numeric field of model results.
+
+    Scalar results are aggregated as a whole, dicts by key and lists or
+    tuples by position. Values that are not numbers are counted as skipped.
+    Aggregators are mergeable, so herds, shards or worker processes can
+    each aggregate their cows and combine the results.
+    """
+    def __init__(self, compression: int = 100) -> None:
+        """
+        Initialize an empty ResultAggregator.
+
+        Args:
+            compression: Compression of the TDigest used for quantiles.
+        """
+        self.compression = compression
+        self.fields: Dict[Any, StreamingStats] = {}
+        self.skipped = 0
+
+    def _field(self, field: Any) -> StreamingStats:
+        stats = self.fields.get(field)
+        if stats is None:
+            stats = self.fields[field] = StreamingStats(self.compression)
+        return stats
+
+    def _fields_of(self, result: Any) -> List[Tuple[Any, Any]]:
+        if isinstance(result, dict):
+            return list(result.items())
+        if isinstance(result, (list, tuple)):
+            return list(enumerate(result))
+        return [(None, result)]
+
+    def add(self, result: Any) -> None:
+        """
+        Add a result.
+
+        Args:
+            result: Result of a model for one cow.
+        """
+        for field, value in self._fields_of(result):
+            if _is_number(value):
+                self._field(field).add(value)
+            else:
+                self.skipped += 1
+
+    def add_many(self, results: Sequence[Any]) -> None:
+        """
+        Add the results of several cows. Numeric fields are added as arrays.
+
+        Args:
+            results: Results of a model.
+        """
+        columns: Dict[Any, List[Any]] = {}
+        for result in results:
+            for field, value in self._fields_of(result):
+                if _is_number(value):
+                    columns.setdefault(field, []).append(value)
+                else:
+                    self.skipped += 1
+        for field, values in columns.items():
+            self._field(field).add_many(values)
+
+    def add_array(self, array: "np.ndarray") -> None:
+        """
+        Add results read from a ResultStore array.
+
+        Args:
+            array: One row per cow, 1D for scalars, 2D for sequences or a
+                   structured array for dicts.
+        """
+        if array.dtype.names:
+            for name in array.dtype.names:
+                self._field(name).add_many(array[name])
+        elif array.ndim == 2:
+            for index in range(array.shape[1]):
+                self._field(index).add_many(array[:, index])
+        else:
+            self._field(None).add_many(array)
+
+    def merge(self, other: "ResultAggregator") -> None:
+        """
+        Add the results accumulated by another ResultAggregator.
+
+        Args:
+            other: ResultAggregator to merge into self.
+        """
+        for field, stats in other.fields.items():
+            self._field(field).merge(stats)
+        self.skipped += other.skipped
+
+    def summary(self, stats: Sequence[str] = DEFAULT_STATS, bins: int = 10) -> Dict[Any, Any]:
+        """
+        Return the statistics of each field.
+
+        Args:
+            stats: Names of the statistics, see StreamingStats.summary.
+            bins: Number of bins for "histogram".
+
+        Returns:
+            The statistics of scalar results, or the statistics of each key
+            or position of dict and sequence results.
+        """
+        if list(self.fields) == [None]:
+            return self.fields[None].summary(stats, bins)
+        return {field: field_stats.summary(stats, bins)
+                for field, field_stats in self.fields.items()}
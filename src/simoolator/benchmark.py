@@ -0,0 +1,267 @@
+"""
+Benchmarks for Herd operations on synthetic herds.
+
+Run from the command line to write a JSON report:
+
+    python -m simoolator.benchmark --cows 10000 --depth 3 --output report.json
+
+Reports from different releases can be compared to find regressions.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+from importlib import metadata as importlib_metadata
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from simoolator.herd import Herd
+from simoolator.model_registry import ModelRegistry
+
+try:
+    import numpy as np
+except ImportError: # numpy is only required to benchmark vectorized execution
+    np = None
+
+REPORT_VERSION = 1
+DEFAULT_MODES = ("linear", "cpu", "vectorized")
+CONDITIONS = ("good", "fair", "poor")
+
+
+def make_input_data(rng: random.Random, depth: int = 2) -> Dict[str, Any]:
+    """
+    Return random input data shaped like the cows in demo_herd.json.
+
+    Args:
+        rng: Random number generator.
+        depth: Nesting depth of the input data, at least 2. Each level
+               beyond 2 adds a nested "supplement" dictionary to "diet".
+    """
+    if depth < 2:
+        raise ValueError("depth must be at least 2.")
+    diet = {
+        "protein_intake": rng.randint(450, 550),
+        "carb_intake": rng.randint(1900, 2200),
+        "fat_intake": rng.randint(280, 340)
+    }
+    node = diet
+    for level in range(3, depth + 1):
+        node["supplement"] = {f"level_{level}_intake": round(rng.uniform(1, 10), 2)}
+        node = node["supplement"]
+    return {
+        "weight": rng.randint(550, 800),
+        "height": round(rng.uniform(1.3, 1.7), 2),
+        "age": rng.randint(2, 10),
+        "energy_intake": rng.randint(22000, 28000),
+        "activity_level": round(rng.uniform(1.0, 1.5), 2),
+        "diet": diet,
+        "health": {
+            "condition": rng.choice(CONDITIONS),
+            "last_checkup": f"2023-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}"
+        }
+    }
+
+
+def make_cow_records(n_cows: int, depth: int = 2, seed: int = 0) -> List[Dict[str, Any]]:
+    """
+    Return synthetic cow records as found in a herd JSON file.
+
+    Args:
+        n_cows: Number of cows.
+        depth: Nesting depth of the input data.
+        seed: Seed for the random values.
+    """
+    rng = random.Random(seed)
+    return [{"cow_id": f"cow_{i + 1}", "input_data": make_input_data(rng, depth)}
+            for i in range(n_cows)]
+
+
+def write_herd_json(filename: str, n_cows: int, depth: int = 2, seed: int = 0) -> None:
+    """
+    Write a synthetic herd to a JSON file.
+
+    Args:
+        filename: Path to the file.
+        n_cows: Number of cows.
+        depth: Nesting depth of the input data.
+        seed: Seed for the random values.
+    """
+    with open(filename, "w") as file:
+        json.dump(make_cow_records(n_cows, depth, seed), file)
+
+
+def energy_balance(weight, energy_intake, activity_level, protein_intake):
+    """
+    Model used by the benchmark. Uses arithmetic only so it can run vectorized.
+    """
+    maintenance = 0.08 * weight ** 0.75 * activity_level * 1000
+    return (energy_intake - maintenance) / weight + protein_intake * 0.01
+
+
+def _time(function: Callable[[], Any],
+          repeat: int,
+          setup: Optional[Callable[[], Any]] = None
+) -> Dict[str, Any]:
+    """
+    Call function repeat times and return the timings in seconds.
+
+    setup is called before each call and is not timed.
+    """
+    times = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    return {
+        "min": min(times),
+        "median": statistics.median(times),
+        "max": max(times),
+        "times": times
+    }
+
+
+def _environment() -> Dict[str, Any]:
+    try:
+        version = importlib_metadata.version("simoolator")
+    except importlib_metadata.PackageNotFoundError:
+        version = None
+    return {
+        "simoolator": version,
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "numpy": np.__version__ if np is not None else None
+    }
+
+
+def run_benchmark(n_cows: int = 1000,
+                  depth: int = 2,
+                  modes: Sequence[str] = DEFAULT_MODES,
+                  repeat: int = 3,
+                  seed: int = 0,
+                  directory: Optional[str] = None
+) -> Dict[str, Any]:
+    """
+    Time the main Herd operations on a synthetic herd.
+
+    Args:
+        n_cows: Number of cows in the herd.
+        depth: Nesting depth of the input data.
+        modes: Execution modes to time. Modes that can't run in this
+               environment are reported as skipped.
+        repeat: Number of times each operation is timed.
+        seed: Seed for the random values.
+        directory: Directory for the files written by the benchmark.
+                   Defaults to a temporary directory that is removed.
+
+    Returns:
+        Report with the parameters, environment and timings in seconds.
+    """
+    if n_cows < 1 or repeat < 1:
+        raise ValueError("n_cows and repeat must be positive.")
+    if directory is None:
+        with tempfile.TemporaryDirectory() as temporary_directory:
+            return run_benchmark(n_cows, depth, modes, repeat, seed, temporary_directory)
+
+    os.makedirs(directory, exist_ok=True)
+    json_file = os.path.join(directory, "benchmark_herd.json")
+    pickle_file = os.path.join(directory, "benchmark_herd.pkl")
+    write_herd_json(json_file, n_cows, depth, seed)
+
+    def load_herd() -> Herd:
+        herd = Herd(name="Benchmark")
+        herd.load_cows_from_json(json_file)
+        return herd
+
+    herd = load_herd()
+    timings = {"load_cows_from_json": _time(load_herd, repeat)}
+
+    def register() -> None:
+        herd.model_registry = ModelRegistry()
+        herd.register_model(energy_balance)
+    timings["register_model"] = _time(register, repeat)
+    timings["check_data_consistency"] = _time(herd.check_data_consistency, repeat)
+
+    def clear_results() -> None:
+        # Each repeat starts from a herd without results
+        for cow in herd.cows_in_herd:
+            cow.results = {}
+            cow.metadata = {}
+        herd.metadata = {}
+        herd.model_state = {}
+
+    skipped = {}
+    for mode in modes:
+        if mode == "vectorized" and np is None:
+            skipped[mode] = "numpy is not installed"
+            continue
+        try:
+            timings[f"execute_model_{mode}"] = _time(
+                lambda: herd.execute_model(energy_balance.__name__, mode), repeat, clear_results
+                )
+        except NotImplementedError as e:
+            skipped[mode] = str(e)
+
+    # The saved herd holds one result per cow, however many runs were timed
+    clear_results()
+    herd.execute_model(energy_balance.__name__)
+    timings["save"] = _time(lambda: herd.save(pickle_file), repeat)
+    timings["load"] = _time(lambda: Herd.load(pickle_file), repeat)
+
+    return {
+        "report_version": REPORT_VERSION,
+        "created": datetime.now().isoformat(),
+        "parameters": {
+            "n_cows": n_cows,
+            "depth": depth,
+            "modes": list(modes),
+            "repeat": repeat,
+            "seed": seed
+        },
+        "environment": _environment(),
+        "timings": timings,
+        "skipped": skipped
+    }
+
+
+def write_report(report: Dict[str, Any], filename: str) -> None:
+    """
+    Write a benchmark report to a JSON file.
+
+    Args:
+        report: Report returned by run_benchmark.
+        filename: Path to the file.
+    """
+    with open(filename, "w") as file:
+        json.dump(report, file, indent=4)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Benchmark simoolator on a synthetic herd.")
+    parser.add_argument("--cows", type=int, default=1000, help="Number of cows in the herd.")
+    parser.add_argument("--depth", type=int, default=2, help="Nesting depth of the input data.")
+    parser.add_argument("--modes", nargs="+", default=list(DEFAULT_MODES),
+                        help="Execution modes to time.")
+    parser.add_argument("--repeat", type=int, default=3, help="Times each operation is timed.")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for the random values.")
+    parser.add_argument("--output", help="JSON file for the report, printed if not given.")
+    args = parser.parse_args(argv)
+
+    report = run_benchmark(args.cows, args.depth, args.modes, args.repeat, args.seed)
+    if args.output:
+        write_report(report, args.output)
+    else:
+        json.dump(report, sys.stdout, indent=4)
+        print()
+
+
+if __name__ == "__main__":
+    main()
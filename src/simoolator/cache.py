@@ -0,0 +1,271 @@
+from collections import OrderedDict
+import hashlib
+import os
+import pickle as stdlib_pickle
+import threading
+import types
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import dill as pickle
+
+_MISSING = object()
+
+
+def _normalize_code(code: types.CodeType) -> Tuple[Any, ...]:
+    """
+    Return the parts of a code object that determine its behaviour.
+
+    The filename and line numbers are left out so moving a function does not
+    change its fingerprint. Nested code objects (lambdas, comprehensions) are
+    normalized recursively and frozensets are sorted so the result does not
+    depend on the string hash seed.
+    """
+    def normalize_const(const: Any) -> Any:
+        if isinstance(const, types.CodeType):
+            return _normalize_code(const)
+        if isinstance(const, frozenset):
+            return ("frozenset", tuple(sorted(map(repr, const))))
+        if isinstance(const, tuple):
+            return tuple(normalize_const(item) for item in const)
+        return const
+
+    return (
+        code.co_code,
+        tuple(normalize_const(const) for const in code.co_consts),
+        code.co_names,
+        code.co_varnames,
+        code.co_argcount,
+        code.co_kwonlyargcount,
+        code.co_flags,
+    )
+
+
+def model_fingerprint(model_function: Callable) -> str:
+    """
+    Return a hash identifying a model function by its code and default args.
+
+    Values captured in the closure are included, globals and other functions
+    called by the model are not, so changing them does not change the
+    fingerprint.
+
+    Args:
+        model_function: Model function to fingerprint.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(getattr(model_function, "__qualname__", "").encode())
+    code = getattr(model_function, "__code__", None)
+    if code is None:
+        # Callables without a code object are identified by their pickle
+        digest.update(pickle.dumps(model_function))
+    else:
+        digest.update(repr(_normalize_code(code)).encode())
+        closure = model_function.__closure__ or ()
+        digest.update(pickle.dumps((
+            model_function.__defaults__,
+            model_function.__kwdefaults__,
+            tuple(cell.cell_contents for cell in closure)
+            )))
+    return digest.hexdigest()
+
+
+def fingerprint_inputs(inputs: Dict[str, Any]) -> str:
+    """
+    Return a hash of resolved model inputs.
+
+    The standard library pickle is used as it is much faster than dill for 
+    plain data, dill is only used for inputs it can't serialize.
+
+    Args:
+        inputs: Mapping of argument names to values.
+    """
+    try:
+        data = stdlib_pickle.dumps(inputs, protocol=4)
+    except Exception:
+        data = pickle.dumps(inputs, protocol=4)
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+class ResultCache:
+    """
+    Cache of model results keyed on the model and its resolved inputs.
+
+    Entries are kept in memory up to max_entries and evicted least recently
+    used first. If a directory is given every entry is also written to disk,
+    entries evicted from memory, or stored by an earlier process, are read
+    back from there. Once the directory holds more than max_disk_entries 
+    files the least recently used tenth is removed. The cache can be shared 
+    by several herds and threads.
+    """
+    # Fraction of max_disk_entries kept when the on-disk tier is trimmed
+    _DISK_KEEP = 0.9
+
+    def __init__(self, 
+                 max_entries: int = 100000, 
+                 directory: Optional[str] = None,
+                 max_disk_entries: int = 1000000
+    ) -> None:
+        """
+        Initialize a ResultCache.
+
+        Args:
+            max_entries: Maximum number of results held in memory.
+            directory: Optional directory for the on-disk tier.
+            max_disk_entries: Maximum number of results kept in directory. 
+                              Entries written by other processes sharing the 
+                              directory are counted when it is next trimmed.
+        """
+        if max_entries < 0:
+            raise ValueError("max_entries must not be negative.")
+        if max_disk_entries < 1:
+            raise ValueError("max_disk_entries must be positive.")
+        self.max_entries = max_entries
+        self.max_disk_entries = max_disk_entries
+        self.directory = directory
+        self._disk_entries = 0
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+            self._disk_entries = len(self._disk_files())
+        self._entries: "OrderedDict[str, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __getstate__(self) -> Dict[str, Any]:
+        state = self.__dict__.copy()
+        state.pop("_lock")
+        return state
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(model_key: str, inputs: Dict[str, Any]) -> str:
+        """
+        Return the cache key for a model and its resolved inputs.
+
+        Args:
+            model_key: Fingerprint of the model from model_fingerprint.
+            inputs: Mapping of argument names to values.
+        """
+        return f"{model_key}_{fingerprint_inputs(inputs)}"
+
+    def _disk_path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], f"{key}.pkl")
+
+    def _disk_files(self) -> List[str]:
+        paths = []
+        for entry in os.scandir(self.directory):
+            if entry.is_dir():
+                paths.extend(os.path.join(entry.path, name) for name in os.listdir(entry.path)
+                             if name.endswith(".pkl"))
+        return paths
+
+    @staticmethod
+    def _last_used(path: str) -> float:
+        try:
+            return os.path.getmtime(path)
+        except FileNotFoundError: # Removed by another process
+            return 0.0
+
+    def _trim_disk(self) -> None:
+        """
+        Remove the least recently used files of the on-disk tier.
+        """
+        paths = sorted(self._disk_files(), key=self._last_used)
+        excess = max(len(paths) - int(self.max_disk_entries * self._DISK_KEEP), 0)
+        for path in paths[:excess]:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+        self._disk_entries = len(paths) - excess
+
+    def _remember(self, key: str, value: Any) -> None:
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        """
+        Return the cached result for key, or default on a miss.
+
+        Args:
+            key: Cache key from make_key.
+            default: Value to return if key is not cached.
+        """
+        with self._lock:
+            value = self._entries.get(key, _MISSING)
+            if value is not _MISSING:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return value
+
+        if self.directory is not None and os.path.exists(self._disk_path(key)):
+            path = self._disk_path(key)
+            try:
+                with open(path, "rb") as file:
+                    value = pickle.load(file)
+                # The modification time orders entries for trimming
+                os.utime(path)
+            except FileNotFoundError: # Trimmed by another process
+                with self._lock:
+                    self.misses += 1
+                return default
+            with self._lock:
+                self._remember(key, value)
+                self.hits += 1
+            return value
+
+        with self._lock:
+            self.misses += 1
+        return default
+
+    def __contains__(self, key: str) -> bool:
+        with self._lock:
+            if key in self._entries:
+                return True
+        return self.directory is not None and os.path.exists(self._disk_path(key))
+
+    def put(self, key: str, value: Any) -> None:
+        """
+        Store a result.
+
+        Args:
+            key: Cache key from make_key.
+            value: Result to store.
+        """
+        with self._lock:
+            self._remember(key, value)
+        if self.directory is not None:
+            path = self._disk_path(key)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            is_new = not os.path.exists(path)
+            with open(path + ".tmp", "wb") as file:
+                pickle.dump(value, file)
+            os.replace(path + ".tmp", path)
+            with self._lock:
+                self._disk_entries += is_new
+                if self._disk_entries > self.max_disk_entries:
+                    self._trim_disk()
+
+    def clear(self, disk: bool = False) -> None:
+        """
+        Remove all entries held in memory.
+
+        Args:
+            disk: If True also remove the entries of the on-disk tier.
+        """
+        with self._lock:
+            self._entries.clear()
+            if disk and self.directory is not None:
+                for path in self._disk_files():
+                    try:
+                        os.remove(path)
+                    except FileNotFoundError:
+                        pass
+                self._disk_entries = 0
@@ -0,0 +1,214 @@
+import os
+import struct
+import threading
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import dill as pickle
+
+LOG_SUFFIX = ".log"
+# Each record is prefixed with its length in bytes
+_LENGTH = struct.Struct("<Q")
+
+
+class ResultLog:
+    """
+    Append-only log of the results of one model run.
+
+    The first record describes the run, later records hold the results and
+    errors of the cows that finished, and a last record marks the run as
+    complete. Records are dill pickles prefixed with their length and are
+    flushed to disk when appended, so a log cut short by a crash is read up
+    to its last complete record.
+    """
+    def __init__(self, filename: str) -> None:
+        """
+        Initialize a ResultLog.
+
+        Args:
+            filename: Path to the log file.
+        """
+        self.filename = filename
+        self._lock = threading.Lock()
+
+    def __getstate__(self) -> str:
+        return self.filename
+
+    def __setstate__(self, filename: str) -> None:
+        self.__init__(filename)
+
+    def append(self, kind: str, data: Any) -> None:
+        """
+        Append a record and flush it to disk.
+
+        Args:
+            kind: Type of the record, "run", "results", "errors" or "done".
+            data: Content of the record.
+        """
+        payload = pickle.dumps((kind, data))
+        with self._lock, open(self.filename, "ab") as file:
+            file.write(_LENGTH.pack(len(payload)) + payload)
+            file.flush()
+            os.fsync(file.fileno())
+
+    def _scan(self) -> Tuple[List[Tuple[str, Any]], int]:
+        """
+        Return the complete records and the number of bytes they take up.
+        """
+        records = []
+        valid_bytes = 0
+        with open(self.filename, "rb") as file:
+            while True:
+                header = file.read(_LENGTH.size)
+                if len(header) < _LENGTH.size:
+                    break
+                (length,) = _LENGTH.unpack(header)
+                payload = file.read(length)
+                if len(payload) < length:
+                    break
+                try:
+                    records.append(pickle.loads(payload))
+                except Exception:
+                    break
+                valid_bytes += _LENGTH.size + length
+        return records, valid_bytes
+
+    def records(self) -> Iterator[Tuple[str, Any]]:
+        """
+        Yield the (kind, data) of every complete record.
+        """
+        records, _ = self._scan()
+        yield from records
+
+    def repair(self) -> None:
+        """
+        Remove an incomplete record left at the end of the log by a crash,
+        so new records can be appended.
+        """
+        with self._lock:
+            _, valid_bytes = self._scan()
+            if os.path.getsize(self.filename) != valid_bytes:
+                with open(self.filename, "r+b") as file:
+                    file.truncate(valid_bytes)
+
+    def read(self) -> Dict[str, Any]:
+        """
+        Return the state of the run recorded in the log.
+
+        Returns:
+            Dictionary with the "run" details, the logged "results" as a
+            mapping of cow_id to (result_id, result, metadata_entry), the
+            "errors" of cows that failed as a mapping of cow_id to the error
+            message and "done", True if the run completed.
+        """
+        state = {"run": None, "results": {}, "errors": {}, "done": False}
+        for kind, data in self.records():
+            if kind == "run":
+                state["run"] = data
+            elif kind == "results":
+                for cow_id, result_id, result, metadata_entry in data:
+                    state["results"][cow_id] = (result_id, result, metadata_entry)
+                    state["errors"].pop(cow_id, None)
+            elif kind == "errors":
+                state["errors"].update(data)
+            elif kind == "done":
+                state["done"] = True
+        if state["run"] is None:
+            raise ValueError(f"{self.filename} is not a result log.")
+        return state
+
+
+class Checkpoints:
+    """
+    Directory of ResultLogs and the interval at which runs are checkpointed.
+
+    Enable with Herd.enable_checkpoints. Model runs are split into batches
+    and the results of each batch are appended to the log of the run, so an
+    interrupted run can be continued with Herd.resume.
+    """
+    def __init__(self,
+                 directory: str,
+                 every_n_cows: int = 1000,
+                 every_seconds: Optional[float] = 60.0
+    ) -> None:
+        """
+        Initialize Checkpoints.
+
+        Args:
+            directory: Directory for the log files. Created if missing.
+            every_n_cows: Maximum number of cows run between checkpoints.
+            every_seconds: Target number of seconds between checkpoints, None
+                           to only checkpoint every_n_cows. Batch sizes are
+                           adapted to the measured time per cow.
+        """
+        if every_n_cows < 1:
+            raise ValueError("every_n_cows must be at least 1.")
+        if every_seconds is not None and every_seconds <= 0:
+            raise ValueError("every_seconds must be positive.")
+        self.directory = directory
+        self.every_n_cows = every_n_cows
+        self.every_seconds = every_seconds
+        os.makedirs(directory, exist_ok=True)
+
+    def __getstate__(self) -> Tuple[str, int, Optional[float]]:
+        return self.directory, self.every_n_cows, self.every_seconds
+
+    def __setstate__(self, state: Tuple[str, int, Optional[float]]) -> None:
+        self.__init__(*state)
+
+    def _filename(self, run_id: str) -> str:
+        return os.path.join(self.directory, run_id + LOG_SUFFIX)
+
+    def create_log(self, run_id: str) -> ResultLog:
+        """
+        Create the log for a new run.
+
+        Args:
+            run_id: ID of the run, see Herd.execute_model.
+
+        Returns:
+            The new ResultLog.
+
+        Raises:
+            FileExistsError: If a log for run_id already exists.
+        """
+        filename = self._filename(run_id)
+        # Exclusive creation so concurrent runs never share a log
+        with open(filename, "xb"):
+            pass
+        return ResultLog(filename)
+
+    def open_log(self, run_id: str) -> ResultLog:
+        """
+        Return the log of an earlier run, ready to append to.
+
+        Args:
+            run_id: ID of the run.
+        """
+        filename = self._filename(run_id)
+        if not os.path.exists(filename):
+            raise ValueError(f"No checkpoint for run {run_id} in {self.directory}.")
+        log = ResultLog(filename)
+        log.repair()
+        return log
+
+    def list_runs(self) -> List[str]:
+        """
+        Return the IDs of all runs with a log, oldest first.
+        """
+        filenames = [name for name in os.listdir(self.directory) if name.endswith(LOG_SUFFIX)]
+        filenames.sort(key=lambda name: os.path.getmtime(os.path.join(self.directory, name)))
+        return [name[:-len(LOG_SUFFIX)] for name in filenames]
+
+    def incomplete_runs(self) -> List[str]:
+        """
+        Return the IDs of runs that did not complete, oldest first.
+        """
+        incomplete = []
+        for run_id in self.list_runs():
+            try:
+                if not ResultLog(self._filename(run_id)).read()["done"]:
+                    incomplete.append(run_id)
+            except ValueError:
+                # Log created by a run that stopped before writing its details
+                continue
+        return incomplete
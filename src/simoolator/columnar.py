@@ -0,0 +1,454 @@
+import sys
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from simoolator.cow import Cow, _SlottedCow, structure_hash
+from simoolator.model_registry import InputAccessor
+
+_TYPED_DTYPES = {
+    bool: np.bool_, int: np.int64, float: np.float64,
+    np.bool_: np.bool_, np.int64: np.int64, np.float64: np.float64
+}
+
+
+def _flatten(data: Dict[Any, Any],
+             prefix: Tuple[Any, ...] = ()
+) -> Iterator[Tuple[Tuple[Any, ...], Any]]:
+    """
+    Yield (keys, value) for every leaf in a nested dictionary.
+
+    Empty dictionaries are treated as leaf values.
+
+    Args:
+        data: The nested dictionary to flatten.
+        prefix: Keys leading to data.
+    """
+    for key, value in data.items():
+        keys = prefix + (key,)
+        if isinstance(value, dict) and value:
+            yield from _flatten(value, keys)
+        else:
+            yield keys, value
+
+
+class ColumnarStore:
+    """
+    Struct-of-arrays storage for the input data of a herd.
+
+    Every leaf of the nested input dictionary is stored in its own array with
+    one row per cow. Leaves holding bools, ints or floats use typed numpy
+    arrays, anything else is stored in an object array. A typed column is
+    promoted to an object column if a value of a different type is written
+    to it.
+    """
+    def __init__(self, input_template: Dict[Any, Any], capacity: int = 16) -> None:
+        """
+        Initialize an empty ColumnarStore.
+
+        Args:
+            input_template: Input data of a cow, used to determine the leaf
+                            paths and column types.
+            capacity: Number of rows to allocate up front.
+        """
+        if not isinstance(input_template, dict) or not input_template:
+            raise ValueError("Columnar storage requires input data to be a non-empty dict.")
+
+        self.size = 0
+        self._capacity = max(1, capacity)
+        self._keys: Dict[str, Tuple[Any, ...]] = {}
+        self.columns: Dict[str, np.ndarray] = {}
+        self._subtrees: Dict[str, Dict[Any, Any]] = {}
+
+        for keys, value in _flatten(input_template):
+            path = ".".join(str(key) for key in keys)
+            self._keys[path] = keys
+            self.columns[path] = np.empty(
+                self._capacity, dtype=_TYPED_DTYPES.get(type(value), object)
+                )
+
+        # Nested template of the input where leaves hold the column name.
+        # Every internal node is indexed by its dotted path so get_value can
+        # rebuild any part of the input.
+        root = {}
+        for path, keys in self._keys.items():
+            node = root
+            for key in keys[:-1]:
+                node = node.setdefault(key, {})
+            node[keys[-1]] = path
+        self._index_subtrees(root, "")
+
+    @classmethod
+    def from_columns(cls, columns: Dict[str, Sequence[Any]]) -> "ColumnarStore":
+        """
+        Create a store from the values of each leaf, e.g. read from a file.
+
+        Writable numeric numpy arrays are used without copying, sequences
+        whose values share a bool, int or float type become typed columns and
+        other values are stored in object columns.
+
+        Args:
+            columns: Values of each dotted leaf path, one per cow.
+        """
+        sizes = {len(values) for values in columns.values()}
+        if len(sizes) > 1 or 0 in sizes:
+            raise ValueError("Columns must hold the same, non-zero number of values.")
+        template = {}
+        for path, values in columns.items():
+            keys = path.split(".")
+            node = template
+            for key in keys[:-1]:
+                node = node.setdefault(key, {})
+                if not isinstance(node, dict):
+                    raise ValueError(f"{path} is nested in the leaf {key}.")
+            if keys[-1] in node:
+                raise ValueError(f"{path} is both a leaf and a nested dictionary.")
+            node[keys[-1]] = None
+
+        store = cls(template)
+        for path, values in columns.items():
+            if isinstance(values, np.ndarray) and values.dtype.type in _TYPED_DTYPES:
+                # Arrays read from memory-mapped files may be read-only
+                column = values if values.flags.writeable else values.copy()
+            else:
+                types = {type(value) for value in values}
+                dtype = _TYPED_DTYPES.get(types.pop()) if len(types) == 1 else None
+                column = None
+                if dtype is not None:
+                    try:
+                        column = np.asarray(values, dtype=dtype)
+                    except OverflowError:
+                        pass # Python ints wider than int64
+                if column is None:
+                    column = np.empty(len(values), dtype=object)
+                    for row, value in enumerate(values):
+                        column[row] = sys.intern(value) if isinstance(value, str) else value
+            store.columns[path] = column
+        store.size = store._capacity = len(column)
+        return store
+
+    def _index_subtrees(self, tree: Dict[Any, Any], path: str) -> None:
+        self._subtrees[path] = tree
+        for key, value in tree.items():
+            if isinstance(value, dict):
+                self._index_subtrees(value, f"{path}.{key}" if path else str(key))
+
+    def __len__(self) -> int:
+        return self.size
+
+    @property
+    def paths(self) -> List[str]:
+        """Dotted paths of all leaf columns."""
+        return list(self.columns.keys())
+
+    @property
+    def nbytes(self) -> int:
+        """Bytes used by the column arrays, object columns count pointers only."""
+        return sum(column[:self.size].nbytes for column in self.columns.values())
+
+    # Reading
+    def _read(self, path: str, row: int) -> Any:
+        value = self.columns[path][row]
+        return value.item() if isinstance(value, np.generic) else value
+
+    def _build(self, tree: Dict[Any, Any], row: int) -> Dict[Any, Any]:
+        return {key: self._read(value, row) if isinstance(value, str)
+                else self._build(value, row) for key, value in tree.items()}
+
+    def _check_row(self, row: int) -> None:
+        if not 0 <= row < self.size:
+            raise IndexError(f"Row {row} is out of range for a store with {self.size} rows.")
+
+    def get_value(self, row: int, path: str) -> Any:
+        """
+        Return the value at a dotted path for a row.
+
+        Args:
+            row: Row of the cow in the store.
+            path: Dot-separated path to a leaf or nested dictionary.
+        """
+        self._check_row(row)
+        if path in self.columns:
+            return self._read(path, row)
+        if path in self._subtrees:
+            return self._build(self._subtrees[path], row)
+        raise KeyError(path)
+
+    def get_input(self, row: int) -> Dict[Any, Any]:
+        """
+        Rebuild the nested input dictionary for a row.
+
+        Args:
+            row: Row of the cow in the store.
+        """
+        self._check_row(row)
+        return self._build(self._subtrees[""], row)
+
+    def column(self, path: str) -> np.ndarray:
+        """
+        Return a view of the filled part of a column.
+
+        Args:
+            path: Dot-separated path to a leaf.
+        """
+        return self.columns[path][:self.size]
+
+    def gather(self, path: str, rows: Union[Sequence[int], np.ndarray]) -> Optional[np.ndarray]:
+        """
+        Return the values of a numeric column for the given rows.
+
+        Args:
+            path: Dot-separated path to a leaf.
+            rows: Rows to gather.
+
+        Returns:
+            A typed numpy array, or None if path is not a numeric leaf column.
+        """
+        column = self.columns.get(path)
+        if column is None or column.dtype == object:
+            return None
+        return column[:self.size][np.asarray(rows, dtype=np.intp)]
+
+    def structure_hashes(self, rows: Union[Sequence[int], np.ndarray]) -> List[int]:
+        """
+        Return a hash of the input structure of each row.
+
+        All rows share the keys of the store and typed columns hold a single
+        type, so only the values of object columns are inspected. Rows with
+        the same hash have the same input structure.
+
+        Args:
+            rows: Rows to hash.
+        """
+        rows = np.asarray(rows, dtype=np.intp)
+        object_columns = [column[:self.size][rows] for column in self.columns.values()
+                          if column.dtype == object]
+        if not object_columns:
+            return [0] * len(rows)
+        column_hashes = [map(structure_hash, column) for column in object_columns]
+        return [hash(row_hashes) for row_hashes in zip(*column_hashes)]
+
+    # Writing
+    def _write(self, path: str, row: int, value: Any) -> None:
+        column = self.columns[path]
+        if column.dtype != object and _TYPED_DTYPES.get(type(value)) is not column.dtype.type:
+            column = column.astype(object)
+            self.columns[path] = column
+        if isinstance(value, str):
+            # Categorical strings repeat across the herd, share one object
+            value = sys.intern(value)
+        try:
+            column[row] = value
+        except OverflowError:
+            # Python ints wider than int64 are kept in an object column
+            column = column.astype(object)
+            self.columns[path] = column
+            column[row] = value
+
+    def _check_structure(self, input_data: Any) -> List[Tuple[str, Any]]:
+        if not isinstance(input_data, dict):
+            raise ValueError("Columnar storage requires input data to be a dict.")
+        leaves = [(".".join(str(key) for key in keys), value)
+                  for keys, value in _flatten(input_data)]
+        if len(leaves) != len(self._keys) or any(path not in self._keys for path, _ in leaves):
+            raise ValueError("Input structure does not match the columnar store.")
+        return leaves
+
+    def set_value(self, row: int, path: str, value: Any) -> None:
+        """
+        Set the value of a leaf for a row.
+
+        Args:
+            row: Row of the cow in the store.
+            path: Dot-separated path to a leaf.
+            value: New value.
+        """
+        self._check_row(row)
+        if path not in self.columns:
+            raise KeyError(path)
+        self._write(path, row, value)
+
+    def set_input(self, row: int, input_data: Dict[Any, Any]) -> None:
+        """
+        Replace the input data of a row.
+
+        Args:
+            row: Row of the cow in the store.
+            input_data: Nested input dictionary with the structure of the store.
+        """
+        self._check_row(row)
+        for path, value in self._check_structure(input_data):
+            self._write(path, row, value)
+
+    def append(self, input_data: Dict[Any, Any]) -> int:
+        """
+        Add the input data of a cow as a new row.
+
+        Args:
+            input_data: Nested input dictionary with the structure of the store.
+
+        Returns:
+            Row the data was stored in.
+        """
+        leaves = self._check_structure(input_data)
+        if self.size == self._capacity:
+            self._capacity *= 2
+            for path, column in self.columns.items():
+                grown = np.empty(self._capacity, dtype=column.dtype)
+                grown[:self.size] = column[:self.size]
+                self.columns[path] = grown
+        row = self.size
+        self.size += 1
+        for path, value in leaves:
+            self._write(path, row, value)
+        return row
+
+
+class ColumnarCow(_SlottedCow):
+    """
+    A Cow whose input data is a row in a ColumnarStore.
+
+    The input property rebuilds the nested dictionary on access, so changes
+    must be written back by assigning cow.input or calling set_input_value.
+    Like CompactCow, views have no __dict__, create their results and 
+    metadata dicts when first needed and are registered as a virtual 
+    subclass of Cow.
+    """
+    __slots__ = ("_store", "_row")
+
+    def __init__(self,
+                 cow_id: Union[int, float, str],
+                 store: ColumnarStore,
+                 row: int
+    ) -> None:
+        """
+        Initialize a view of a row in a ColumnarStore.
+
+        Args:
+            cow_id: Unique identifier for the cow.
+            store: Store holding the input data.
+            row: Row of the cow in the store.
+        """
+        self.cow_id = str(cow_id)
+        self._store = store
+        self._row = row
+        self._results = None
+        self._metadata = None
+
+    @property
+    def input(self) -> Dict[Any, Any]:
+        return self._store.get_input(self._row)
+
+    @input.setter
+    def input(self, input_data: Dict[Any, Any]) -> None:
+        self._store.set_input(self._row, input_data)
+
+    def __getstate__(self) -> Dict[str, Any]:
+        """
+        Data to include when serializing.
+        """
+        state = {
+            "cow_id": self.cow_id,
+            "store": self._store,
+            "row": self._row,
+            "results": self._results or {},
+            "metadata": self._metadata or {}
+        }
+        return state
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        """
+        Data to extract when loading from pickle.
+        """
+        self.cow_id = state["cow_id"]
+        self._store = state["store"]
+        self._row = state["row"]
+        self._results = {sys.intern(result_id): result 
+                         for result_id, result in state["results"].items()} or None
+        self._metadata = {sys.intern(result_id): entry 
+                          for result_id, entry in state["metadata"].items()} or None
+
+    def get_input_value(self, path: str) -> Any:
+        """
+        Return value nested in self.input.
+
+        Args:
+            path: Dot-separated path to the nested value.
+        """
+        return self._store.get_value(self._row, path)
+
+    def resolve_inputs(self, accessors: Dict[str, InputAccessor]) -> Dict[str, Any]:
+        """
+        Return the value of each compiled accessor in self.input.
+
+        Args:
+            accessors: Mapping of argument names to InputAccessor.
+        """
+        store, row = self._store, self._row
+        return {key: store.get_value(row, accessor.path) for key, accessor in accessors.items()}
+
+    def set_input_value(self, path: str, value: Any) -> None:
+        """
+        Set a leaf value in self.input.
+
+        Args:
+            path: Dot-separated path to the leaf.
+            value: New value.
+        """
+        self._store.set_value(self._row, path, value)
+
+
+Cow.register(ColumnarCow)
+
+
+class ColumnarCowList(list):
+    """
+    List of ColumnarCow views sharing one ColumnarStore.
+
+    Cows added to the list, by append, extend, insert, += or assignment, have
+    their input data copied into the store and are replaced by a view that
+    shares their results and metadata.
+    """
+    def __init__(self, store: ColumnarStore, cows: Iterable[Cow] = ()) -> None:
+        super().__init__()
+        self.store = store
+        self.extend(cows)
+
+    def __reduce__(self):
+        return (self.__class__, (self.store, list(self)))
+
+    def _to_view(self, cow: Cow) -> "ColumnarCow":
+        """
+        Return cow as a view of a row of the store, copying its input data.
+        """
+        if isinstance(cow, ColumnarCow) and cow._store is self.store:
+            return cow
+        try:
+            row = self.store.append(cow.input)
+        except ValueError as e:
+            raise ValueError(f"Cow {cow.cow_id}: {e}") from e
+        view = ColumnarCow(cow.cow_id, self.store, row)
+        view.results = cow.results
+        view.metadata = cow.metadata
+        return view
+
+    def append(self, cow: Cow) -> None:
+        super().append(self._to_view(cow))
+
+    def extend(self, cows: Iterable[Cow]) -> None:
+        for cow in cows:
+            self.append(cow)
+
+    def insert(self, index: int, cow: Cow) -> None:
+        super().insert(index, self._to_view(cow))
+
+    def __iadd__(self, cows: Iterable[Cow]) -> "ColumnarCowList":
+        self.extend(cows)
+        return self
+
+    def __setitem__(self, index: Union[int, slice], value: Any) -> None:
+        if isinstance(index, slice):
+            value = [self._to_view(cow) for cow in value]
+        else:
+            value = self._to_view(value)
+        super().__setitem__(index, value)
@@ -1,151 +1,506 @@
-import datetime
-import inspect
-from typing import Any, Callable, Dict, Union
-
-class Cow:
-    """
-    The Cow class stores data for an individual animal. When methods are run at
-    the Herd level, the results are store within each individual Cow instance.
-    """
-    # Initalization and state management
-    def __init__(self, cow_id: Union[int, float, str], input_data: Any) -> None:
-        """
-        Initialize a new Cow instance.
-
-        Args:
-            cow_id: Unique identifier for the cow.
-            input_data: Data associated with the cow.
-        """
-        self.cow_id = str(cow_id)
-        self.input = input_data
-        self.results = {}
-        self.metadata = {}
-
-    def __getstate__(self) -> Dict[str, Any]:
-        """
-        Data to include when serializing.
-        """
-        state = {
-            "cow_id": self.cow_id,
-            "input": self.input,
-            "results": self.results,
-            "metadata": self.metadata
-        }
-        return state
-    
-    def __setstate__(self, state: Dict[str, Any]) -> None:
-        """
-        Data to extract when loading from pickle.
-        """
-        self.cow_id = state["cow_id"]
-        self.input = state["input"]
-        self.results = state["results"]
-        self.metadata = state["metadata"]
-
-    # Core Functionality
-    def run_model(self, 
-                  model_function: Callable, 
-                  input_mapping: Dict[str, str]
-    ) -> None:
-        """
-        Run a model function using input_mapping to map self to function arguments
-
-        Args:
-            model_function::Callable
-                Function to run
-            input_mapping::dict
-                Mapping of self to model_function arguments
-        """
-        
-        def get_nested_value(path: str) -> Any:
-            """
-            Return value nested in self.input.
-
-            Args:
-                path: Dot-separated path to the nested value.
-            """
-            keys = path.split(".")
-            value = self.input
-            for key in keys:
-                value = value[key]
-            return value
-        
-        start_time = datetime.datetime.now()
-        formatted_start_time = start_time.isoformat()
-        result_id = f"{model_function.__name__}_{start_time.strftime('%Y%m%d_%H%M%S')}"
-        inputs = {key: get_nested_value(value) for key, value in input_mapping.items()}
-
-        # Extract default args used for metadata
-        sig = inspect.signature(model_function)
-        defaults = {key: val.default for key, val in sig.parameters.items() 
-                    if val.default is not inspect.Parameter.empty}
-        used_defaults = {key: val for key, val in defaults.items() 
-                         if key not in input_mapping}
-
-        result = model_function(**inputs)
-        end_time = datetime.datetime.now()
-        formatted_end_time = end_time.isoformat()
-        self.results[result_id] = result
-
-        metadata_entry = {
-            "model_name": model_function.__name__,
-            "start_time": formatted_start_time,
-            "end_time": formatted_end_time,
-            "run_time": end_time - start_time,
-            "input_args": inputs,
-            "default_args": used_defaults,
-            # "status": , # TODO once error handling is setup add a status variable
-                          # Did model run or crash
-            # "error_message": , # If model crashed store the error message 
-        }
-        self.metadata[result_id] = metadata_entry
-    
-    def list_results(self) -> None:
-        """
-        Display all the model results.
-        """
-        print("Result ID".ljust(25), "| Results")
-        for result_id, data in self.results.items():
-            print(f"{result_id}".ljust(25), f"| {data}") 
-    
-    def get_result(self, result_id: str) -> Any:
-        """
-        Return a specific result. 
-
-        Args:
-            result_id: ID value for results to return.
-        """
-        return self.results[result_id]
-
-    # Data structure visualization
-    def print_input_structure(self) -> None:
-        """
-        Print the variable names and type of self.input. 
-        """
-        def print_structure(data, indent=0):    
-            if isinstance(data, dict):
-                for key, value in data.items():
-                    print(" " * indent + str(key))
-                    if isinstance(value, dict):
-                        print_structure(value, indent + 4)
-                    else:
-                        print(" " * (indent + 4) + str(type(value).__name__))
-            else:
-                print(" " * indent + str(type(data).__name__))
-                
-        print_structure(self.input)
-
-    def get_input_structure(self) -> Dict[str, Any]:
-        """
-        Returns the structure of self.input with key names and data types.
-        Used to check all Cow instances have the same input structure.
-        """
-        def _get_structure(data: Any) -> Any:
-            if isinstance(data, dict):
-                return {key: _get_structure(value) for key, value in data.items()}
-            elif isinstance(data, list):
-                return [_get_structure(item) for item in data]
-            else:
-                return type(data).__name__ 
-        return _get_structure(self.input)
-            
\ No newline at end of file
+from abc import ABCMeta
+import datetime
+import sys
+from time import perf_counter_ns
+from typing import TYPE_CHECKING, Any, Callable, Dict, Optional, Tuple, Union
+
+from simoolator.model_registry import (
+    InputAccessor, compile_input_mapping, get_used_defaults
+    )
+from simoolator.result_store import StoredResult
+
+if TYPE_CHECKING:
+    from simoolator.profiling import Profiler
+
+METADATA_LEVELS = ("full", "summary", "none")
+
+
+def _structure_signature(data: Any) -> Any:
+    """
+    Return a hashable description of the keys and value types in data.
+
+    Dict keys are compared without order, as in get_input_structure.
+    """
+    if isinstance(data, dict):
+        return frozenset((key, _structure_signature(value)) for key, value in data.items())
+    if isinstance(data, list):
+        return tuple(_structure_signature(item) for item in data)
+    return type(data)
+
+
+def structure_hash(data: Any) -> int:
+    """
+    Return a hash of the structure of input data.
+
+    Data with the same get_input_structure has the same hash. Hashes are only
+    valid within one process and are not stored.
+
+    Args:
+        data: Input data of a cow.
+    """
+    return hash(_structure_signature(data))
+
+
+class MetadataSummary:
+    """
+    Compact metadata for a result, stored when the metadata level is "summary".
+
+    The model name and default arguments are the same for every cow in a run 
+    and are stored once in the Herd metadata instead.
+    """
+    __slots__ = ("start_time", "run_time_ns", "cache_hit")
+
+    def __init__(self, start_time: float, run_time_ns: int, cache_hit: bool = False) -> None:
+        """
+        Initialize a MetadataSummary.
+
+        Args:
+            start_time: POSIX timestamp of the start of the model run.
+            run_time_ns: Run time in nanoseconds.
+            cache_hit: True if the result was read from a ResultCache.
+        """
+        self.start_time = start_time
+        self.run_time_ns = run_time_ns
+        self.cache_hit = cache_hit
+
+    def __getstate__(self) -> Tuple[float, int, bool]:
+        return self.start_time, self.run_time_ns, self.cache_hit
+
+    def __setstate__(self, state: Tuple[float, int, bool]) -> None:
+        self.start_time, self.run_time_ns, self.cache_hit = state
+
+    def __eq__(self, other: Any) -> bool:
+        if not isinstance(other, MetadataSummary):
+            return NotImplemented
+        return self.__getstate__() == other.__getstate__()
+
+    def __repr__(self) -> str:
+        return (f"MetadataSummary(start_time={self.start_time}, "
+                f"run_time_ns={self.run_time_ns}, cache_hit={self.cache_hit})")
+
+    def as_dict(self) -> Dict[str, Any]:
+        """
+        Return the summary with the keys used by full metadata.
+        """
+        start_time = datetime.datetime.fromtimestamp(self.start_time)
+        run_time = datetime.timedelta(microseconds=self.run_time_ns // 1000)
+        return {
+            "start_time": start_time.isoformat(),
+            "end_time": (start_time + run_time).isoformat(),
+            "run_time": run_time,
+            "cache_hit": self.cache_hit
+        }
+
+
+def make_metadata(metadata_level: str,
+                  model_name: str,
+                  start_time: datetime.datetime,
+                  run_time_ns: int,
+                  inputs: Dict[str, Any],
+                  used_defaults: Dict[str, Any],
+                  cache_hit: bool = False
+) -> Union[Dict[str, Any], MetadataSummary, None]:
+    """
+    Return the metadata entry for a result at the given metadata level.
+
+    Args:
+        metadata_level: One of "full", "summary" or "none".
+        model_name: Name of the model.
+        start_time: Start of the model run.
+        run_time_ns: Run time in nanoseconds.
+        inputs: Resolved model inputs.
+        used_defaults: Default arguments not set by the input mapping.
+        cache_hit: True if the result was read from a ResultCache.
+
+    Returns:
+        A dict for "full", a MetadataSummary for "summary" and None for "none".
+    """
+    if metadata_level == "full":
+        run_time = datetime.timedelta(microseconds=run_time_ns // 1000)
+        metadata_entry = {
+            "model_name": model_name,
+            "start_time": start_time.isoformat(),
+            "end_time": (start_time + run_time).isoformat(),
+            "run_time": run_time,
+            "input_args": inputs,
+            "default_args": used_defaults,
+            # "status": , # TODO once error handling is setup add a status variable
+                          # Did model run or crash
+            # "error_message": , # If model crashed store the error message 
+        }
+        if cache_hit:
+            metadata_entry["cache_hit"] = True
+        return metadata_entry
+    if metadata_level == "summary":
+        return MetadataSummary(start_time.timestamp(), run_time_ns, cache_hit)
+    if metadata_level == "none":
+        return None
+    raise ValueError(f"Invalid metadata level. Choose from {', '.join(METADATA_LEVELS)}.")
+
+
+class _CowBase(metaclass=ABCMeta):
+    """
+    Methods shared by Cow, CompactCow and ColumnarCow. Subclasses set 
+    cow_id, input, results and metadata.
+    """
+    __slots__ = ()
+
+    # Core Functionality
+    def run_model(self, 
+                  model_function: Callable, 
+                  input_mapping: Dict[str, str],
+                  accessors: Optional[Dict[str, InputAccessor]] = None,
+                  used_defaults: Optional[Dict[str, Any]] = None,
+                  profiler: Optional["Profiler"] = None,
+                  metadata_level: str = "full",
+                  result_id: Optional[str] = None
+    ) -> str:
+        """
+        Run a model function using input_mapping to map self to function arguments
+
+        Args:
+            model_function::Callable
+                Function to run
+            input_mapping::dict
+                Mapping of self to model_function arguments
+            accessors::dict
+                Compiled accessors for input_mapping, as stored by ModelRegistry
+            used_defaults::dict
+                Default arguments of model_function not set by input_mapping
+            profiler::Profiler
+                Optional Profiler to record the time spent in each phase
+            metadata_level::str
+                "full" stores a metadata dict, "summary" a MetadataSummary 
+                and "none" no metadata
+            result_id::str
+                ID to store the result under, defaults to the model name 
+                and start time
+
+        Returns:
+            ID of the stored result
+        """
+        if accessors is None:
+            accessors = compile_input_mapping(input_mapping)
+        if used_defaults is None:
+            used_defaults = get_used_defaults(model_function, input_mapping)
+
+        # The clock is read once, the end time is derived from the elapsed 
+        # perf_counter time
+        start_time = datetime.datetime.now()
+        start_ns = perf_counter_ns()
+        if result_id is None:
+            result_id = f"{model_function.__name__}_{start_time.strftime('%Y%m%d_%H%M%S')}"
+        inputs = self.resolve_inputs(accessors)
+        if profiler is not None:
+            inputs_ns = perf_counter_ns()
+
+        result = model_function(**inputs)
+        end_ns = perf_counter_ns()
+
+        metadata_entry = make_metadata(
+            metadata_level, model_function.__name__, start_time, end_ns - start_ns, 
+            inputs, used_defaults
+            )
+        if profiler is None:
+            self.store_result(result_id, result, metadata_entry)
+            return result_id
+
+        metadata_ns = perf_counter_ns()
+        self.store_result(result_id, result, metadata_entry)
+        profiler.record_run([start_ns, inputs_ns, end_ns, metadata_ns, perf_counter_ns()])
+        return result_id
+
+    def get_input_value(self, path: str) -> Any:
+        """
+        Return value nested in self.input.
+
+        Args:
+            path: Dot-separated path to the nested value.
+        """
+        value = self.input
+        for key in path.split("."):
+            value = value[key]
+        return value
+
+    def resolve_inputs(self, accessors: Dict[str, InputAccessor]) -> Dict[str, Any]:
+        """
+        Return the value of each compiled accessor in self.input.
+
+        Args:
+            accessors: Mapping of argument names to InputAccessor.
+        """
+        input_data = self.input
+        return {key: accessor(input_data) for key, accessor in accessors.items()}
+
+    def set_input_value(self, path: str, value: Any) -> None:
+        """
+        Set a value nested in self.input.
+
+        Args:
+            path: Dot-separated path to the nested value.
+            value: New value.
+        """
+        *parents, last = path.split(".")
+        data = self.input
+        for key in parents:
+            data = data[key]
+        data[last] = value
+        self._structure_cache = None
+
+    def get_structure_hash(self, refresh: bool = False) -> int:
+        """
+        Return the structure_hash of self.input.
+
+        The hash is cached until self.input is replaced or changed with 
+        set_input_value. Call invalidate_structure after changing the keys 
+        or value types of the nested dictionaries directly.
+
+        Args:
+            refresh: If True hash the current input and update the cache.
+        """
+        input_data = self.input
+        cached = getattr(self, "_structure_cache", None)
+        if refresh or cached is None or cached[0] is not input_data:
+            cached = (input_data, structure_hash(input_data))
+            self._structure_cache = cached
+        return cached[1]
+
+    def invalidate_structure(self) -> None:
+        """
+        Discard the cached structure hash of self.input.
+        """
+        self._structure_cache = None
+
+    def store_result(self, 
+                     result_id: str, 
+                     result: Any, 
+                     metadata_entry: Union[Dict[str, Any], MetadataSummary, None]
+    ) -> None:
+        """
+        Store the result of a model run and the associated metadata.
+
+        Args:
+            result_id: ID value for the result.
+            result: Value returned by the model.
+            metadata_entry: Metadata describing the model run, None to store 
+                            the result without metadata.
+        """
+        # Every cow in a run shares the same result_id, intern it so the 
+        # herd holds one copy
+        result_id = sys.intern(result_id)
+        self.results[result_id] = result
+        if metadata_entry is not None:
+            self.metadata[result_id] = metadata_entry
+    
+    def list_results(self) -> None:
+        """
+        Display all the model results.
+        """
+        print("Result ID".ljust(25), "| Results")
+        for result_id in self.results:
+            print(f"{result_id}".ljust(25), f"| {self.get_result(result_id)}") 
+    
+    def get_result(self, result_id: str) -> Any:
+        """
+        Return a specific result. 
+
+        Results moved to a ResultStore are read from the store.
+
+        Args:
+            result_id: ID value for results to return.
+        """
+        result = self.results[result_id]
+        if isinstance(result, StoredResult):
+            return result.load()
+        return result
+
+    # Data structure visualization
+    def print_input_structure(self) -> None:
+        """
+        Print the variable names and type of self.input. 
+        """
+        def print_structure(data, indent=0):    
+            if isinstance(data, dict):
+                for key, value in data.items():
+                    print(" " * indent + str(key))
+                    if isinstance(value, dict):
+                        print_structure(value, indent + 4)
+                    else:
+                        print(" " * (indent + 4) + str(type(value).__name__))
+            else:
+                print(" " * indent + str(type(data).__name__))
+                
+        print_structure(self.input)
+
+    def get_input_structure(self) -> Dict[str, Any]:
+        """
+        Returns the structure of self.input with key names and data types.
+        Used to check all Cow instances have the same input structure.
+        """
+        def _get_structure(data: Any) -> Any:
+            if isinstance(data, dict):
+                return {key: _get_structure(value) for key, value in data.items()}
+            elif isinstance(data, list):
+                return [_get_structure(item) for item in data]
+            else:
+                return type(data).__name__ 
+        return _get_structure(self.input)
+
+
+class Cow(_CowBase):
+    """
+    The Cow class stores data for an individual animal. When methods are run at
+    the Herd level, the results are store within each individual Cow instance.
+    """
+    # Initalization and state management
+    def __init__(self, cow_id: Union[int, float, str], input_data: Any) -> None:
+        """
+        Initialize a new Cow instance.
+
+        Args:
+            cow_id: Unique identifier for the cow.
+            input_data: Data associated with the cow.
+        """
+        self.cow_id = str(cow_id)
+        self.input = input_data
+        self.results = {}
+        self.metadata = {}
+
+    def __getstate__(self) -> Dict[str, Any]:
+        """
+        Data to include when serializing.
+        """
+        state = {
+            "cow_id": self.cow_id,
+            "input": self.input,
+            "results": self.results,
+            "metadata": self.metadata
+        }
+        return state
+    
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        """
+        Data to extract when loading from pickle.
+        """
+        self.cow_id = state["cow_id"]
+        self.input = state["input"]
+        self.results = state["results"]
+        self.metadata = state["metadata"]
+
+
+class _SlottedCow(_CowBase):
+    """
+    Base of cows that store their attributes in __slots__. The results and 
+    metadata dicts are only created once a result is stored or they are 
+    accessed. Subclasses set input.
+    """
+    __slots__ = ("cow_id", "_results", "_metadata", "_structure_cache")
+
+    @property
+    def results(self) -> Dict[str, Any]:
+        if self._results is None:
+            self._results = {}
+        return self._results
+
+    @results.setter
+    def results(self, results: Dict[str, Any]) -> None:
+        self._results = results
+
+    @property
+    def metadata(self) -> Dict[str, Any]:
+        if self._metadata is None:
+            self._metadata = {}
+        return self._metadata
+
+    @metadata.setter
+    def metadata(self, metadata: Dict[str, Any]) -> None:
+        self._metadata = metadata
+
+    def store_result(self, 
+                     result_id: str, 
+                     result: Any, 
+                     metadata_entry: Union[Dict[str, Any], MetadataSummary, None]
+    ) -> None:
+        """
+        Store the result of a model run and the associated metadata.
+
+        Args:
+            result_id: ID value for the result.
+            result: Value returned by the model.
+            metadata_entry: Metadata describing the model run, None to store 
+                            the result without metadata.
+        """
+        result_id = sys.intern(result_id)
+        if self._results is None:
+            self._results = {}
+        self._results[result_id] = result
+        if metadata_entry is not None:
+            if self._metadata is None:
+                self._metadata = {}
+            self._metadata[result_id] = metadata_entry
+
+
+class CompactCow(_SlottedCow):
+    """
+    A memory-optimized Cow for very large herds.
+
+    Attributes are stored in __slots__, instances have no __dict__, and the 
+    results and metadata dicts are only created once a result is stored or 
+    they are accessed. Result ids are interned so cows share a single copy of 
+    each. The pickled state is the same as for Cow. CompactCow does not 
+    inherit from Cow, as that would add a __dict__, but is registered as a 
+    virtual subclass so isinstance(cow, Cow) holds.
+    """
+    __slots__ = ("input",)
+
+    def __init__(self, cow_id: Union[int, float, str], input_data: Any) -> None:
+        """
+        Initialize a new CompactCow instance.
+
+        Args:
+            cow_id: Unique identifier for the cow.
+            input_data: Data associated with the cow.
+        """
+        self.cow_id = str(cow_id)
+        self.input = input_data
+        self._results = None
+        self._metadata = None
+
+    @classmethod
+    def from_cow(cls, cow: Cow) -> "CompactCow":
+        """
+        Return a CompactCow with the data of cow. Input data, results and 
+        metadata entries are shared, not copied.
+
+        Args:
+            cow: Cow to convert.
+        """
+        compact = cls(cow.cow_id, cow.input)
+        compact.__setstate__(cow.__getstate__())
+        return compact
+
+    def __getstate__(self) -> Dict[str, Any]:
+        """
+        Data to include when serializing.
+        """
+        state = {
+            "cow_id": self.cow_id,
+            "input": self.input,
+            "results": self._results or {},
+            "metadata": self._metadata or {}
+        }
+        return state
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        """
+        Data to extract when loading from pickle.
+        """
+        self.cow_id = state["cow_id"]
+        self.input = state["input"]
+        self._results = {sys.intern(result_id): result 
+                         for result_id, result in state["results"].items()} or None
+        self._metadata = {sys.intern(result_id): entry 
+                          for result_id, entry in state["metadata"].items()} or None
+
+
+Cow.register(CompactCow)
@@ -0,0 +1,313 @@
+import csv
+from itertools import islice
+import json
+import os
+from typing import Any, Container, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+try:
+    import numpy as np
+except ImportError: # numpy is only required for columnar storage
+    np = None
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError: # pyarrow is only required for Parquet and Arrow files
+    pa = None
+    pq = None
+
+EXPORT_FORMATS = ("parquet", "arrow", "csv")
+COW_ID_COLUMN = "cow_id"
+# Columns holding the result_id of the exported result of each model
+RUN_ID_KEY = "@run_id"
+# Column listing the columns whose path is absent from the input data or
+# result of a cow, only written if the cows do not share one structure
+MISSING_COLUMN = "@missing"
+
+_EXTENSIONS = {
+    ".parquet": "parquet", ".pq": "parquet",
+    ".arrow": "arrow", ".feather": "arrow", ".ipc": "arrow",
+    ".csv": "csv"
+}
+# Arrow field metadata marking string columns that hold JSON encoded values
+_KIND_KEY = b"simoolator.kind"
+
+
+def infer_format(filename: str, format: Optional[str] = None) -> str:
+    """
+    Return the file format, given or inferred from the file extension.
+
+    Args:
+        filename: Path to the file.
+        format: One of EXPORT_FORMATS, None to infer it.
+    """
+    if format is None:
+        format = _EXTENSIONS.get(os.path.splitext(str(filename))[1].lower())
+        if format is None:
+            raise ValueError(
+                f"Can't infer the format of {filename}. Choose from {', '.join(EXPORT_FORMATS)}."
+                )
+    if format not in EXPORT_FORMATS:
+        raise ValueError(f"Invalid format. Choose from {', '.join(EXPORT_FORMATS)}.")
+    if format != "csv" and pa is None:
+        raise ImportError(f"{format} files require pyarrow to be installed.")
+    return format
+
+
+def flatten_value(value: Any, prefix: str) -> Iterator[Tuple[str, Any]]:
+    """
+    Yield (path, leaf) for every leaf of a nested dictionary.
+
+    Values that are not dictionaries, and empty dictionaries below the root,
+    are a single leaf at prefix.
+
+    Args:
+        value: Value to flatten.
+        prefix: Dotted path of value, empty for the root.
+    """
+    if isinstance(value, dict) and (value or not prefix):
+        for key, item in value.items():
+            yield from flatten_value(item, f"{prefix}.{key}" if prefix else str(key))
+    else:
+        yield prefix, value
+
+
+def unflatten(paths: Sequence[Tuple[str, ...]], 
+              values: Sequence[Any], 
+              absent: Container[int] = ()
+) -> Dict[str, Any]:
+    """
+    Build a nested dictionary from split paths and their values.
+
+    Args:
+        paths: Keys leading to each leaf.
+        values: Value of each leaf.
+        absent: Positions of the leaves to leave out.
+    """
+    tree = {}
+    for position, (keys, value) in enumerate(zip(paths, values)):
+        if position in absent:
+            continue
+        node = tree
+        for key in keys[:-1]:
+            node = node.setdefault(key, {})
+        node[keys[-1]] = value
+    return tree
+
+
+def value_kind(value: Any) -> Optional[str]:
+    """
+    Return the column kind of a value, None for None.
+
+    Kinds are "bool", "int", "float" and "str", other values are stored as
+    "json" encoded strings.
+    """
+    if value is None:
+        return None
+    if isinstance(value, bool) or (np is not None and isinstance(value, np.bool_)):
+        return "bool"
+    if isinstance(value, int) or (np is not None and isinstance(value, np.integer)):
+        return "int"
+    if isinstance(value, float) or (np is not None and isinstance(value, np.floating)):
+        return "float"
+    if isinstance(value, str):
+        return "str"
+    return "json"
+
+
+def merge_kinds(kind: Optional[str], other: Optional[str]) -> Optional[str]:
+    """
+    Return the kind of a column holding values of two kinds.
+    """
+    if kind is None or kind == other:
+        return other
+    if other is None:
+        return kind
+    if {kind, other} == {"int", "float"}:
+        return "float"
+    return "json"
+
+
+def _to_python(value: Any) -> Any:
+    return value.item() if np is not None and isinstance(value, np.generic) else value
+
+
+def as_list(values: Sequence[Any]) -> List[Any]:
+    """
+    Return the values of a column as a list of Python values.
+    """
+    return values.tolist() if hasattr(values, "tolist") else list(values)
+
+
+def concat_columns(chunks: List[Sequence[Any]]) -> Sequence[Any]:
+    """
+    Join the values of a column read in batches, numpy arrays stay arrays.
+    """
+    if np is not None and all(isinstance(chunk, np.ndarray) for chunk in chunks):
+        return np.concatenate(chunks)
+    return [value for chunk in chunks for value in as_list(chunk)]
+
+
+# Writing
+def _arrow_schema(kinds: Dict[str, Optional[str]]) -> "pa.Schema":
+    types = {"bool": pa.bool_(), "int": pa.int64(), "float": pa.float64(),
+             "str": pa.string(), "json": pa.string(), None: pa.null()}
+    return pa.schema([
+        pa.field(name, types[kind], metadata={_KIND_KEY: b"json"} if kind == "json" else None)
+        for name, kind in kinds.items()
+        ])
+
+
+def _arrow_array(values: Sequence[Any], field: "pa.Field", kind: Optional[str]) -> "pa.Array":
+    if np is not None and isinstance(values, np.ndarray):
+        if values.dtype != object:
+            # Typed columns of a ColumnarStore are passed without copying
+            return pa.array(values, type=field.type)
+        values = values.tolist()
+    if kind == "json":
+        values = [None if value is None else json.dumps(_to_python(value), default=str)
+                  for value in values]
+    elif kind is not None:
+        values = [_to_python(value) for value in values]
+    return pa.array(values, type=field.type)
+
+
+def _csv_cell(value: Any, kind: Optional[str]) -> str:
+    if value is None:
+        return ""
+    if kind == "str" and _parse_cell(value) is value:
+        # Strings are written as they are unless they would be read back as 
+        # another value, e.g. "123", "true" or ""
+        return value
+    return json.dumps(_to_python(value), default=str)
+
+
+def write_batches(filename: str,
+                  format: str,
+                  kinds: Dict[str, Optional[str]],
+                  batches: Iterable[Dict[str, Sequence[Any]]]
+) -> None:
+    """
+    Write record batches to a Parquet, Arrow IPC or CSV file.
+
+    Args:
+        filename: Path to the file.
+        format: One of EXPORT_FORMATS.
+        kinds: Kind of each column, see value_kind, in column order.
+        batches: Batches as mappings of column name to values. numpy arrays
+                 of numbers are written to Arrow without copying.
+    """
+    if format == "csv":
+        with open(filename, "w", newline="") as file:
+            writer = csv.writer(file)
+            writer.writerow(kinds)
+            for batch in batches:
+                columns = [list(batch[name]) if name == COW_ID_COLUMN 
+                           else [_csv_cell(value, kind) for value in batch[name]]
+                           for name, kind in kinds.items()]
+                writer.writerows(zip(*columns))
+        return
+
+    schema = _arrow_schema(kinds)
+    if format == "parquet":
+        writer = pq.ParquetWriter(filename, schema)
+    else:
+        writer = pa.ipc.new_file(filename, schema)
+    with writer:
+        for batch in batches:
+            arrays = [_arrow_array(batch[field.name], field, kinds[field.name])
+                      for field in schema]
+            writer.write_batch(pa.record_batch(arrays, schema=schema))
+
+
+# Reading
+def _parse_cell(cell: str) -> Any:
+    if cell == "":
+        return None
+    try:
+        return json.loads(cell)
+    except ValueError:
+        return cell
+
+
+def _arrow_columns(batch: "pa.RecordBatch") -> Dict[str, Sequence[Any]]:
+    columns = {}
+    for field, array in zip(batch.schema, batch.columns):
+        if (field.metadata or {}).get(_KIND_KEY) == b"json":
+            columns[field.name] = [None if value is None else json.loads(value)
+                                   for value in array.to_pylist()]
+        elif np is not None and array.null_count == 0 and (
+                pa.types.is_integer(field.type) or pa.types.is_floating(field.type)):
+            columns[field.name] = array.to_numpy()
+        else:
+            columns[field.name] = array.to_pylist()
+    return columns
+
+
+def read_batches(filename: str,
+                 format: str,
+                 batch_size: int = 10000
+) -> Iterator[Dict[str, Sequence[Any]]]:
+    """
+    Read record batches written by write_batches.
+
+    Numeric columns without missing values are returned as numpy arrays,
+    other columns as lists. CSV cells are decoded as JSON where possible, so
+    strings that look like numbers, booleans or JSON are read as such.
+
+    Args:
+        filename: Path to the file.
+        format: One of EXPORT_FORMATS.
+        batch_size: Maximum number of rows per batch. Arrow IPC files are
+                    read in the batches they were written in.
+
+    Yields:
+        Each batch as a mapping of column name to values.
+    """
+    if format == "parquet":
+        for batch in pq.ParquetFile(filename).iter_batches(batch_size=batch_size):
+            yield _arrow_columns(batch)
+    elif format == "arrow":
+        with pa.memory_map(str(filename)) as source:
+            reader = pa.ipc.open_file(source)
+            for index in range(reader.num_record_batches):
+                yield _arrow_columns(reader.get_batch(index))
+    else:
+        with open(filename, newline="") as file:
+            reader = csv.reader(file)
+            names = next(reader, None)
+            if names is None:
+                return
+            while True:
+                rows = list(islice(reader, batch_size))
+                if not rows:
+                    return
+                columns = {name: list(values) for name, values in zip(names, zip(*rows))}
+                for name, values in columns.items():
+                    if name != COW_ID_COLUMN:
+                        columns[name] = [_parse_cell(cell) for cell in values]
+                yield columns
+
+
+def split_columns(names: List[str], results_key: str) -> Tuple[List[str], Dict[str, List[str]]]:
+    """
+    Split the columns of an exported file into input and result columns.
+
+    Args:
+        names: Column names.
+        results_key: Prefix of result columns.
+
+    Returns:
+        The input columns and the result columns of each model, by model name.
+    """
+    models = [name[len(RUN_ID_KEY) + 1:] for name in names
+              if name.startswith(RUN_ID_KEY + ".")]
+    result_columns = {}
+    for model_name in models:
+        prefix = f"{results_key}.{model_name}"
+        result_columns[model_name] = [name for name in names
+                                      if name == prefix or name.startswith(prefix + ".")]
+    inputs = [name for name in names if name not in (COW_ID_COLUMN, MISSING_COLUMN)
+              and not name.startswith(RUN_ID_KEY + ".")
+              and not name.startswith(results_key + ".")]
+    return inputs, result_columns
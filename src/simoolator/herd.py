@@ -1,308 +1,2957 @@
-from datetime import datetime
-import json
-from typing import Any, Callable, Dict
-
-import dill as pickle
-
-from simoolator.cow import Cow
-from simoolator.model_registry import ModelRegistry
-import simoolator.utils as utils
-
-class Herd:
-    """
-    The Herd class manages a collection of Cow instances and executes models on them.
-    """
-    # Initialization and State Management
-    def __init__(self, name: str) -> None:
-        """
-        Initialize a new Herd instance.
-
-        Args:
-            name: Name of the herd.
-        """
-        self.name = name
-        self.cows_in_herd = []
-        self.model_registry = ModelRegistry()
-        self.metadata = {}
-
-    def __getstate__(self) -> Dict[str, Any]:
-        """
-        Data to include when serializing.
-        """
-        state = {
-            "name": self.name,
-            "cows_in_herd": self.cows_in_herd,
-            "model_registry": self.model_registry,
-            "metadata": self.metadata
-        }
-        return state
-
-    def __setstate__(self, state: Dict[str, Any]) -> None:
-        """
-        Data to extract when loading from pickle.
-        """
-        self.name = state["name"]
-        self.cows_in_herd = state["cows_in_herd"]
-        self.model_registry = state["model_registry"]
-        self.metadata = state["metadata"]
-
-    def add_cow(self, cow: Cow) -> None:
-        """
-        Add a cow to the herd.
-
-        Args:
-            cow: Cow instance to add.
-        """
-        self.cows_in_herd.append(cow)
-
-    def load_cows_from_json(self, filename: str) -> None:
-        with open(filename, "r") as file:
-            data = json.load(file)
-            for cow_data in data:
-                cow = Cow(cow_id=cow_data["cow_id"], 
-                          input_data=cow_data["input_data"])
-                self.add_cow(cow)
-    
-    def save(self, filename: str) -> None:
-        """
-        Save the Herd instance to a pickle file.
-
-        Args:
-            filename: Path to the file.
-        """
-        with open(filename, "wb") as file:
-            pickle.dump(self, file)
-
-    @staticmethod
-    def load(filename: str) -> "Herd":
-        """
-        Load a Herd instance from a pickle file.
-
-        Args:
-            filename: Path to the file.
-
-        Returns:
-            Loaded Herd instance.
-        """
-        with open(filename, "rb") as file:
-            return pickle.load(file)
-     
-    # Execution Methods
-    def execute_method(self, method_name: str, *args, **kwargs) -> None:
-        """
-        Execute a method on all cows in the herd.
-
-        Args:
-            method_name: Name of the method to execute.
-        """
-        for cow in self.cows_in_herd:
-            getattr(cow, method_name)(*args, **kwargs)
-
-    def execute_model(self, 
-                      model_name: str, 
-                      execution_mode: str = "linear"
-    ) -> None:
-        """
-        Execute a registered model on all cows in the herd.
-
-        Args:
-            model_name: Name of the model to execute.
-            execution_mode: Execution mode ('linear', 'cpu', 'gpu').
-        """
-        model_function, input_mapping = self.model_registry.get_model(model_name)
-        if execution_mode == "linear":
-            self._execute_model_linear(model_function, input_mapping)
-        elif execution_mode == "cpu":
-            self._execute_model_cpu(model_function, input_mapping)
-        elif execution_mode == "gpu":
-            self._execute_model_gpu(model_function, input_mapping)
-        else:
-            raise ValueError("Invalid execution mode. Choose from 'linear', 'cpu', or 'gpu'.")
-
-    def _execute_model_linear(self, 
-                              model_function: Callable, 
-                              input_mapping: Dict[str, str]
-    ) -> None:
-        """
-        Execute a model on all cows in the herd sequentially.
-
-        Args:
-            model_function: Model function to execute.
-            input_mapping: Mapping of inputs for the model function.
-        """
-        start_time = datetime.now()
-        exceptions = {}
-
-        for cow in self.cows_in_herd:
-            try:
-                cow.run_model(model_function, input_mapping)
-            except Exception as e:
-                exceptions[cow.cow_id] = e
-        
-        end_time = datetime.now()
-        execution_time = (end_time - start_time).total_seconds()
-                
-        metadata_entry = {
-            "model_name": model_function.__name__,
-            "execution_mode": "linear",
-            "start_time": start_time,
-            "end_time": end_time,
-            "execution_time_seconds": execution_time,
-            "errors": exceptions
-        }
-        self.metadata[f"{model_function.__name__}_{start_time.strftime('%Y%m%d_%H%M%S')}"] = metadata_entry
-        
-        if exceptions:
-            print("\nThe following Cows failed to run the model: ")
-            for cow_id, execption in exceptions.items():
-                print(f'{cow_id}: {execption}')
-
-    def _execute_model_cpu(self, 
-                           model_function: Callable, 
-                           input_mapping: Dict[str, str]
-    ) -> None:
-        """
-        Execute a model on all cows in the herd using parallel CPU execution.
-        """
-        raise NotImplementedError("Parallel CPU execution is not implemented yet.")
-
-    def _execute_model_gpu(self, 
-                           model_function: Callable, 
-                           input_mapping: Dict[str, str]
-    ) -> None:
-        """
-        Execute a model on all cows in the herd using GPU execution.
-        """
-        raise NotImplementedError("GPU execution is not implemented yet.")
-
-    # Model Registration
-    def register_model(self, model_function: Callable) -> None:
-        """
-        Register a model function in the ModelRegistry.
-
-        Args:
-            model_function: Function to register.
-        """
-        if not self.cows_in_herd:
-            raise ValueError("No cows in the herd to determine the input structure.")
-        input_structure = self.cows_in_herd[0].input
-        self.model_registry.register_model(model_function, input_structure)
-
-    # Utilities and Information
-    def list_cows(self) -> None:
-        """Display all cows in the herd."""
-        print("Index".ljust(5), "| Cow ID")
-        for index, cow in enumerate(self.cows_in_herd):
-            print(f"{index}".ljust(5), f"| {cow.cow_id}")
-
-    def list_results(self, cow_index: int) -> None:
-        """
-        Display results for a specific cow.
-
-        Args:
-            cow_index: Index of the cow in the herd.
-        """
-        cow = self.cows_in_herd[cow_index]
-        cow.list_results()
-
-    def get_result(self, cow_index: int, result_id: str) -> Any:
-        """
-        Return a specific result for a specific cow.
-
-        Args:
-            cow_index: Index of the cow in the herd.
-            result_id: ID of the result to return.
-        """
-        cow = self.cows_in_herd[cow_index]
-        result = cow.get_result(result_id)
-        return result
-
-    def check_input(self) -> None:
-        """
-        Display the input structure of the first cow in the herd.
-        """
-        cow = self.cows_in_herd[0]
-        cow.print_input_structure()
-
-    def check_data_consistency(self) -> bool:
-        """
-        Check that all cows in the herd have a consistent input structure.
-
-        Returns:
-            True if all cows have a consistent input structure, False otherwise.
-        """
-        if not self.cows_in_herd:
-            return True
-        
-        inconsistent_cows = []
-        first_instance = self.cows_in_herd[0].get_input_structure()
-        for cow in self.cows_in_herd[1:]:
-            if cow.get_input_structure() != first_instance:
-                inconsistent_cows.append(cow.cow_id)
-    
-        if inconsistent_cows:
-            print(f"The following cow IDs have issues with their input data: {inconsistent_cows}")
-            return False
-        return True
-
-    def get_input_mapping(self, model_name: str) -> None:
-        """
-        Display the input mapping for a registered model.
-
-        Args:
-            model_name: Name of the model.
-        """
-        if self.check_data_consistency():
-            _ , input_mapping = self.model_registry.get_model(model_name)
-            input_data = self.cows_in_herd[0].input
-            utils.print_nested_dict_tree(
-                input_data, input_mapping=(model_name, input_mapping)
-                )
-        else:
-            raise ValueError("Structure of input data is inconsistent across herd")
-    
-    def list_models(self, verbose=True) -> None:
-        """
-        List all models registered to Herd
-
-        Args:
-            verbose: If True print full input mapping. If False print a table
-                     with model names and arguments.
-        """
-        models = [key for key in self.model_registry.models.keys()]
-        
-        if verbose:
-            for model in models:
-                print("\n" + "-"*25 + "\n")
-                self.get_input_mapping(model)
-        
-        if not verbose:
-            print("Model".ljust(10), "| Arguments")
-            for model in models:
-                args = [arg for arg in self.model_registry.models[model]["input_mapping"].keys()]
-                print(f"{model}".ljust(10), f"| {args}")
-
-    def remove_model(self, model_name: str) -> None:
-        """
-        Remove a model from ModelRegistry
-
-        Args:
-            model_name: Name of model to remove
-        """
-        if model_name in self.model_registry.models.keys():
-            self.model_registry.models.pop(model_name)
-            print(f"{model_name} has been removed.")
-        else:
-            print(f"ERROR: {model_name} is not registered.")
-
-    def get_model(self, model_name: str) -> Callable:
-        """
-        Return a function from ModelRegistry
-
-        Args:
-            model_name: Name of function to return
-        """
-
-        if model_name in self.model_registry.models.keys():
-            return self.model_registry.models[model_name]["function"]
-        print(f"{model_name} is not registered")
+import asyncio
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from datetime import datetime
+import functools
+import inspect
+import math
+import os
+import sys
+import threading
+from time import perf_counter_ns
+from typing import (
+    TYPE_CHECKING, Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+    )
+
+import dill as pickle
+try:
+    import numpy as np
+except ImportError: # numpy is only required for vectorized execution
+    np = None
+
+from simoolator.aggregation import DEFAULT_STATS, ResultAggregator, validate_stats
+from simoolator.cache import ResultCache, fingerprint_inputs, model_fingerprint
+from simoolator.checkpoint import Checkpoints, ResultLog
+from simoolator.cow import METADATA_LEVELS, CompactCow, Cow, make_metadata
+from simoolator.export import (
+    COW_ID_COLUMN, MISSING_COLUMN, RUN_ID_KEY, as_list, concat_columns, flatten_value, infer_format, 
+    merge_kinds, read_batches, split_columns, unflatten, value_kind, write_batches
+    )
+from simoolator.loaders import iter_cow_records, iter_cows
+from simoolator.model_registry import (
+    RESULTS_KEY, InputAccessor, ModelRegistry, compile_input_mapping, get_used_defaults
+    )
+from simoolator.result_store import ResultStore, StoredResult
+from simoolator.storage import ShardedCowList, ShardedHerdStore
+from simoolator.predicates import Predicate, filter_positions
+from simoolator.profiling import Profiler
+from simoolator.sweep import (
+    SweepResult, as_row, assemble_blocks, block_from_results, expand_grid, is_numeric, 
+    split_sweep_output
+    )
+import simoolator.utils as utils
+
+EXECUTION_MODES = ("linear", "cpu", "threads", "vectorized", "async", "gpu")
+_INVALID_MODE = (
+    f"Invalid execution mode. Choose from {', '.join(repr(mode) for mode in EXECUTION_MODES)}."
+    )
+
+if TYPE_CHECKING:
+    from simoolator.columnar import ColumnarStore
+
+
+def _run_model_chunk(model_payload: bytes, 
+                     chunk: List[Tuple[int, str, Any]],
+                     profile: bool = False
+) -> bytes:
+    """
+    Run a model on a chunk of cows inside a worker process.
+
+    Args:
+        model_payload: dill serialized tuple of the model function, input 
+                       mapping, compiled accessors, used default arguments, 
+                       metadata level and run_id.
+        chunk: List of (index, cow_id, input_data) tuples.
+        profile: If True phase timings are recorded in a Profiler.
+
+    Returns:
+        dill serialized tuple of a list of (index, result_id, result, metadata, 
+        error) tuples and the Profiler, or None if profile is False.
+    """
+    (model_function, input_mapping, accessors, 
+     used_defaults, metadata_level, run_id) = pickle.loads(model_payload)
+    profiler = Profiler() if profile else None
+    outcomes = []
+    for index, cow_id, input_data in chunk:
+        cow = Cow(cow_id=cow_id, input_data=input_data)
+        try:
+            result_id = cow.run_model(
+                model_function, input_mapping, accessors, used_defaults, 
+                profiler, metadata_level, run_id
+                )
+        except Exception as e:
+            outcomes.append((index, None, None, None, e))
+            continue
+        outcomes.append(
+            (index, result_id, cow.results[result_id], cow.metadata.get(result_id), None)
+            )
+    return pickle.dumps((outcomes, profiler))
+
+
+def _split_batch_output(output: Any, n_cows: int) -> List[Any]:
+    """
+    Split the output of a vectorized model call into per-cow results.
+
+    Arrays are split along their first axis and lists, tuples and dicts are 
+    split element-wise so each cow gets a result with the same shape the model 
+    would return for a single cow.
+
+    Args:
+        output: Value returned by the model for the whole batch.
+        n_cows: Number of cows in the batch.
+
+    Returns:
+        List with one result per cow.
+
+    Raises:
+        ValueError: If the output cannot be split into n_cows results.
+    """
+    if isinstance(output, np.ndarray) and output.ndim > 0 and len(output) == n_cows:
+        return output.tolist()
+    if isinstance(output, (list, tuple)):
+        container = tuple if isinstance(output, tuple) else list
+        parts = [_split_batch_output(item, n_cows) for item in output]
+        if not parts:
+            return [container() for _ in range(n_cows)]
+        return [container(values) for values in zip(*parts)]
+    if isinstance(output, dict):
+        keys = list(output.keys())
+        parts = [_split_batch_output(output[key], n_cows) for key in keys]
+        return [dict(zip(keys, values)) for values in zip(*parts)]
+    raise ValueError(
+        f"Output of type {type(output).__name__} can not be split across {n_cows} cows."
+        )
+
+
+def _structure_differences(expected: Any, structure: Any, path: str = "") -> List[str]:
+    """
+    Return the paths at which two results of Cow.get_input_structure differ.
+
+    Args:
+        expected: Expected structure.
+        structure: Structure to compare.
+        path: Path of the structures in the input data.
+    """
+    if isinstance(expected, dict) and isinstance(structure, dict):
+        paths = []
+        for key in list(expected) + [key for key in structure if key not in expected]:
+            key_path = f"{path}.{key}" if path else str(key)
+            if key not in expected or key not in structure:
+                paths.append(key_path)
+            else:
+                paths += _structure_differences(expected[key], structure[key], key_path)
+        return paths
+    return [] if expected == structure else [path]
+
+
+def _error_message(error: Optional[Exception]) -> str:
+    """
+    Return the message of an exception raised by a model, logged by 
+    checkpointed runs.
+    """
+    if error is None:
+        return "Unknown error"
+    return f"{type(error).__name__}: {error}"
+
+
+class _ChainedCow(Cow):
+    """
+    View of a cow used to run models with arguments mapped to results of 
+    other models.
+
+    The input holds the input data of the cow and, under RESULTS_KEY, the 
+    latest result of each upstream model, so the compiled accessors resolve 
+    both. Results and metadata are stored in the dicts of the wrapped cow.
+    """
+    def __init__(self, cow: Cow, upstream_results: Dict[str, Any]) -> None:
+        """
+        Initialize a view of cow.
+
+        Args:
+            cow: Cow to wrap.
+            upstream_results: Latest result of each upstream model by name.
+        """
+        self.cow_id = cow.cow_id
+        self.input = {**cow.input, RESULTS_KEY: upstream_results}
+        self.results = cow.results
+        self.metadata = cow.metadata
+
+
+# Placeholder for the cells of paths a cow does not have in Herd.export
+_ABSENT = object()
+
+# Counts of run metadata that are added up over the batches of a run
+_BATCH_COUNTS = ("vectorized_cows", "fallback_cows", "cache_hits", "cache_misses")
+
+
+class Herd:
+    """
+    The Herd class manages a collection of Cow instances and executes models on them.
+    """
+    # Initialization and State Management
+    def __init__(self, name: str, metadata_level: str = "full") -> None:
+        """
+        Initialize a new Herd instance.
+
+        Args:
+            name: Name of the herd.
+            metadata_level: Metadata stored with each result. "full" stores 
+                            the inputs, default arguments and timing of every 
+                            run, "summary" a compact MetadataSummary and 
+                            "none" nothing. Model name and default arguments 
+                            are always stored once per run in self.metadata.
+        """
+        if metadata_level not in METADATA_LEVELS:
+            raise ValueError(f"Invalid metadata level. Choose from {', '.join(METADATA_LEVELS)}.")
+        self.name = name
+        self.metadata_level = metadata_level
+        self.cows_in_herd = []
+        self.model_registry = ModelRegistry()
+        self.metadata = {}
+        self.result_store = None
+        self.model_state = {}
+        self.groups = {}
+        self.checkpoints = None
+        self._shard_store = None
+        self._cow_index = None
+        self._indexed_cows = 0
+        self._secondary_indexes = {}
+        self._run_ids = set()
+        self._report_errors = True
+        # Structure groups last reported by _warn_inconsistent_structure
+        self._reported_structure = None
+        # Run id shared by the batches of stream_model_from_json
+        self._stream_run_id = None
+        self._lock = threading.RLock()
+
+    def __getstate__(self) -> Dict[str, Any]:
+        """
+        Data to include when serializing.
+        """
+        state = {
+            "name": self.name,
+            "cows_in_herd": self.cows_in_herd,
+            "model_registry": self.model_registry,
+            "metadata": self.metadata,
+            "result_store": self.result_store,
+            "model_state": self.model_state,
+            "metadata_level": self.metadata_level,
+            "groups": self.groups,
+            "indexes": self._index_definitions(),
+            "checkpoints": self.checkpoints
+        }
+        return state
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        """
+        Data to extract when loading from pickle.
+        """
+        self.name = state["name"]
+        self.cows_in_herd = state["cows_in_herd"]
+        self.model_registry = state["model_registry"]
+        self.metadata = state["metadata"]
+        self.result_store = state.get("result_store")
+        self.model_state = state.get("model_state", {})
+        self.metadata_level = state.get("metadata_level", "full")
+        self.groups = state.get("groups", {})
+        self.checkpoints = state.get("checkpoints")
+        self._shard_store = None
+        self._cow_index = None
+        self._indexed_cows = 0
+        # Indexes are rebuilt on their first lookup
+        self._secondary_indexes = {index_name: (key, None) 
+                                   for index_name, key in state.get("indexes", {}).items()}
+        self._run_ids = set()
+        self._report_errors = True
+        # Structure groups last reported by _warn_inconsistent_structure
+        self._reported_structure = None
+        # Run id shared by the batches of stream_model_from_json
+        self._stream_run_id = None
+        self._lock = threading.RLock()
+
+    def add_cow(self, cow: Cow) -> None:
+        """
+        Add a cow to the herd.
+
+        If the herd uses columnar storage the input data of the cow is copied 
+        into the store and a view of the cow is added instead.
+
+        Args:
+            cow: Cow instance to add.
+
+        Raises:
+            ValueError: If a cow with the same cow_id is already in the herd.
+        """
+        cow_index = self._get_cow_index()
+        if cow.cow_id in cow_index:
+            raise ValueError(f"Cow {cow.cow_id} is already in the herd.")
+        self.cows_in_herd.append(cow)
+        cow_index[cow.cow_id] = len(self.cows_in_herd) - 1
+        self._indexed_cows += 1
+        for key, index in self._secondary_indexes.values():
+            if index is not None:
+                self._index_cow(key, index, cow)
+
+    @property
+    def columnar_store(self) -> Optional["ColumnarStore"]:
+        """
+        ColumnarStore holding the input data, or None for list storage.
+        """
+        if isinstance(self.cows_in_herd, ShardedCowList):
+            # Sharded herds hold their ShardedHerdStore in the same attribute
+            return None
+        return getattr(self.cows_in_herd, "store", None)
+
+    def to_columnar(self) -> None:
+        """
+        Move the input data of all cows into a ColumnarStore.
+
+        Each leaf of the input structure is stored in one typed array and the 
+        cows in the herd are replaced by lightweight views into the store. 
+        Results and metadata are kept. All cows must have the same input keys.
+        """
+        from simoolator.columnar import ColumnarCowList, ColumnarStore
+
+        if self.columnar_store is not None:
+            return
+        if not self.cows_in_herd:
+            raise ValueError("No cows in the herd to determine the input structure.")
+        store = ColumnarStore(
+            self.cows_in_herd[0].input, capacity=len(self.cows_in_herd)
+            )
+        self.cows_in_herd = ColumnarCowList(store, self.cows_in_herd)
+
+    def load_cows_from_json(self, filename: str, compact: bool = False) -> None:
+        """
+        Add the cows in a JSON array or NDJSON file to the herd.
+
+        The file is parsed incrementally so only the cows, not the raw file, 
+        are held in memory.
+
+        Args:
+            filename: Path to the file.
+            compact: If True load the cows as CompactCow to reduce memory use.
+
+        Raises:
+            ValueError: If the file contains duplicate cow IDs or IDs already 
+                        in the herd. No cows are added in that case.
+        """
+        cow_class = CompactCow if compact else Cow
+        cow_index = self._get_cow_index()
+        cows = []
+        seen = set()
+        duplicates = []
+        for cow_data in iter_cow_records(filename):
+            cow = cow_class(cow_id=cow_data["cow_id"], 
+                            input_data=cow_data["input_data"])
+            if cow.cow_id in seen or cow.cow_id in cow_index:
+                duplicates.append(cow.cow_id)
+            seen.add(cow.cow_id)
+            cows.append(cow)
+        if duplicates:
+            raise ValueError(f"Duplicate cow IDs in {filename}: {duplicates}")
+        for cow in cows:
+            self.add_cow(cow)
+    
+    def save(self, filename: str) -> None:
+        """
+        Save the Herd instance to a pickle file.
+
+        Args:
+            filename: Path to the file.
+        """
+        with open(filename, "wb") as file:
+            pickle.dump(self, file)
+
+    @staticmethod
+    def load(filename: str) -> "Herd":
+        """
+        Load a Herd instance from a pickle file.
+
+        Args:
+            filename: Path to the file.
+
+        Returns:
+            Loaded Herd instance.
+        """
+        with open(filename, "rb") as file:
+            return pickle.load(file)
+     
+    def save_chunked(self, directory: str, shard_size: int = 10000) -> None:
+        """
+        Save the Herd instance to a directory of shards.
+
+        The first save writes the cows in shards of shard_size cows. Later 
+        saves to the same directory only append the cows, results and 
+        metadata added since the previous save. Changes to the input data of 
+        saved cows and removed results are not written. The directory of the 
+        result store is saved relative to directory, so the two can be moved 
+        together. Groups and the definitions of secondary indexes are saved, 
+        indexes are rebuilt on their first lookup after loading.
+
+        Args:
+            directory: Path to the directory.
+            shard_size: Number of cows in each shard.
+        """
+        store = self._shard_store
+        if store is None or os.path.abspath(store.directory) != os.path.abspath(directory):
+            store = ShardedHerdStore.create(directory, self.name, shard_size)
+        settings = {
+            "metadata_level": self.metadata_level,
+            "groups": self.groups,
+            "result_store": None if self.result_store is None 
+                            else os.path.relpath(self.result_store.directory, directory)
+        }
+        store.save(
+            self.name, self.cows_in_herd, self.model_registry, self.metadata, 
+            self.model_state, settings, self._index_definitions()
+            )
+        self._shard_store = store
+
+    @staticmethod
+    def load_chunked(directory: str) -> "Herd":
+        """
+        Load a Herd instance saved with save_chunked.
+
+        Shards are loaded the first time one of their cows is accessed.
+
+        Args:
+            directory: Path to the directory.
+
+        Returns:
+            Loaded Herd instance.
+        """
+        store = ShardedHerdStore.open(directory)
+        settings = store.load_settings()
+        herd = Herd(store.index["name"], settings.get("metadata_level", "full"))
+        herd.cows_in_herd = ShardedCowList(store)
+        herd.model_registry = store.load_registry()
+        herd.metadata = store.load_metadata()
+        herd.model_state = store.load_model_state()
+        herd.groups = settings.get("groups", {})
+        herd._secondary_indexes = {index_name: (key, None) 
+                                   for index_name, key in store.load_indexes().items()}
+        if settings.get("result_store") is not None:
+            herd.result_store = ResultStore(
+                os.path.normpath(os.path.join(directory, settings["result_store"]))
+                )
+        herd._shard_store = store
+        return herd
+
+    def export(self, 
+               filename: str, 
+               format: Optional[str] = None,
+               models: Optional[Iterable[str]] = None,
+               batch_size: int = 10000
+    ) -> None:
+        """
+        Export the input data and latest results of the herd to a columnar file.
+
+        Each leaf of the input data is a column named by its dotted path. The 
+        latest result of each model is stored in columns starting with 
+        "@results.<model_name>", one per leaf of dict results, and its 
+        result_id in the column "@run_id.<model_name>". Values other than 
+        bools, numbers and strings are stored as JSON. If the input data or 
+        results of some cows lack paths of others, the column "@missing" 
+        lists the absent columns of each cow, so they can be told apart from 
+        leaves holding None. Cows are written in record batches so the table 
+        is never built in memory, numeric columns of a ColumnarStore are 
+        passed to Arrow without copying. Read the file with import_cows.
+
+        Args:
+            filename: Path to the file.
+            format: "parquet", "arrow" (Arrow IPC) or "csv", inferred from the 
+                    extension of filename if not given. Parquet and Arrow 
+                    files require pyarrow.
+            models: Names of the models whose results are exported, defaults 
+                    to every model that ran on the herd.
+            batch_size: Number of cows per record batch.
+        """
+        format = infer_format(filename, format)
+        if batch_size < 1:
+            raise ValueError("batch_size must be positive.")
+        models = list(self.model_state) if models is None else list(models)
+        for model_name in models:
+            if model_name not in self.model_state:
+                raise ValueError(f"{model_name} has no results in the herd.")
+        latest = {model_name: self.model_state[model_name]["cows"] for model_name in models}
+        cows = self.cows_in_herd
+        store = self.columnar_store
+
+        def results_of(cow: Cow) -> Iterator[Tuple[str, str, Any]]:
+            for model_name, state in latest.items():
+                _, result_id = state.get(cow.cow_id, (None, None))
+                if result_id is not None and result_id in cow.results:
+                    yield model_name, result_id, cow.get_result(result_id)
+
+        # Columns and their kinds must be known before the first batch
+        input_kinds = {}
+        result_kinds = {model_name: {f"{RUN_ID_KEY}.{model_name}": "str"} for model_name in models}
+        if store is not None:
+            rows = [cow._row for cow in cows]
+            for path in store.paths:
+                column = store.column(path)
+                if column.dtype != object:
+                    input_kinds[path] = value_kind(column.dtype.type(0))
+                    continue
+                input_kinds[path] = None
+                for value in column[rows]:
+                    input_kinds[path] = merge_kinds(input_kinds[path], value_kind(value))
+        # Number of leaves of each input and result, to detect absent paths
+        input_counts = []
+        result_counts = []
+        for cow in cows:
+            if store is None:
+                count = 0
+                for path, value in flatten_value(cow.input, ""):
+                    input_kinds[path] = merge_kinds(input_kinds.get(path), value_kind(value))
+                    count += 1
+                input_counts.append(count)
+            for model_name, _, result in results_of(cow):
+                kinds = result_kinds[model_name]
+                count = 0
+                for path, value in flatten_value(result, f"{RESULTS_KEY}.{model_name}"):
+                    kinds[path] = merge_kinds(kinds.get(path), value_kind(value))
+                    count += 1
+                result_counts.append((model_name, count))
+        sparse = (any(count != len(input_kinds) for count in input_counts) 
+                  or any(count != len(result_kinds[model_name]) - 1 
+                         for model_name, count in result_counts))
+        kinds = {COW_ID_COLUMN: "str", **input_kinds}
+        for model_kinds in result_kinds.values():
+            kinds.update(model_kinds)
+        # Model of each result column, run_id columns are always filled
+        column_models = {path: model_name for model_name, model_kinds in result_kinds.items() 
+                         for path in model_kinds if not path.startswith(RUN_ID_KEY)}
+        if sparse:
+            kinds[MISSING_COLUMN] = "json"
+
+        def batches() -> Iterator[Dict[str, Any]]:
+            for start in range(0, len(cows), batch_size):
+                batch = cows[start:start + batch_size]
+                columns = {name: [_ABSENT if sparse else None] * len(batch) for name in kinds}
+                columns[COW_ID_COLUMN] = [cow.cow_id for cow in batch]
+                if store is not None:
+                    rows = [cow._row for cow in batch]
+                    # Cows of a columnar herd are usually consecutive rows, 
+                    # slices of the columns are views
+                    if rows == list(range(rows[0], rows[0] + len(rows))):
+                        rows = slice(rows[0], rows[0] + len(rows))
+                    for path in input_kinds:
+                        columns[path] = store.column(path)[rows]
+                else:
+                    for row, cow in enumerate(batch):
+                        for path, value in flatten_value(cow.input, ""):
+                            columns[path][row] = value
+                for row, cow in enumerate(batch):
+                    for model_name, result_id, result in results_of(cow):
+                        columns[f"{RUN_ID_KEY}.{model_name}"][row] = result_id
+                        for path, value in flatten_value(result, f"{RESULTS_KEY}.{model_name}"):
+                            columns[path][row] = value
+                if sparse:
+                    missing = [[] for _ in batch]
+                    for name, values in columns.items():
+                        if not isinstance(values, list) or name == MISSING_COLUMN:
+                            continue
+                        model_name = column_models.get(name)
+                        run_ids = columns[f"{RUN_ID_KEY}.{model_name}"] if model_name else None
+                        for row, value in enumerate(values):
+                            if value is not _ABSENT:
+                                continue
+                            values[row] = None
+                            # Result columns of cows without a result are empty
+                            if model_name is None or run_ids[row] not in (None, _ABSENT):
+                                missing[row].append(name)
+                    columns[MISSING_COLUMN] = [names or None for names in missing]
+                yield columns
+
+        write_batches(filename, format, kinds, batches())
+
+    def import_cows(self, 
+                    filename: str, 
+                    format: Optional[str] = None, 
+                    columnar: bool = False,
+                    batch_size: int = 10000
+    ) -> None:
+        """
+        Add the cows in a file written by export to the herd.
+
+        Input columns are nested back into the input data of each cow. 
+        Exported results are stored under their result_id and recorded as 
+        the latest result of their model. Imported results have no model 
+        fingerprint, so incremental runs treat them as out of date. Paths 
+        listed in the "@missing" column of a cow are left out of its input 
+        data and results, empty values are None. Columnar imports keep every 
+        path.
+
+        Args:
+            filename: Path to the file.
+            format: "parquet", "arrow" (Arrow IPC) or "csv", inferred from the 
+                    extension of filename if not given.
+            columnar: If True the input columns are loaded into a 
+                      ColumnarStore as they are, without building the input 
+                      data of each cow. The herd must be empty.
+            batch_size: Number of rows read at a time.
+
+        Raises:
+            ValueError: If the file contains duplicate cow IDs or IDs already 
+                        in the herd. No cows are added in that case.
+        """
+        format = infer_format(filename, format)
+        if columnar and len(self.cows_in_herd):
+            raise ValueError("A columnar import requires an empty herd.")
+        cow_index = self._get_cow_index()
+        cow_ids = []
+        cows = []
+        input_chunks = {}
+        results = []
+        seen = set()
+        duplicates = []
+        for batch in read_batches(filename, format, batch_size):
+            input_names, result_names = split_columns(list(batch), RESULTS_KEY)
+            offset = len(cow_ids)
+            batch_ids = [str(cow_id) for cow_id in batch[COW_ID_COLUMN]]
+            missing = as_list(batch[MISSING_COLUMN]) if MISSING_COLUMN in batch else None
+            for cow_id in batch_ids:
+                if cow_id in seen or cow_id in cow_index:
+                    duplicates.append(cow_id)
+                seen.add(cow_id)
+            cow_ids += batch_ids
+
+            if columnar:
+                for name in input_names:
+                    input_chunks.setdefault(name, []).append(batch[name])
+            else:
+                paths = [tuple(name.split(".")) for name in input_names]
+                columns = [as_list(batch[name]) for name in input_names]
+                input_positions = {name: position for position, name in enumerate(input_names)}
+                for row, cow_id in enumerate(batch_ids):
+                    absent = ()
+                    if missing is not None and missing[row]:
+                        absent = {input_positions.get(name) for name in missing[row]}
+                    cows.append(Cow(cow_id=cow_id, input_data=unflatten(
+                        paths, [column[row] for column in columns], absent
+                        )))
+
+            for model_name, names in result_names.items():
+                prefix = f"{RESULTS_KEY}.{model_name}"
+                scalar = as_list(batch[prefix]) if prefix in names else None
+                leaf_names = [name for name in names if name != prefix]
+                paths = [tuple(name[len(prefix) + 1:].split(".")) for name in leaf_names]
+                columns = [as_list(batch[name]) for name in leaf_names]
+                for row, result_id in enumerate(as_list(batch[f"{RUN_ID_KEY}.{model_name}"])):
+                    if result_id is None:
+                        continue
+                    absent = set(missing[row] or ()) if missing is not None else None
+                    if absent is None:
+                        # Files written without the missing column
+                        is_scalar = scalar is not None and (scalar[row] is not None 
+                                                            or not leaf_names)
+                    else:
+                        is_scalar = scalar is not None and prefix not in absent
+                    if is_scalar:
+                        result = scalar[row]
+                    else:
+                        result = unflatten(
+                            paths, [column[row] for column in columns], 
+                            {position for position, name in enumerate(leaf_names) 
+                             if name in (absent or ())}
+                            )
+                    results.append((offset + row, model_name, str(result_id), result))
+
+        if duplicates:
+            raise ValueError(f"Duplicate cow IDs in {filename}: {duplicates}")
+        if columnar and cow_ids:
+            from simoolator.columnar import ColumnarCow, ColumnarCowList, ColumnarStore
+
+            store = ColumnarStore.from_columns(
+                {name: concat_columns(chunks) for name, chunks in input_chunks.items()}
+                )
+            self.cows_in_herd = ColumnarCowList(store)
+            cows = [ColumnarCow(cow_id, store, row) for row, cow_id in enumerate(cow_ids)]
+        for cow in cows:
+            self.add_cow(cow)
+
+        with self._lock:
+            for index, model_name, result_id, result in results:
+                cow = cows[index]
+                cow.store_result(result_id, result, None)
+                state = self.model_state.setdefault(
+                    model_name, {"model_key": None, "cows": {}, "runs": {}}
+                    )
+                state["cows"][cow.cow_id] = (None, result_id)
+                state.setdefault("runs", {}).setdefault(result_id, {})[cow.cow_id] = None
+
+    def _view(self, cows: List[Cow]) -> "Herd":
+        """
+        Return a Herd containing the given cows that shares the model registry 
+        and metadata of this herd. Cow instances are not copied.
+
+        Args:
+            cows: Cows to include.
+        """
+        view = Herd(self.name, self.metadata_level)
+        store = self.columnar_store
+        if store is not None:
+            from simoolator.columnar import ColumnarCowList
+            cows = ColumnarCowList(store, cows)
+        view.cows_in_herd = cows
+        view.model_registry = self.model_registry
+        view.metadata = self.metadata
+        view.result_store = self.result_store
+        view.model_state = self.model_state
+        view.groups = self.groups
+        view.checkpoints = self.checkpoints
+        view._run_ids = self._run_ids
+        view._lock = self._lock
+        return view
+
+    # Cow Management
+    def _get_cow_index(self) -> Dict[str, int]:
+        """
+        Return the index from cow_id to position, rebuilding it if cows were 
+        added to cows_in_herd directly.
+        """
+        if self._cow_index is None or self._indexed_cows != len(self.cows_in_herd):
+            cow_ids = getattr(self.cows_in_herd, "cow_ids", None)
+            if cow_ids is not None:
+                # Sharded herds list the ids without loading any shard
+                cow_ids = cow_ids()
+            else:
+                cow_ids = [cow.cow_id for cow in self.cows_in_herd]
+            self._cow_index = {}
+            for position, cow_id in enumerate(cow_ids):
+                self._cow_index.setdefault(cow_id, position)
+            self._indexed_cows = len(cow_ids)
+        return self._cow_index
+
+    def get_cow_position(self, cow_id: Union[int, float, str]) -> int:
+        """
+        Return the position of a cow in cows_in_herd.
+
+        Args:
+            cow_id: ID of the cow.
+        """
+        cow_id = str(cow_id)
+        position = self._get_cow_index().get(cow_id)
+        if position is None or self.cows_in_herd[position].cow_id != cow_id:
+            # The list was changed without updating the index
+            self._cow_index = None
+            position = self._get_cow_index().get(cow_id)
+            if position is None:
+                raise ValueError(f"Cow {cow_id} is not in the herd.")
+        return position
+
+    def get_cow(self, cow_id: Union[int, float, str]) -> Cow:
+        """
+        Return the cow with the given ID.
+
+        Args:
+            cow_id: ID of the cow.
+        """
+        return self.cows_in_herd[self.get_cow_position(cow_id)]
+
+    def _resolve_cow(self, cow: Union[int, str]) -> Cow:
+        """
+        Return a cow by index in the herd if cow is an int, otherwise by ID.
+        """
+        if isinstance(cow, int):
+            return self.cows_in_herd[cow]
+        return self.get_cow(cow)
+
+    def remove_cow(self, cow_id: Union[int, float, str]) -> Cow:
+        """
+        Remove a cow from the herd.
+
+        Args:
+            cow_id: ID of the cow.
+
+        Returns:
+            The removed cow.
+        """
+        position = self.get_cow_position(cow_id)
+        cow = self.cows_in_herd[position]
+        try:
+            del self.cows_in_herd[position]
+        except TypeError:
+            raise ValueError(
+                "Cows can't be removed from a herd loaded with load_chunked."
+                ) from None
+        cow_index = self._cow_index
+        if cow_index is not None and self._indexed_cows == len(self.cows_in_herd) + 1:
+            # Cows after the removed one move up by one position
+            del cow_index[cow.cow_id]
+            for other_id, other_position in cow_index.items():
+                if other_position > position:
+                    cow_index[other_id] = other_position - 1
+            self._indexed_cows -= 1
+        else:
+            self._cow_index = None
+        for _, index in self._secondary_indexes.values():
+            for cow_ids in (index or {}).values():
+                if cow.cow_id in cow_ids:
+                    cow_ids.remove(cow.cow_id)
+        for cow_ids in self.groups.values():
+            if cow.cow_id in cow_ids:
+                cow_ids.remove(cow.cow_id)
+        for state in self.model_state.values():
+            state["cows"].pop(cow.cow_id, None)
+            for cow_ids in state.get("runs", {}).values():
+                cow_ids.pop(cow.cow_id, None)
+        return cow
+
+    def add_group(self, group_name: str, cow_ids: Iterable[Union[int, float, str]]) -> None:
+        """
+        Add cows to a named group, creating the group if needed.
+
+        Args:
+            group_name: Name of the group.
+            cow_ids: IDs of the cows to add.
+        """
+        group = self.groups.setdefault(group_name, [])
+        members = set(group)
+        for cow_id in cow_ids:
+            cow_id = self.get_cow(cow_id).cow_id
+            if cow_id not in members:
+                group.append(cow_id)
+                members.add(cow_id)
+
+    def remove_group(self, group_name: str) -> None:
+        """
+        Remove a group. The cows stay in the herd.
+
+        Args:
+            group_name: Name of the group.
+        """
+        if group_name not in self.groups:
+            raise ValueError(f"Group {group_name} does not exist.")
+        del self.groups[group_name]
+
+    @staticmethod
+    def _index_cow(key: Union[str, Callable[[Cow], Any]], 
+                   index: Dict[Any, List[str]], 
+                   cow: Cow
+    ) -> None:
+        value = cow.get_input_value(key) if isinstance(key, str) else key(cow)
+        try:
+            index.setdefault(value, []).append(cow.cow_id)
+        except TypeError:
+            raise ValueError(
+                f"Cow {cow.cow_id}: index values must be hashable, got {type(value).__name__}."
+                ) from None
+
+    def create_index(self, 
+                     index_name: str, 
+                     key: Union[str, Callable[[Cow], Any]]
+    ) -> None:
+        """
+        Create a secondary index grouping cow IDs by a value.
+
+        The index is kept up to date as cows are added or removed. Changes to 
+        the input data of cows already in the herd are not tracked, call 
+        create_index again after modifying inputs. The key is saved with the 
+        herd and the index rebuilt on its first lookup after loading.
+
+        Args:
+            index_name: Name of the index.
+            key: Dot-separated path into the input data, or a function 
+                 returning the value for a cow.
+        """
+        self._secondary_indexes[index_name] = (key, None)
+        self._get_index(index_name)
+
+    def _get_index(self, index_name: str) -> Dict[Any, List[str]]:
+        """
+        Return a secondary index, building it if it was loaded with the herd.
+        """
+        key, index = self._secondary_indexes[index_name]
+        if index is None:
+            index = {}
+            try:
+                for cow in self.cows_in_herd:
+                    self._index_cow(key, index, cow)
+            except ValueError:
+                del self._secondary_indexes[index_name]
+                raise
+            self._secondary_indexes[index_name] = (key, index)
+        return index
+
+    def _index_definitions(self) -> Dict[str, Union[str, Callable[[Cow], Any]]]:
+        """
+        Return the key of each secondary index by index name.
+        """
+        return {index_name: key for index_name, (key, _) in self._secondary_indexes.items()}
+
+    def lookup(self, index_name: str, value: Any) -> List[str]:
+        """
+        Return the IDs of the cows with a value in a secondary index.
+
+        Args:
+            index_name: Name of an index created with create_index.
+            value: Value to look up.
+        """
+        if index_name not in self._secondary_indexes:
+            raise ValueError(f"Index {index_name} does not exist.")
+        return list(self._get_index(index_name).get(value, []))
+
+    def select(self, 
+               cow_ids: Optional[Iterable[Union[int, float, str]]] = None,
+               group: Optional[str] = None,
+               index: Optional[str] = None,
+               value: Any = None,
+               where: Union[str, Predicate, Callable[[Cow], bool], None] = None
+    ) -> "Herd":
+        """
+        Return a sub-herd of the selected cows.
+
+        The sub-herd shares its cows, model registry and metadata with this 
+        herd, so models executed on it store results in the same Cow 
+        instances. When several selections are given the cows must match 
+        all of them.
+
+        Args:
+            cow_ids: IDs of the cows to select.
+            group: Name of a group to select.
+            index: Name of a secondary index, used with value.
+            value: Value to select from index.
+            where: Predicate the input data of selected cows must match, see 
+                   execute_model.
+        """
+        selections = []
+        if cow_ids is not None:
+            selections.append([str(cow_id) for cow_id in cow_ids])
+        if group is not None:
+            if group not in self.groups:
+                raise ValueError(f"Group {group} does not exist.")
+            selections.append(self.groups[group])
+        if index is not None:
+            selections.append(self.lookup(index, value))
+        if not selections and where is None:
+            raise ValueError("Select cows by cow_ids, group, index or where.")
+
+        cows = self.cows_in_herd
+        if selections:
+            selected = selections[0]
+            for other in selections[1:]:
+                other = set(other)
+                selected = [cow_id for cow_id in selected if cow_id in other]
+            positions = sorted({self.get_cow_position(cow_id) for cow_id in selected})
+            cows = [cows[position] for position in positions]
+        if where is not None:
+            matches = filter_positions(cows, where, self.columnar_store)
+            cows = [cows[position] for position in matches]
+        return self._view(cows)
+
+    # Execution Methods
+    def execute_method(self, method_name: str, *args, **kwargs) -> None:
+        """
+        Execute a method on all cows in the herd.
+
+        Args:
+            method_name: Name of the method to execute.
+        """
+        for cow in self.cows_in_herd:
+            getattr(cow, method_name)(*args, **kwargs)
+
+    def execute_model(self, 
+                      model_name: str, 
+                      execution_mode: str = "linear",
+                      max_workers: Optional[int] = None,
+                      chunk_size: Optional[int] = None,
+                      cache: Optional[ResultCache] = None,
+                      incremental: bool = False,
+                      profiler: Optional[Profiler] = None,
+                      where: Union[str, Predicate, Callable[[Cow], bool], None] = None,
+                      timeout: Optional[float] = None,
+                      retries: int = 0
+    ) -> None:
+        """
+        Execute a registered model on all cows in the herd.
+
+        Args:
+            model_name: Name of the model to execute.
+            execution_mode: Execution mode ('linear', 'cpu', 'threads', 
+                            'vectorized', 'async', 'gpu').
+            max_workers: Number of worker processes for 'cpu' execution or 
+                         threads for 'threads' execution. Defaults to the 
+                         number of CPUs. For 'async' execution the number of 
+                         cows run concurrently, defaults to 100.
+            chunk_size: Number of cows sent to a worker at once for 'cpu' 
+                        and 'threads' execution. Defaults to splitting the 
+                        herd into four chunks per worker.
+            cache: Optional ResultCache. Cows whose model and resolved inputs 
+                   are cached reuse the cached result instead of running the 
+                   model, new results are added to the cache. Models are 
+                   identified by their code, default arguments and closure. 
+                   Changes to globals or helper functions called by the 
+                   model are not detected, clear the cache after changing 
+                   them.
+            incremental: If True only run the model on cows returned by 
+                         stale_cows, other cows keep their latest result.
+            profiler: Optional Profiler that records the time spent gathering 
+                      inputs, calling the model, building metadata and 
+                      storing results. Adds no overhead when not given.
+            where: Only run the model on cows matching a predicate, e.g. 
+                   "body.weight > 600". See Predicate for the supported 
+                   expressions, a function taking a Cow can also be given. 
+                   Herds with columnar storage filter on whole columns.
+            timeout: Seconds each cow may take in 'async' execution. Cows 
+                     that take longer fail with a TimeoutError.
+            retries: Number of times cows that fail are run again.
+
+        Every cow stores its result under the same run_id, the model name 
+        and start time with a suffix for runs started in the same second. 
+        The run metadata is stored in self.metadata under the run_id and the 
+        cows of a run are listed by get_run_cows.
+
+        If checkpoints are enabled with enable_checkpoints the herd is run 
+        in batches and the results of each batch are appended to the log of 
+        the run, see resume.
+        """
+        if execution_mode not in EXECUTION_MODES:
+            raise ValueError(_INVALID_MODE)
+        if retries < 0:
+            raise ValueError("retries must not be negative.")
+        if self.metadata_level not in METADATA_LEVELS:
+            raise ValueError(f"Invalid metadata level. Choose from {', '.join(METADATA_LEVELS)}.")
+        self._warn_inconsistent_structure()
+        self._validate_input_mapping(model_name)
+        cows = self.cows_in_herd
+        # Models mapped to results of other models run on views of the cows 
+        # that hold the upstream results next to the input data
+        source = self._chained_view(model_name)
+        positions = None
+        fingerprints = {}
+        run_details = {}
+        if where is not None:
+            positions = filter_positions(cows, where, self.columnar_store)
+            run_details["where"] = where if isinstance(where, str) else repr(where)
+            run_details["selected_cows"] = len(positions)
+        if incremental:
+            n_candidates = len(cows) if positions is None else len(positions)
+            positions, fingerprints = source._find_stale(model_name, positions)
+            run_details["skipped_cows"] = n_candidates - len(positions)
+
+        log = None
+        start_time = datetime.now()
+        run_id = self._stream_run_id or self._new_run_id(model_name, start_time)
+        if self.checkpoints is not None:
+            while True:
+                try:
+                    log = self.checkpoints.create_log(run_id)
+                    break
+                except FileExistsError:
+                    # Left by a run of an earlier session
+                    run_id = self._new_run_id(model_name, start_time)
+            model_function, _ = self.model_registry.get_model(model_name)
+            log.append("run", {
+                "run_id": run_id,
+                "model_name": model_name,
+                "model_key": model_fingerprint(model_function),
+                "execution_mode": execution_mode,
+                "start_time": start_time.isoformat(),
+                "cow_ids": [cow.cow_id for cow in cows] if positions is None 
+                           else [cows[position].cow_id for position in positions]
+            })
+        run_details["run_id"] = run_id
+
+        self._execute_positions(
+            model_name, source, positions, fingerprints, execution_mode, 
+            max_workers, chunk_size, cache, run_details, profiler, timeout, 
+            retries, log
+            )
+
+    def _new_run_id(self, model_name: str, start_time: datetime) -> str:
+        """
+        Return a run_id that is not used by another run of the herd.
+
+        Args:
+            model_name: Name of the model.
+            start_time: Start of the run.
+        """
+        base = f"{model_name}_{start_time.strftime('%Y%m%d_%H%M%S')}"
+        runs = self.model_state.get(model_name, {}).get("runs", {})
+        with self._lock:
+            run_id, suffix = base, 0
+            while run_id in self._run_ids or run_id in self.metadata or run_id in runs:
+                suffix += 1
+                run_id = f"{base}_{suffix}"
+            self._run_ids.add(run_id)
+        return run_id
+
+    def _with_run_id(self, 
+                     model_name: str, 
+                     start_time: datetime, 
+                     run_details: Optional[Dict[str, Any]]
+    ) -> Dict[str, Any]:
+        """
+        Return run_details with a run_id, adding a new one for execution 
+        modes that are called directly.
+
+        Args:
+            model_name: Name of the model.
+            start_time: Start of the run.
+            run_details: Additional metadata stored with the run.
+        """
+        run_details = run_details or {}
+        if "run_id" in run_details:
+            return run_details
+        return {**run_details, "run_id": self._new_run_id(model_name, start_time)}
+
+    def _execute_positions(self,
+                           model_name: str,
+                           source: "Herd",
+                           positions: Optional[List[int]],
+                           fingerprints: Dict[int, str],
+                           execution_mode: str,
+                           max_workers: Optional[int],
+                           chunk_size: Optional[int],
+                           cache: Optional[ResultCache],
+                           run_details: Dict[str, Any],
+                           profiler: Optional[Profiler],
+                           timeout: Optional[float],
+                           retries: int = 0,
+                           log: Optional[ResultLog] = None
+    ) -> None:
+        """
+        Execute a model on cows of the herd and record the results.
+
+        Args:
+            model_name: Name of the model to execute.
+            source: The herd, or a view of it from _chained_view.
+            positions: Positions of the cows to run, defaults to all cows.
+            fingerprints: Input fingerprint of cows by position, if known.
+            execution_mode: Execution mode.
+            max_workers: Number of worker processes or threads, or 
+                         concurrent cows for 'async' execution.
+            chunk_size: Number of cows sent to a worker at once.
+            cache: Optional ResultCache.
+            run_details: Additional metadata stored with the run.
+            profiler: Optional Profiler to record phase timings.
+            timeout: Seconds each cow may take in 'async' execution.
+            retries: Number of times cows that fail are run again.
+            log: ResultLog the results are checkpointed to.
+        """
+        target = source
+        if positions is not None:
+            target = source._view([source.cows_in_herd[position] for position in positions])
+
+        if log is not None or retries:
+            completed = target._execute_model_batched(
+                model_name, execution_mode, cache, max_workers, chunk_size, 
+                run_details, profiler, timeout, retries, log
+                )
+        elif cache is None:
+            completed = target._dispatch_model(
+                model_name, execution_mode, max_workers, chunk_size, run_details, 
+                profiler, timeout
+                )
+        else:
+            completed = target._execute_model_cached(
+                model_name, execution_mode, cache, max_workers, chunk_size, 
+                run_details, profiler, timeout
+                )
+        if positions is not None:
+            completed = [(positions[position], result_id) 
+                         for position, result_id in completed]
+
+        self._update_model_state(model_name, completed, fingerprints)
+        if self.result_store is not None and completed:
+            with self._lock:
+                self._move_results_to_store(completed)
+
+    def _execute_model_batched(self,
+                               model_name: str,
+                               execution_mode: str,
+                               cache: Optional[ResultCache],
+                               max_workers: Optional[int],
+                               chunk_size: Optional[int],
+                               run_details: Dict[str, Any],
+                               profiler: Optional[Profiler],
+                               timeout: Optional[float],
+                               retries: int = 0,
+                               log: Optional[ResultLog] = None
+    ) -> List[Tuple[int, str]]:
+        """
+        Execute a model on all cows in batches, retrying cows that fail.
+
+        Without a log all cows form a single batch. With a log, batches hold 
+        at most checkpoints.every_n_cows cows and are sized from the measured 
+        time per cow to take about checkpoints.every_seconds. After each 
+        batch its results are appended to the log, cows that still fail 
+        after all retries are logged with their error message.
+
+        Args:
+            model_name: Name of the model to execute.
+            execution_mode: Execution mode used for each batch.
+            cache: Optional ResultCache.
+            max_workers: Number of worker processes or threads, or 
+                         concurrent cows for 'async' execution.
+            chunk_size: Number of cows sent to a worker at once.
+            run_details: Additional metadata stored with the run.
+            profiler: Optional Profiler to record phase timings.
+            timeout: Seconds each cow may take in 'async' execution.
+            retries: Number of times cows that fail are run again.
+            log: ResultLog the results are checkpointed to.
+
+        Returns:
+            List of (position, result_id) for each cow that ran the model.
+        """
+        cows = self.cows_in_herd
+        max_batch_size, every_seconds = max(len(cows), 1), None
+        if log is not None:
+            max_batch_size = self.checkpoints.every_n_cows
+            every_seconds = self.checkpoints.every_seconds
+        # Batches are sized by time once the time per cow is known
+        batch_size = max_batch_size if every_seconds is None else min(max_batch_size, 16)
+        run_details = {**run_details, "retries": retries}
+
+        completed = []
+        failed = []
+        start = 0
+        while start < len(cows):
+            batch = list(range(start, min(start + batch_size, len(cows))))
+            start += len(batch)
+            batch_start_ns = perf_counter_ns()
+
+            pending = batch
+            batch_completed = []
+            for _ in range(retries + 1):
+                view = self._view([cows[position] for position in pending])
+                # Errors are reported once after the last attempt
+                view._report_errors = False
+                if cache is None:
+                    view_completed = view._dispatch_model(
+                        model_name, execution_mode, max_workers, chunk_size, 
+                        run_details, profiler, timeout
+                        )
+                else:
+                    view_completed = view._execute_model_cached(
+                        model_name, execution_mode, cache, max_workers, 
+                        chunk_size, run_details, profiler, timeout
+                        )
+                batch_completed += [(pending[view_position], result_id) 
+                                    for view_position, result_id in view_completed]
+                finished = {view_position for view_position, _ in view_completed}
+                pending = [position for view_position, position in enumerate(pending) 
+                           if view_position not in finished]
+                if not pending:
+                    break
+            completed += batch_completed
+            failed += [cows[position].cow_id for position in pending]
+
+            if log is not None:
+                log.append("results", [
+                    (cows[position].cow_id, result_id, cows[position].results[result_id], 
+                     cows[position].metadata.get(result_id))
+                    for position, result_id in batch_completed
+                    ])
+                if pending:
+                    entry = self.metadata.get(run_details.get("run_id"), {})
+                    errors = entry.get("errors", {})
+                    log.append("errors", {
+                        cows[position].cow_id: _error_message(errors.get(cows[position].cow_id))
+                        for position in pending
+                        })
+            if every_seconds is not None:
+                seconds_per_cow = (perf_counter_ns() - batch_start_ns) / 1e9 / len(batch)
+                if seconds_per_cow > 0:
+                    batch_size = max(1, min(max_batch_size, int(every_seconds / seconds_per_cow)))
+
+        entry = self.metadata.get(run_details.get("run_id"))
+        if retries and entry is not None:
+            # Cows that succeeded on a retry are not errors of the run
+            for position, _ in completed:
+                entry["errors"].pop(cows[position].cow_id, None)
+        if entry is not None and failed:
+            self._print_errors({cow_id: entry["errors"][cow_id] for cow_id in failed 
+                                if cow_id in entry["errors"]})
+        if log is not None:
+            log.append("done", {"end_time": datetime.now().isoformat()})
+        return completed
+
+    def enable_checkpoints(self, 
+                           directory: str, 
+                           every_n_cows: int = 1000, 
+                           every_seconds: Optional[float] = 60.0
+    ) -> None:
+        """
+        Checkpoint the results of future model runs to append-only logs.
+
+        Each execute_model call creates a log in directory named by its 
+        run_id, which is stored in the run metadata. The herd is run in 
+        batches and the results of each batch are appended to the log, so 
+        an interrupted run can be continued with resume.
+
+        Args:
+            directory: Directory for the log files.
+            every_n_cows: Maximum number of cows run between checkpoints.
+            every_seconds: Target number of seconds between checkpoints, 
+                           None to only checkpoint every_n_cows.
+        """
+        self.checkpoints = Checkpoints(directory, every_n_cows, every_seconds)
+
+    def resume(self, 
+               run_id: str,
+               execution_mode: Optional[str] = None,
+               max_workers: Optional[int] = None,
+               chunk_size: Optional[int] = None,
+               cache: Optional[ResultCache] = None,
+               profiler: Optional[Profiler] = None,
+               timeout: Optional[float] = None,
+               retries: int = 0
+    ) -> None:
+        """
+        Continue a checkpointed model run.
+
+        Results in the log of the run are restored to cows that lack them, 
+        e.g. after the herd was loaded again following a crash. The model 
+        then runs on the remaining cows of the run, including cows that 
+        failed, and their results are appended to the same log.
+
+        Args:
+            run_id: ID of the run, see Checkpoints.incomplete_runs.
+            execution_mode: Execution mode for the remaining cows, defaults 
+                            to the mode of the run.
+            max_workers: Number of worker processes or threads, or 
+                         concurrent cows for 'async' execution.
+            chunk_size: Number of cows sent to a worker at once.
+            cache: Optional ResultCache.
+            profiler: Optional Profiler to record phase timings.
+            timeout: Seconds each cow may take. Only applies to 'async' 
+                     execution, which also runs synchronous models.
+            retries: Number of times cows that fail are run again.
+        """
+        if self.checkpoints is None:
+            raise ValueError("Checkpoints are not enabled, call enable_checkpoints first.")
+        if retries < 0:
+            raise ValueError("retries must not be negative.")
+        log = self.checkpoints.open_log(run_id)
+        state = log.read()
+        run = state["run"]
+        model_name = run["model_name"]
+        execution_mode = execution_mode or run["execution_mode"]
+        if execution_mode not in EXECUTION_MODES:
+            raise ValueError(_INVALID_MODE)
+        self._validate_input_mapping(model_name)
+        model_function, _ = self.model_registry.get_model(model_name)
+        if model_fingerprint(model_function) != run["model_key"]:
+            print(f"{model_name} changed since run {run_id} started, "
+                  "the remaining cows use the current version.")
+
+        cows = self.cows_in_herd
+        missing = []
+        restored = []
+        positions = []
+        for cow_id in run["cow_ids"]:
+            try:
+                position = self.get_cow_position(cow_id)
+            except ValueError:
+                missing.append(cow_id)
+                continue
+            if cow_id not in state["results"]:
+                positions.append(position)
+                continue
+            result_id, result, metadata_entry = state["results"][cow_id]
+            if result_id not in cows[position].results:
+                cows[position].store_result(result_id, result, metadata_entry)
+            restored.append((position, result_id))
+        self._update_model_state(model_name, restored, {})
+        if missing:
+            print(f"The following cows of run {run_id} are not in the herd: {missing}")
+
+        if not positions:
+            if not state["done"]:
+                log.append("done", {"end_time": datetime.now().isoformat()})
+            return
+        run_details = {"run_id": run_id, "resumed_cows": len(positions)}
+        self._execute_positions(
+            model_name, self._chained_view(model_name), positions, {}, 
+            execution_mode, max_workers, chunk_size, cache, run_details, 
+            profiler, timeout, retries, log
+            )
+
+    def _chained_view(self, model_name: str) -> "Herd":
+        """
+        Return a view of the herd in which each cow also holds the latest 
+        results of the models mapped to arguments of a model.
+
+        Results are read from the cows as they are, so the intermediate 
+        results of a pipeline are passed on without copying. Cows without a 
+        result of an upstream model fail to run the model with a KeyError. 
+        Returns self if the model has no upstream models.
+
+        Args:
+            model_name: Name of the model.
+        """
+        upstream = self.model_registry.get_upstream(model_name)
+        if not upstream:
+            return self
+        latest = [self.model_state.get(name, {}).get("cows", {}) for name in upstream]
+        cows = []
+        for cow in self.cows_in_herd:
+            upstream_results = {}
+            for name, state in zip(upstream, latest):
+                _, result_id = state.get(cow.cow_id, (None, None))
+                if result_id is not None and result_id in cow.results:
+                    upstream_results[name] = cow.get_result(result_id)
+            cows.append(_ChainedCow(cow, upstream_results))
+        view = self._view(cows)
+        # The views hold their input in memory, not in the columnar store
+        view.cows_in_herd = cows
+        return view
+
+    def _pipeline_graph(self, model_names: Iterable[str]) -> Dict[str, Tuple[str, ...]]:
+        """
+        Return the upstream models of each model in a pipeline.
+
+        Upstream models not in model_names are added to the pipeline.
+
+        Args:
+            model_names: Names of the models to run.
+
+        Raises:
+            ValueError: If a model is not registered or the models depend on 
+                        each other in a cycle.
+        """
+        graph = {}
+        pending = list(model_names)
+        while pending:
+            model_name = pending.pop()
+            if model_name not in graph:
+                graph[model_name] = self.model_registry.get_upstream(model_name)
+                pending.extend(graph[model_name])
+
+        # Remove models without remaining upstream models until none are left
+        remaining = {name: set(upstream) for name, upstream in graph.items()}
+        while remaining:
+            ready = [name for name, upstream in remaining.items() if not upstream]
+            if not ready:
+                raise ValueError(
+                    f"Pipeline has a dependency cycle between models: {sorted(remaining)}"
+                    )
+            for name in ready:
+                del remaining[name]
+            for upstream in remaining.values():
+                upstream.difference_update(ready)
+        return graph
+
+    def execute_pipeline(self, 
+                         model_names: Iterable[str], 
+                         execution_mode: Union[str, Dict[str, str]] = "linear",
+                         incremental: bool = True,
+                         max_concurrent_models: Optional[int] = None,
+                         **kwargs: Any
+    ) -> None:
+        """
+        Execute registered models in the order given by their result mappings.
+
+        Models whose arguments are mapped to results of other models run 
+        once those models finished, models that do not depend on each other 
+        run concurrently in threads. Upstream models missing from model_names 
+        are added. Each model reads the latest results of its upstream models 
+        from the cows, so intermediate results stay in memory.
+
+        With incremental execution a model only runs on cows whose inputs, 
+        including the upstream results, changed since its last run. Models 
+        whose upstream results are unchanged are therefore not recomputed.
+
+        Args:
+            model_names: Names of the models to run.
+            execution_mode: Execution mode for all models, or a dict of 
+                            execution modes by model name. Models missing 
+                            from the dict run 'linear'.
+            incremental: If True only run each model on its stale cows, see 
+                         execute_model.
+            max_concurrent_models: Maximum number of models run at once, 
+                                   defaults to no limit.
+            kwargs: Additional arguments passed to execute_model.
+
+        Raises:
+            ValueError: If a model is not registered, the models depend on 
+                        each other in a cycle or an execution mode is invalid.
+        """
+        graph = self._pipeline_graph(model_names)
+        if isinstance(execution_mode, str):
+            modes = {name: execution_mode for name in graph}
+        else:
+            modes = {name: execution_mode.get(name, "linear") for name in graph}
+        if any(mode not in EXECUTION_MODES for mode in modes.values()):
+            raise ValueError(_INVALID_MODE)
+        if max_concurrent_models is not None and max_concurrent_models < 1:
+            raise ValueError("max_concurrent_models must be at least 1.")
+
+        remaining = {name: set(upstream) for name, upstream in graph.items()}
+        with ThreadPoolExecutor(max_workers=max_concurrent_models or len(graph)) as executor:
+            running = {}
+            while remaining or running:
+                for name in [name for name, upstream in remaining.items() if not upstream]:
+                    del remaining[name]
+                    future = executor.submit(
+                        self.execute_model, name, modes[name], 
+                        incremental=incremental, **kwargs
+                        )
+                    running[future] = name
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    # Re-raise errors of the model, downstream models are not run
+                    future.result()
+                    for upstream in remaining.values():
+                        upstream.discard(name)
+
+    def _find_stale(self, 
+                    model_name: str, 
+                    candidates: Optional[List[int]] = None
+    ) -> Tuple[List[int], Dict[int, str]]:
+        """
+        Find the cows whose latest result of a model is out of date.
+
+        A result is out of date if the model code or default arguments 
+        changed, the resolved inputs of the cow changed, for example after 
+        cow.input was modified, or the result was removed. Cows whose last 
+        run was not incremental have no recorded inputs and are out of date.
+
+        Args:
+            model_name: Name of the model.
+            candidates: Positions of the cows to check, defaults to all cows.
+
+        Returns:
+            Positions of the out of date cows and the input fingerprint of 
+            every checked cow by position.
+        """
+        model_function, _ = self.model_registry.get_model(model_name)
+        accessors, _ = self.model_registry.get_accessors(model_name)
+        state = self.model_state.get(model_name)
+        if state is not None and state["model_key"] != model_fingerprint(model_function):
+            state = None
+        latest = state["cows"] if state is not None else {}
+
+        cows = self.cows_in_herd
+        if candidates is None:
+            candidates = range(len(cows))
+        positions = []
+        fingerprints = {}
+        for position in candidates:
+            cow = cows[position]
+            try:
+                fingerprint = fingerprint_inputs(cow.resolve_inputs(accessors))
+            except Exception:
+                positions.append(position)
+                continue
+            fingerprints[position] = fingerprint
+            recorded_fingerprint, result_id = latest.get(cow.cow_id, (None, None))
+            if recorded_fingerprint != fingerprint or result_id not in cow.results:
+                positions.append(position)
+        return positions, fingerprints
+
+    def _update_model_state(self, 
+                            model_name: str, 
+                            completed: List[Tuple[int, str]], 
+                            fingerprints: Dict[int, str]
+    ) -> None:
+        """
+        Record the latest result_id and input fingerprint of each cow that 
+        ran and add the cows to the index of their run.
+
+        Args:
+            model_name: Name of the model.
+            completed: List of (position, result_id) for each cow that ran.
+            fingerprints: Input fingerprint of cows by position, if known.
+        """
+        model_function, _ = self.model_registry.get_model(model_name)
+        model_key = model_fingerprint(model_function)
+        cows = self.cows_in_herd
+        with self._lock:
+            state = self.model_state.get(model_name)
+            if state is None or state["model_key"] != model_key:
+                # Runs and sweeps of earlier versions of the model are kept
+                state = {"runs": {}, **(state or {}), "model_key": model_key, "cows": {}}
+                self.model_state[model_name] = state
+            runs = state.setdefault("runs", {})
+            for position, result_id in completed:
+                cow_id = cows[position].cow_id
+                state["cows"][cow_id] = (fingerprints.get(position), result_id)
+                # Dicts keep the cows in order without duplicates on resume
+                runs.setdefault(result_id, {})[cow_id] = None
+
+    def stale_cows(self, model_name: str) -> List[str]:
+        """
+        Return the IDs of cows without an up to date result for a model.
+
+        Args:
+            model_name: Name of the model.
+        """
+        positions, _ = self._chained_view(model_name)._find_stale(model_name)
+        return [self.cows_in_herd[position].cow_id for position in positions]
+
+    def get_latest_result_id(self, cow_index: Union[int, str], model_name: str) -> Optional[str]:
+        """
+        Return the ID of the latest result of a model for a cow, or None if 
+        the model has not run on the cow.
+
+        Args:
+            cow_index: Index of the cow in the herd, or its cow_id as a string.
+            model_name: Name of the model.
+        """
+        state = self.model_state.get(model_name)
+        if state is None:
+            return None
+        cow = self._resolve_cow(cow_index)
+        _, result_id = state["cows"].get(cow.cow_id, (None, None))
+        return result_id
+
+    def list_runs(self, model_name: str) -> List[str]:
+        """
+        Return the run_ids of a model that stored results, oldest first.
+
+        Args:
+            model_name: Name of the model.
+        """
+        return list(self.model_state.get(model_name, {}).get("runs", {}))
+
+    def get_run_cows(self, model_name: str, run_id: str) -> List[str]:
+        """
+        Return the IDs of the cows that have a result of a run.
+
+        Args:
+            model_name: Name of the model.
+            run_id: ID of the run, see list_runs.
+        """
+        runs = self.model_state.get(model_name, {}).get("runs", {})
+        if run_id not in runs:
+            raise ValueError(f"No run {run_id} of {model_name}.")
+        return list(runs[run_id])
+
+    def get_run_results(self, model_name: str, run_id: str) -> Dict[str, Any]:
+        """
+        Return the results of a run by cow_id.
+
+        Args:
+            model_name: Name of the model.
+            run_id: ID of the run, see list_runs.
+        """
+        results = {}
+        for cow_id in self.get_run_cows(model_name, run_id):
+            cow = self.get_cow(cow_id)
+            if run_id in cow.results:
+                results[cow_id] = cow.get_result(run_id)
+        return results
+
+    def accumulate(self, 
+                   model_name: str, 
+                   by: Union[str, Callable[[Cow], Any], None] = None,
+                   compression: int = 100,
+                   batch_size: int = 10000
+    ) -> Union[ResultAggregator, Dict[Any, ResultAggregator]]:
+        """
+        Accumulate the latest result of a model for every cow in one pass.
+
+        Results are added in batches of numeric arrays. Results moved to a 
+        ResultStore are read from its arrays without building the values of 
+        each cow, and chunked herds load one shard at a time. The returned 
+        aggregators can be merged with those of other herds or processes.
+
+        Args:
+            model_name: Name of the model.
+            by: Optional grouping. A dot-separated input path or a function 
+                taking a Cow gives the key of each cow, "groups" accumulates 
+                each group added with add_group. Cows without the input path 
+                are grouped under None.
+            compression: Compression of the TDigest used for quantiles.
+            batch_size: Number of results added at a time.
+
+        Returns:
+            A ResultAggregator, or a ResultAggregator by group key if by is 
+            given.
+        """
+        if batch_size < 1:
+            raise ValueError("batch_size must be at least 1.")
+        self.model_registry.get_model(model_name)
+        state = self.model_state.get(model_name)
+        latest = state["cows"] if state is not None else {}
+
+        if by is None:
+            def keys_of(cow: Cow) -> List[Any]:
+                return [None]
+        elif by == "groups":
+            memberships = {}
+            for group_name, cow_ids in self.groups.items():
+                for cow_id in cow_ids:
+                    memberships.setdefault(cow_id, []).append(group_name)
+            def keys_of(cow: Cow) -> List[Any]:
+                return memberships.get(cow.cow_id, [])
+        elif callable(by):
+            def keys_of(cow: Cow) -> List[Any]:
+                return [by(cow)]
+        else:
+            def keys_of(cow: Cow) -> List[Any]:
+                try:
+                    return [cow.get_input_value(by)]
+                except (KeyError, IndexError, TypeError):
+                    return [None]
+
+        aggregators = {} if by is not None else {None: ResultAggregator(compression)}
+        pending = {}
+        stored_rows = {}
+
+        def aggregator(key: Any) -> ResultAggregator:
+            if key not in aggregators:
+                aggregators[key] = ResultAggregator(compression)
+            return aggregators[key]
+
+        if isinstance(self.cows_in_herd, ShardedCowList):
+            batches = self.cows_in_herd.iter_shards()
+        else:
+            batches = [self.cows_in_herd]
+        for cows in batches:
+            for cow in cows:
+                _, result_id = latest.get(cow.cow_id, (None, None))
+                if result_id is None or result_id not in cow.results:
+                    continue
+                result = cow.results[result_id]
+                for key in keys_of(cow):
+                    if isinstance(result, StoredResult):
+                        # Read through the store of the result, cows of 
+                        # chunked herds hold their own ResultStore instances
+                        _, rows = stored_rows.setdefault(
+                            (key, result.result_id), (result.store, [])
+                            )
+                        rows.append(result.row)
+                        continue
+                    values = pending.setdefault(key, [])
+                    values.append(result)
+                    if len(values) >= batch_size:
+                        aggregator(key).add_many(values)
+                        values.clear()
+        for key, values in pending.items():
+            if values:
+                aggregator(key).add_many(values)
+        for (key, result_id), (store, rows) in stored_rows.items():
+            array = store.array(result_id)
+            rows = np.asarray(rows, dtype=np.intp)
+            for start in range(0, len(rows), batch_size):
+                aggregator(key).add_array(array[rows[start:start + batch_size]])
+        return aggregators[None] if by is None else aggregators
+
+    def aggregate(self, 
+                  model_name: str, 
+                  stats: Iterable[str] = DEFAULT_STATS,
+                  by: Union[str, Callable[[Cow], Any], None] = None,
+                  bins: int = 10,
+                  compression: int = 100
+    ) -> Dict[Any, Any]:
+        """
+        Return statistics of the latest result of a model across the herd.
+
+        Mean and variance are exact, computed with Welford's algorithm. 
+        Percentiles and histograms are approximated from a t-digest. See 
+        accumulate for how results are read and grouped.
+
+        Args:
+            model_name: Name of the model.
+            stats: Names of the statistics: "count", "sum", "mean", 
+                   "variance", "std", "min", "max", "median", "histogram" 
+                   or a percentile such as "p90" or "p99.9".
+            by: Optional grouping, see accumulate.
+            bins: Number of bins for "histogram".
+            compression: Compression of the t-digest, higher values give 
+                         more accurate percentiles.
+
+        Returns:
+            Statistics by name for scalar results, or by key or position of 
+            dict, list and tuple results. If by is given, the statistics of 
+            each group by group key.
+        """
+        stats = list(stats)
+        validate_stats(stats)
+        aggregators = self.accumulate(model_name, by, compression)
+        if by is None:
+            return aggregators.summary(stats, bins)
+        return {key: aggregator.summary(stats, bins) for key, aggregator in aggregators.items()}
+
+    def sweep(self, 
+              model_name: str, 
+              grid: Dict[str, Iterable[Any]],
+              where: Union[str, Predicate, Callable[[Cow], bool], None] = None,
+              vectorize: bool = True
+    ) -> SweepResult:
+        """
+        Run a registered model on every cow for each combination of argument 
+        values in a grid.
+
+        The scenarios are the cartesian product of the grid, the values 
+        override mapped inputs and default arguments. The inputs of each cow 
+        are gathered once and shared by all scenarios. With vectorize the 
+        model is first called once on arrays with one row per cow and one 
+        column per scenario. Cows for which that fails run the model once on 
+        arrays of all scenarios, and if that fails too once per scenario. 
+        Results are not stored in the cows but in a SweepResult that is also 
+        available from get_sweep.
+
+        Args:
+            model_name: Name of the model.
+            grid: Values of each argument, e.g. 
+                  {"feed": [10, 12, 14], "factor": [1.0, 1.5]}.
+            where: Only run the model on cows matching a predicate, see 
+                   execute_model.
+            vectorize: If False the model is called once per cow and scenario.
+
+        Returns:
+            SweepResult with one row per cow and one column per scenario.
+        """
+        if np is None:
+            raise ImportError("Sweeps require numpy to be installed.")
+        self._validate_input_mapping(model_name)
+        model_function, input_mapping = self.model_registry.get_model(model_name)
+        accessors, _ = self.model_registry.get_accessors(model_name)
+        grid, scenarios = expand_grid(grid)
+        parameters = inspect.signature(model_function).parameters
+        for arg in grid:
+            if arg not in parameters:
+                raise ValueError(f"{arg} is not an argument of {model_name}.")
+        accessors = {arg: accessor for arg, accessor in accessors.items() if arg not in grid}
+        used_defaults = get_used_defaults(model_function, {**input_mapping, **grid})
+        grid_arrays = {arg: np.asarray([scenario[arg] for scenario in scenarios]) 
+                       for arg in grid}
+        vectorize = vectorize and all(is_numeric(array) for array in grid_arrays.values())
+
+        source = self._chained_view(model_name)
+        positions = range(len(self.cows_in_herd))
+        if where is not None:
+            positions = filter_positions(self.cows_in_herd, where, self.columnar_store)
+        cows = [source.cows_in_herd[position] for position in positions]
+        start_time = datetime.now()
+        run_id = self._new_run_id(model_name, start_time)
+        n_scenarios = len(scenarios)
+        valid = np.zeros((len(cows), n_scenarios), dtype=bool)
+        errors = {}
+        blocks = []
+
+        # Inputs are gathered once for all scenarios
+        inputs = [None] * len(cows)
+        store = source.columnar_store
+        columns = None
+        if store is not None and accessors:
+            rows = [cow._row for cow in cows]
+            columns = {arg: store.gather(accessor.path, rows) 
+                       for arg, accessor in accessors.items()}
+            if any(column is None for column in columns.values()):
+                columns = None
+        if columns is not None:
+            values = zip(*(column.tolist() for column in columns.values()))
+            inputs = [dict(zip(columns.keys(), row)) for row in values]
+        else:
+            for row, cow in enumerate(cows):
+                try:
+                    inputs[row] = cow.resolve_inputs(accessors)
+                except Exception as e:
+                    for column in range(n_scenarios):
+                        errors[(cow.cow_id, column)] = e
+        remaining = [row for row, cow_inputs in enumerate(inputs) if cow_inputs is not None]
+
+        vectorized_rows = []
+        if vectorize:
+            vectorized_rows = [
+                row for row in remaining 
+                if all(isinstance(value, (int, float, np.number)) for value in inputs[row].values())
+                ]
+        if vectorized_rows:
+            # Cows along the first axis, scenarios along the second
+            if columns is not None and len(vectorized_rows) == len(cows):
+                arrays = {arg: column[:, None] for arg, column in columns.items()}
+            else:
+                arrays = {arg: np.asarray([inputs[row][arg] for row in vectorized_rows])[:, None] 
+                          for arg in accessors}
+            arrays.update({arg: array[None, :] for arg, array in grid_arrays.items()})
+            try:
+                with np.errstate(divide="raise", invalid="raise"):
+                    block = split_sweep_output(
+                        model_function(**arrays), (len(vectorized_rows), n_scenarios)
+                        )
+            except Exception:
+                vectorized_rows = []
+            else:
+                blocks.append((vectorized_rows, block))
+                valid[vectorized_rows] = True
+                vectorized = set(vectorized_rows)
+                remaining = [row for row in remaining if row not in vectorized]
+
+        scenario_rows = 0
+        fallback_rows, fallback_results = [], []
+        for row in remaining:
+            if vectorize:
+                try:
+                    with np.errstate(divide="raise", invalid="raise"):
+                        block = split_sweep_output(
+                            model_function(**inputs[row], **grid_arrays), (n_scenarios,)
+                            )
+                except Exception:
+                    pass
+                else:
+                    blocks.append(([row], as_row(block)))
+                    valid[row] = True
+                    scenario_rows += 1
+                    continue
+            row_results = []
+            for column, scenario in enumerate(scenarios):
+                try:
+                    row_results.append(model_function(**inputs[row], **scenario))
+                    valid[row, column] = True
+                except Exception as e:
+                    row_results.append(None)
+                    errors[(cows[row].cow_id, column)] = e
+            fallback_rows.append(row)
+            fallback_results.append(row_results)
+            if vectorize and valid[row].all():
+                # The model can not be called on arrays, only on single values
+                vectorize = False
+        if fallback_rows:
+            blocks.append((fallback_rows, block_from_results(fallback_results, valid[fallback_rows])))
+
+        result = SweepResult(
+            model_name, run_id, [cow.cow_id for cow in cows], grid, 
+            assemble_blocks(blocks, valid), valid, errors
+            )
+        with self._lock:
+            state = self.model_state.setdefault(
+                model_name, {"model_key": model_fingerprint(model_function), "cows": {}, "runs": {}}
+                )
+            state.setdefault("sweeps", {})[run_id] = result
+        exceptions = {}
+        for (cow_id, _), error in errors.items():
+            # The first failed scenario of each cow
+            exceptions.setdefault(cow_id, error)
+        self._record_execution(
+            model_function, "sweep", start_time, exceptions, run_id=run_id, 
+            default_args=used_defaults, grid=grid, scenarios=n_scenarios, 
+            vectorized_cows=len(vectorized_rows), scenario_vectorized_cows=scenario_rows, 
+            fallback_cows=len(fallback_rows)
+            )
+        return result
+
+    def list_sweeps(self, model_name: str) -> List[str]:
+        """
+        Return the run_ids of the sweeps of a model, oldest first.
+
+        Args:
+            model_name: Name of the model.
+        """
+        return list(self.model_state.get(model_name, {}).get("sweeps", {}))
+
+    def get_sweep(self, model_name: str, run_id: Optional[str] = None) -> SweepResult:
+        """
+        Return the SweepResult of a sweep of a model.
+
+        Args:
+            model_name: Name of the model.
+            run_id: ID of the sweep, see list_sweeps. Defaults to the latest.
+        """
+        sweeps = self.model_state.get(model_name, {}).get("sweeps", {})
+        if run_id is None and sweeps:
+            run_id = next(reversed(list(sweeps)))
+        if run_id not in sweeps:
+            raise ValueError(f"No sweep {run_id} of {model_name}.")
+        return sweeps[run_id]
+
+    def _dispatch_model(self,
+                        model_name: str,
+                        execution_mode: str,
+                        max_workers: Optional[int] = None,
+                        chunk_size: Optional[int] = None,
+                        run_details: Optional[Dict[str, Any]] = None,
+                        profiler: Optional[Profiler] = None,
+                        timeout: Optional[float] = None
+    ) -> List[Tuple[int, str]]:
+        """
+        Run a registered model on all cows with the given execution mode.
+
+        Args:
+            model_name: Name of the model to execute.
+            execution_mode: Execution mode ('linear', 'cpu', 'threads', 
+                            'vectorized', 'async', 'gpu').
+            max_workers: Number of worker processes or threads, or 
+                         concurrent cows for 'async' execution.
+            chunk_size: Number of cows sent to a worker at once.
+            run_details: Additional metadata stored with the run.
+            profiler: Optional Profiler to record phase timings.
+            timeout: Seconds each cow may take in 'async' execution.
+
+        Returns:
+            List of (position, result_id) for each cow that ran the model.
+        """
+        model_function, input_mapping = self.model_registry.get_model(model_name)
+        accessors, used_defaults = self.model_registry.get_accessors(model_name)
+        run_details = {"default_args": used_defaults, **(run_details or {})}
+        if execution_mode == "linear":
+            return self._execute_model_linear(
+                model_function, input_mapping, accessors, used_defaults, 
+                run_details, profiler
+                )
+        elif execution_mode == "cpu":
+            return self._execute_model_cpu(
+                model_function, input_mapping, accessors, used_defaults, 
+                max_workers, chunk_size, run_details, profiler
+                )
+        elif execution_mode == "threads":
+            return self._execute_model_threads(
+                model_function, input_mapping, accessors, used_defaults, 
+                max_workers, chunk_size, run_details, profiler
+                )
+        elif execution_mode == "vectorized":
+            return self._execute_model_vectorized(
+                model_function, input_mapping, accessors, used_defaults, 
+                run_details, profiler
+                )
+        elif execution_mode == "async":
+            return self._execute_model_async(
+                model_function, input_mapping, accessors, used_defaults, 
+                max_workers, timeout, run_details, profiler
+                )
+        elif execution_mode == "gpu":
+            return self._execute_model_gpu(model_function, input_mapping)
+        raise ValueError(_INVALID_MODE)
+
+    def _execute_model_cached(self,
+                              model_name: str,
+                              execution_mode: str,
+                              cache: ResultCache,
+                              max_workers: Optional[int] = None,
+                              chunk_size: Optional[int] = None,
+                              run_details: Optional[Dict[str, Any]] = None,
+                              profiler: Optional[Profiler] = None,
+                              timeout: Optional[float] = None
+    ) -> List[Tuple[int, str]]:
+        """
+        Execute a model using cached results where possible.
+
+        The cache key combines a fingerprint of the model code and default 
+        arguments with the resolved inputs of each cow. Cows with a cached 
+        result store it with "cache_hit" set in their metadata, the remaining 
+        cows run with the given execution mode and their results are cached. 
+        Cached values are shared with the cows, not copied.
+
+        Args:
+            model_name: Name of the model to execute.
+            execution_mode: Execution mode for cows without a cached result.
+            cache: ResultCache to read from and add to.
+            max_workers: Number of worker processes for 'cpu' execution.
+            chunk_size: Number of cows sent to a worker at once.
+            run_details: Additional metadata stored with the run.
+            profiler: Optional Profiler to record phase timings of cows 
+                      without a cached result.
+            timeout: Seconds each cow may take in 'async' execution.
+
+        Returns:
+            List of (position, result_id) for each cow with a result.
+        """
+        model_function, _ = self.model_registry.get_model(model_name)
+        accessors, used_defaults = self.model_registry.get_accessors(model_name)
+        model_key = model_fingerprint(model_function)
+        missing = object()
+
+        start_time = datetime.now()
+        run_details = self._with_run_id(model_name, start_time, run_details)
+        result_id = run_details["run_id"]
+        cows = self.cows_in_herd
+        completed = []
+        miss_positions = []
+        miss_keys = []
+
+        for position, cow in enumerate(cows):
+            try:
+                inputs = cow.resolve_inputs(accessors)
+                key = cache.make_key(model_key, inputs)
+            except Exception:
+                # Let the execution mode report inputs that can't be resolved
+                miss_positions.append(position)
+                miss_keys.append(None)
+                continue
+
+            result = cache.get(key, missing)
+            if result is missing:
+                miss_positions.append(position)
+                miss_keys.append(key)
+                continue
+            metadata_entry = make_metadata(
+                self.metadata_level, model_function.__name__, start_time, 0, 
+                inputs, used_defaults, cache_hit=True
+                )
+            cow.store_result(result_id, result, metadata_entry)
+            completed.append((position, result_id))
+
+        run_details = {
+            **run_details,
+            "default_args": used_defaults,
+            "cache_hits": len(completed), 
+            "cache_misses": len(miss_positions)
+        }
+        if not miss_positions:
+            self._record_execution(
+                model_function, execution_mode, start_time, {}, **run_details
+                )
+            return completed
+
+        view = self._view([cows[position] for position in miss_positions])
+        view_completed = view._dispatch_model(
+            model_name, execution_mode, max_workers, chunk_size, run_details, 
+            profiler, timeout
+            )
+        for view_position, view_result_id in view_completed:
+            position = miss_positions[view_position]
+            key = miss_keys[view_position]
+            if key is not None:
+                cache.put(key, cows[position].results[view_result_id])
+            completed.append((position, view_result_id))
+        return completed
+
+    def enable_result_store(self, directory: str) -> None:
+        """
+        Store fixed-shape numeric results of future model runs in 
+        memory-mapped arrays.
+
+        After each run, results that are scalars, fixed-length lists or 
+        tuples, or dicts with fixed keys, all holding numbers, are written to 
+        a ResultStore in directory. Cow.results keeps a StoredResult reference 
+        and Cow.get_result / Herd.get_result read the value from the store. 
+        Other results stay in memory.
+
+        Args:
+            directory: Directory for the array files.
+        """
+        self.result_store = ResultStore(directory)
+
+    def _move_results_to_store(self, completed: List[Tuple[int, str]]) -> None:
+        """
+        Move the results of a model run into self.result_store.
+
+        Args:
+            completed: List of (position, result_id) for each cow that ran.
+        """
+        cows = self.cows_in_herd
+        by_result_id = {}
+        for position, result_id in completed:
+            by_result_id.setdefault(result_id, []).append(position)
+
+        for result_id, positions in by_result_id.items():
+            values = [cows[position].results[result_id] for position in positions]
+            if self.result_store.store(result_id, positions, values, len(cows)):
+                for position in positions:
+                    cows[position].results[result_id] = StoredResult(
+                        self.result_store, result_id, position
+                        )
+
+    def stream_model_from_json(self, 
+                               filename: str, 
+                               model_name: str, 
+                               batch_size: int = 1000,
+                               execution_mode: str = "linear",
+                               **kwargs: Any
+    ) -> Iterator[List[Cow]]:
+        """
+        Execute a registered model on cows streamed from a JSON or NDJSON file.
+
+        Cows are read in batches and each batch is yielded once the model has 
+        run, so results can be written out or aggregated before the next batch 
+        is loaded. Streamed cows are not added to the herd and are not 
+        recorded in the run index or by get_latest_result_id. All batches 
+        share one run_id, the run metadata is stored in self.metadata under 
+        it as for execute_model, with the number of cows in "streamed_cows". 
+        Checkpoints are not used.
+
+        Args:
+            filename: Path to the file.
+            model_name: Name of the model to execute.
+            batch_size: Number of cows to load and execute at a time.
+            execution_mode: Execution mode passed to execute_model.
+            kwargs: Additional arguments passed to execute_model.
+
+        Yields:
+            Each batch of cows with the model results stored.
+        """
+        self.model_registry.get_model(model_name)
+        run_id = None
+        n_cows = 0
+        for batch in iter_cows(filename, batch_size):
+            if run_id is None:
+                run_id = self._new_run_id(model_name, datetime.now())
+            view = self._view(batch)
+            # Bookkeeping of the streamed cows stays with the view
+            view.model_state = {}
+            view.checkpoints = None
+            view._stream_run_id = run_id
+            view.execute_model(model_name, execution_mode, **kwargs)
+            n_cows += len(batch)
+            self.metadata[run_id]["streamed_cows"] = n_cows
+            yield batch
+
+    def _execute_model_linear(self, 
+                              model_function: Callable, 
+                              input_mapping: Dict[str, str],
+                              accessors: Optional[Dict[str, InputAccessor]] = None,
+                              used_defaults: Optional[Dict[str, Any]] = None,
+                              run_details: Optional[Dict[str, Any]] = None,
+                              profiler: Optional[Profiler] = None
+    ) -> List[Tuple[int, str]]:
+        """
+        Execute a model on all cows in the herd sequentially.
+
+        Args:
+            model_function: Model function to execute.
+            input_mapping: Mapping of inputs for the model function.
+            accessors: Compiled accessors for input_mapping.
+            used_defaults: Default arguments not set by input_mapping.
+            run_details: Additional metadata stored with the run.
+            profiler: Optional Profiler to record phase timings.
+
+        Returns:
+            List of (position, result_id) for each cow that ran the model.
+        """
+        start_time = datetime.now()
+        run_details = self._with_run_id(model_function.__name__, start_time, run_details)
+        run_id = run_details["run_id"]
+        exceptions = {}
+        if accessors is None:
+            accessors = compile_input_mapping(input_mapping)
+        if used_defaults is None:
+            used_defaults = get_used_defaults(model_function, input_mapping)
+
+        completed = []
+
+        for position, cow in enumerate(self.cows_in_herd):
+            try:
+                result_id = cow.run_model(
+                    model_function, input_mapping, accessors, used_defaults, 
+                    profiler, self.metadata_level, run_id
+                    )
+                completed.append((position, result_id))
+            except Exception as e:
+                exceptions[cow.cow_id] = e
+        
+        self._record_execution(
+            model_function, "linear", start_time, exceptions, **run_details
+            )
+        return completed
+
+    def _execute_model_cpu(self, 
+                           model_function: Callable, 
+                           input_mapping: Dict[str, str],
+                           accessors: Optional[Dict[str, InputAccessor]] = None,
+                           used_defaults: Optional[Dict[str, Any]] = None,
+                           max_workers: Optional[int] = None,
+                           chunk_size: Optional[int] = None,
+                           run_details: Optional[Dict[str, Any]] = None,
+                           profiler: Optional[Profiler] = None
+    ) -> List[Tuple[int, str]]:
+        """
+        Execute a model on all cows in the herd using parallel CPU execution.
+
+        The herd is split into chunks which are sent to a pool of worker 
+        processes. The model function is serialized with dill so lambdas and 
+        locally defined functions can be used. Results and metadata are merged 
+        back into each Cow once the chunk finishes.
+
+        Args:
+            model_function: Model function to execute.
+            input_mapping: Mapping of inputs for the model function.
+            accessors: Compiled accessors for input_mapping.
+            used_defaults: Default arguments not set by input_mapping.
+            max_workers: Number of worker processes.
+            chunk_size: Number of cows sent to a worker at once.
+            run_details: Additional metadata stored with the run.
+            profiler: Optional Profiler to record phase timings.
+
+        Returns:
+            List of (position, result_id) for each cow that ran the model.
+        """
+        start_time = datetime.now()
+        run_details = self._with_run_id(model_function.__name__, start_time, run_details)
+        exceptions = {}
+        completed = []
+        cows = self.cows_in_herd
+
+        if max_workers is None:
+            max_workers = os.cpu_count() or 1
+        if max_workers < 1 or (chunk_size is not None and chunk_size < 1):
+            raise ValueError("max_workers and chunk_size must be positive.")
+        if chunk_size is None:
+            chunk_size = max(1, math.ceil(len(cows) / (max_workers * 4)))
+
+        if accessors is None:
+            accessors = compile_input_mapping(input_mapping)
+        if used_defaults is None:
+            used_defaults = get_used_defaults(model_function, input_mapping)
+        model_payload = pickle.dumps(
+            (model_function, input_mapping, accessors, used_defaults, 
+             self.metadata_level, run_details["run_id"])
+            )
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            futures = []
+            for start in range(0, len(cows), chunk_size):
+                chunk = [(index, cows[index].cow_id, cows[index].input) 
+                         for index in range(start, min(start + chunk_size, len(cows)))]
+                future = executor.submit(
+                    _run_model_chunk, model_payload, chunk, profiler is not None
+                    )
+                futures.append((future, chunk))
+
+            for future, chunk in futures:
+                try:
+                    outcomes, chunk_profiler = pickle.loads(future.result())
+                except Exception as e:
+                    # The whole chunk failed, e.g. the model could not be 
+                    # deserialized in the worker
+                    for _, cow_id, _ in chunk:
+                        exceptions[cow_id] = e
+                    continue
+
+                if chunk_profiler is not None:
+                    profiler.merge(chunk_profiler)
+                for index, result_id, result, metadata, error in outcomes:
+                    cow = cows[index]
+                    if error is not None:
+                        exceptions[cow.cow_id] = error
+                        continue
+                    cow.store_result(result_id, result, metadata)
+                    completed.append((index, result_id))
+
+        self._record_execution(
+            model_function, "cpu", start_time, exceptions, 
+            max_workers=max_workers, chunk_size=chunk_size, **run_details
+            )
+        return completed
+
+    def _execute_model_threads(self, 
+                               model_function: Callable, 
+                               input_mapping: Dict[str, str],
+                               accessors: Optional[Dict[str, InputAccessor]] = None,
+                               used_defaults: Optional[Dict[str, Any]] = None,
+                               max_workers: Optional[int] = None,
+                               chunk_size: Optional[int] = None,
+                               run_details: Optional[Dict[str, Any]] = None,
+                               profiler: Optional[Profiler] = None
+    ) -> List[Tuple[int, str]]:
+        """
+        Execute a model on all cows in the herd using a pool of threads.
+
+        Cows are run in batches of chunk_size, each batch in one thread. Cows 
+        are not copied or pickled, so this suits models that release the GIL, 
+        e.g. NumPy or SciPy calls, and any model on free-threaded Python. 
+        Each cow is only updated by the thread running its batch, errors and 
+        profiles are collected per batch and merged once all batches finish.
+
+        Args:
+            model_function: Model function to execute.
+            input_mapping: Mapping of inputs for the model function.
+            accessors: Compiled accessors for input_mapping.
+            used_defaults: Default arguments not set by input_mapping.
+            max_workers: Number of threads.
+            chunk_size: Number of cows run by a thread at once.
+            run_details: Additional metadata stored with the run.
+            profiler: Optional Profiler to record phase timings.
+
+        Returns:
+            List of (position, result_id) for each cow that ran the model.
+        """
+        start_time = datetime.now()
+        run_details = self._with_run_id(model_function.__name__, start_time, run_details)
+        exceptions = {}
+        completed = []
+        cows = self.cows_in_herd
+
+        if max_workers is None:
+            max_workers = os.cpu_count() or 1
+        if max_workers < 1 or (chunk_size is not None and chunk_size < 1):
+            raise ValueError("max_workers and chunk_size must be positive.")
+        if chunk_size is None:
+            chunk_size = max(1, math.ceil(len(cows) / (max_workers * 4)))
+
+        if accessors is None:
+            accessors = compile_input_mapping(input_mapping)
+        if used_defaults is None:
+            used_defaults = get_used_defaults(model_function, input_mapping)
+        metadata_level = self.metadata_level
+        run_id = run_details["run_id"]
+
+        def run_batch(batch: List[Tuple[int, Cow]]
+        ) -> Tuple[List[Tuple[int, str]], List[Tuple[str, Exception]], Optional[Profiler]]:
+            batch_profiler = Profiler() if profiler is not None else None
+            batch_completed = []
+            batch_errors = []
+            for position, cow in batch:
+                try:
+                    result_id = cow.run_model(
+                        model_function, input_mapping, accessors, used_defaults, 
+                        batch_profiler, metadata_level, run_id
+                        )
+                    batch_completed.append((position, result_id))
+                except Exception as e:
+                    batch_errors.append((cow.cow_id, e))
+            return batch_completed, batch_errors, batch_profiler
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            # Batches are built here so lazily loaded cows are only loaded 
+            # by one thread
+            futures = [
+                executor.submit(run_batch, [(index, cows[index]) for index in 
+                                            range(start, min(start + chunk_size, len(cows)))])
+                for start in range(0, len(cows), chunk_size)
+                ]
+            for future in futures:
+                batch_completed, batch_errors, batch_profiler = future.result()
+                completed.extend(batch_completed)
+                exceptions.update(batch_errors)
+                if batch_profiler is not None:
+                    profiler.merge(batch_profiler)
+
+        self._record_execution(
+            model_function, "threads", start_time, exceptions, 
+            max_workers=max_workers, chunk_size=chunk_size, 
+            gil_enabled=getattr(sys, "_is_gil_enabled", lambda: True)(),
+            **run_details
+            )
+        return completed
+
+    def _execute_model_vectorized(self, 
+                                  model_function: Callable, 
+                                  input_mapping: Dict[str, str],
+                                  accessors: Optional[Dict[str, InputAccessor]] = None,
+                                  used_defaults: Optional[Dict[str, Any]] = None,
+                                  run_details: Optional[Dict[str, Any]] = None,
+                                  profiler: Optional[Profiler] = None
+    ) -> List[Tuple[int, str]]:
+        """
+        Execute a model once on arrays of inputs gathered across the herd.
+
+        Each argument in input_mapping is gathered across all cows into a 
+        numpy array and the model is called a single time. The output is split 
+        back into per-cow results. When the herd uses columnar storage numeric 
+        columns are passed to the model directly. Cows with missing or 
+        non-numeric inputs run the model individually, as does the whole herd 
+        if the model can not be called on arrays or returns an output that can 
+        not be split.
+
+        Args:
+            model_function: Model function to execute.
+            input_mapping: Mapping of inputs for the model function.
+            accessors: Compiled accessors for input_mapping.
+            used_defaults: Default arguments not set by input_mapping.
+            run_details: Additional metadata stored with the run.
+            profiler: Optional Profiler to record phase timings. The batch 
+                      records one sample per phase.
+
+        Returns:
+            List of (position, result_id) for each cow that ran the model.
+        """
+        if np is None:
+            raise ImportError("Vectorized execution requires numpy to be installed.")
+        if accessors is None:
+            accessors = compile_input_mapping(input_mapping)
+        if used_defaults is None:
+            used_defaults = get_used_defaults(model_function, input_mapping)
+
+        start_time = datetime.now()
+        run_details = self._with_run_id(model_function.__name__, start_time, run_details)
+        result_id = run_details["run_id"]
+        exceptions = {}
+        completed = []
+        batch_positions = []
+        batch_inputs = []
+        fallback_positions = []
+
+        gather_start_ns = perf_counter_ns()
+        cows = self.cows_in_herd
+        store = self.columnar_store
+        columns = None
+        if store is not None and accessors:
+            rows = [cow._row for cow in cows]
+            columns = {key: store.gather(accessor.path, rows) 
+                       for key, accessor in accessors.items()}
+            if any(column is None for column in columns.values()):
+                columns = None
+
+        if columns is not None:
+            # Numeric columns can be used directly without visiting each cow
+            batch_positions = list(range(len(cows)))
+        else:
+            for position, cow in enumerate(cows):
+                try:
+                    inputs = cow.resolve_inputs(accessors)
+                except (KeyError, TypeError):
+                    fallback_positions.append(position)
+                    continue
+                if all(isinstance(value, (int, float, np.number)) for value in inputs.values()):
+                    batch_positions.append(position)
+                    batch_inputs.append(inputs)
+                else:
+                    fallback_positions.append(position)
+
+        if batch_positions:
+            if columns is not None:
+                arrays = columns
+            else:
+                arrays = {key: np.asarray([inputs[key] for inputs in batch_inputs]) 
+                          for key in accessors}
+
+            batch_start_time = datetime.now()
+            model_start_ns = perf_counter_ns()
+            try:
+                # Raise instead of returning inf/nan so the per-cow fallback 
+                # reports the same errors a linear run would
+                with np.errstate(divide="raise", invalid="raise"):
+                    results = _split_batch_output(
+                        model_function(**arrays), len(batch_positions)
+                        )
+            except Exception:
+                fallback_positions = batch_positions + fallback_positions
+                batch_positions, results = [], []
+            model_end_ns = perf_counter_ns()
+
+            metadata_entry = make_metadata(
+                self.metadata_level, model_function.__name__, batch_start_time, 
+                model_end_ns - model_start_ns, {}, used_defaults
+                )
+            if self.metadata_level == "full":
+                if columns is not None and results:
+                    # Input dicts of columnar herds are only needed here
+                    values = zip(*(column.tolist() for column in columns.values()))
+                    batch_inputs = [dict(zip(columns.keys(), row)) for row in values]
+                metadata_entries = [{**metadata_entry, "input_args": inputs} 
+                                    for inputs in batch_inputs[:len(results)]]
+            else:
+                # The batch shares one summary as all cows ran in the same call
+                metadata_entries = [metadata_entry] * len(results)
+            metadata_end_ns = perf_counter_ns()
+            for position, result, metadata_entry in zip(batch_positions, results, metadata_entries):
+                cows[position].store_result(result_id, result, metadata_entry)
+                completed.append((position, result_id))
+            if profiler is not None and batch_positions:
+                profiler.record_run([gather_start_ns, model_start_ns, model_end_ns, 
+                                     metadata_end_ns, perf_counter_ns()])
+
+        for position in fallback_positions:
+            cow = cows[position]
+            try:
+                cow.run_model(
+                    model_function, input_mapping, accessors, used_defaults, 
+                    profiler, self.metadata_level, result_id
+                    )
+                completed.append((position, result_id))
+            except Exception as e:
+                exceptions[cow.cow_id] = e
+
+        self._record_execution(
+            model_function, "vectorized", start_time, exceptions,
+            vectorized_cows=len(batch_positions), fallback_cows=len(fallback_positions),
+            **run_details
+            )
+        return completed
+
+    def _execute_model_async(self, 
+                             model_function: Callable, 
+                             input_mapping: Dict[str, str],
+                             accessors: Optional[Dict[str, InputAccessor]] = None,
+                             used_defaults: Optional[Dict[str, Any]] = None,
+                             max_concurrency: Optional[int] = None,
+                             timeout: Optional[float] = None,
+                             run_details: Optional[Dict[str, Any]] = None,
+                             profiler: Optional[Profiler] = None
+    ) -> List[Tuple[int, str]]:
+        """
+        Execute a model on all cows in the herd concurrently with asyncio.
+
+        Suited to I/O bound models. Models defined with async def are awaited 
+        on the event loop, other models run in a thread pool. At most 
+        max_concurrency cows run at once. When called from a running event 
+        loop, e.g. in a notebook, the runs use a new loop in another thread.
+
+        Args:
+            model_function: Model function to execute.
+            input_mapping: Mapping of inputs for the model function.
+            accessors: Compiled accessors for input_mapping.
+            used_defaults: Default arguments not set by input_mapping.
+            max_concurrency: Number of cows run at once, defaults to 100.
+            timeout: Seconds each cow may take before failing with a 
+                     TimeoutError. The thread of a sync model that times out 
+                     finishes in the background, its result is discarded.
+            run_details: Additional metadata stored with the run.
+            profiler: Optional Profiler to record phase timings.
+
+        Returns:
+            List of (position, result_id) for each cow that ran the model.
+        """
+        start_time = datetime.now()
+        run_details = self._with_run_id(model_function.__name__, start_time, run_details)
+        result_id = run_details["run_id"]
+        if max_concurrency is None:
+            max_concurrency = 100
+        if max_concurrency < 1:
+            raise ValueError("max_workers must be positive.")
+        if timeout is not None and timeout <= 0:
+            raise ValueError("timeout must be positive.")
+        if accessors is None:
+            accessors = compile_input_mapping(input_mapping)
+        if used_defaults is None:
+            used_defaults = get_used_defaults(model_function, input_mapping)
+
+        is_coroutine = inspect.iscoroutinefunction(model_function)
+        model_name = model_function.__name__
+        metadata_level = self.metadata_level
+        cows = self.cows_in_herd
+        errors = []
+        completed = []
+
+        async def run_cow(position: int, 
+                          cow: Cow, 
+                          semaphore: asyncio.Semaphore, 
+                          executor: Optional[ThreadPoolExecutor]
+        ) -> None:
+            async with semaphore:
+                cow_start_time = datetime.now()
+                start_ns = perf_counter_ns()
+                try:
+                    inputs = cow.resolve_inputs(accessors)
+                    inputs_ns = perf_counter_ns()
+                    if is_coroutine:
+                        call = model_function(**inputs)
+                    else:
+                        call = asyncio.get_running_loop().run_in_executor(
+                            executor, functools.partial(model_function, **inputs)
+                            )
+                    result = await asyncio.wait_for(call, timeout)
+                except asyncio.TimeoutError:
+                    errors.append((position, cow.cow_id, TimeoutError(
+                        f"Model did not finish within {timeout} seconds."
+                        )))
+                    return
+                except Exception as e:
+                    errors.append((position, cow.cow_id, e))
+                    return
+                end_ns = perf_counter_ns()
+
+            metadata_entry = make_metadata(
+                metadata_level, model_name, cow_start_time, end_ns - start_ns, 
+                inputs, used_defaults
+                )
+            metadata_ns = perf_counter_ns()
+            cow.store_result(result_id, result, metadata_entry)
+            completed.append((position, result_id))
+            if profiler is not None:
+                profiler.record_run([start_ns, inputs_ns, end_ns, metadata_ns, perf_counter_ns()])
+
+        async def run_herd() -> None:
+            semaphore = asyncio.Semaphore(max_concurrency)
+            executor = None if is_coroutine else ThreadPoolExecutor(max_concurrency)
+            try:
+                await asyncio.gather(*(run_cow(position, cow, semaphore, executor) 
+                                       for position, cow in enumerate(cows)))
+            finally:
+                if executor is not None:
+                    executor.shutdown(wait=False, cancel_futures=True)
+
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            asyncio.run(run_herd())
+        else:
+            # asyncio.run can't be nested in a running loop
+            with ThreadPoolExecutor(1) as loop_thread:
+                loop_thread.submit(asyncio.run, run_herd()).result()
+
+        # Cows finish in any order, report them in herd order
+        completed.sort()
+        exceptions = {cow_id: error for _, cow_id, error in sorted(errors, key=lambda x: x[0])}
+        self._record_execution(
+            model_function, "async", start_time, exceptions, 
+            max_concurrency=max_concurrency, timeout=timeout, **run_details
+            )
+        return completed
+
+    def _execute_model_gpu(self, 
+                           model_function: Callable, 
+                           input_mapping: Dict[str, str]
+    ) -> None:
+        """
+        Execute a model on all cows in the herd using GPU execution.
+        """
+        raise NotImplementedError("GPU execution is not implemented yet.")
+
+    def _record_execution(self, 
+                          model_function: Callable, 
+                          execution_mode: str, 
+                          start_time: datetime, 
+                          exceptions: Dict[str, Exception],
+                          **details: Any
+    ) -> None:
+        """
+        Store Herd level metadata for a model execution and report errors.
+
+        The metadata is stored under the run_id in details. Runs executed in 
+        several batches, e.g. with retries or checkpoints, share one entry 
+        that covers all batches.
+
+        Args:
+            model_function: Model function that was executed.
+            execution_mode: Execution mode used.
+            start_time: Time the execution started.
+            exceptions: Mapping of cow_id to the exception raised.
+            details: Additional execution mode specific metadata.
+        """
+        end_time = datetime.now()
+        execution_time = (end_time - start_time).total_seconds()
+                
+        metadata_entry = {
+            "model_name": model_function.__name__,
+            "execution_mode": execution_mode,
+            "metadata_level": self.metadata_level,
+            "start_time": start_time,
+            "end_time": end_time,
+            "execution_time_seconds": execution_time,
+            "errors": exceptions,
+            **details
+        }
+        run_id = details.get(
+            "run_id", f"{model_function.__name__}_{start_time.strftime('%Y%m%d_%H%M%S')}"
+            )
+        with self._lock:
+            previous = self.metadata.get(run_id)
+            if previous is not None and previous.get("run_id") == run_id:
+                metadata_entry["start_time"] = previous["start_time"]
+                metadata_entry["execution_time_seconds"] = \
+                    (end_time - previous["start_time"]).total_seconds()
+                metadata_entry["errors"] = {**previous["errors"], **exceptions}
+                for key in _BATCH_COUNTS:
+                    if key in previous and key in metadata_entry:
+                        metadata_entry[key] += previous[key]
+            self.metadata[run_id] = metadata_entry
+        
+        if exceptions and self._report_errors:
+            self._print_errors(exceptions)
+
+    @staticmethod
+    def _print_errors(exceptions: Dict[str, Exception]) -> None:
+        """
+        Print the cows that failed to run a model with their exceptions.
+        """
+        print("\nThe following Cows failed to run the model: ")
+        for cow_id, execption in exceptions.items():
+            print(f'{cow_id}: {execption}')
+
+    # Model Registration
+    def register_model(self, 
+                       model_function: Callable, 
+                       input_structure: Optional[Dict[str, Any]] = None,
+                       result_mapping: Optional[Dict[str, str]] = None
+    ) -> None:
+        """
+        Register a model function in the ModelRegistry.
+
+        Args:
+            model_function: Function to register.
+            input_structure: Input data used to map the function arguments. 
+                             Defaults to the input of the first cow in the herd, 
+                             must be given when the herd is empty, e.g. when 
+                             streaming cows from a file.
+            result_mapping: Mapping of function arguments to the latest 
+                            result of another model, e.g. 
+                            {"intake": "feed_model.intake"}. See 
+                            execute_pipeline.
+        """
+        fingerprint = None
+        if input_structure is None:
+            if not self.cows_in_herd:
+                raise ValueError("No cows in the herd to determine the input structure.")
+            cow = self.cows_in_herd[0]
+            input_structure, fingerprint = cow.input, cow.get_structure_hash(refresh=True)
+        self.model_registry.register_model(
+            model_function, input_structure, result_mapping, fingerprint
+            )
+
+    def _validate_input_mapping(self, model_name: str) -> None:
+        """
+        Check the input mapping of a model against the input structure of the 
+        herd, see ModelRegistry.validate_model.
+
+        Args:
+            model_name: Name of the model.
+        """
+        if not len(self.cows_in_herd):
+            self.model_registry.get_model(model_name)
+            return
+        cow = self.cows_in_herd[0]
+        self.model_registry.validate_model(
+            model_name, cow.input, cow.get_structure_hash(refresh=True)
+            )
+
+    # Utilities and Information
+    def list_cows(self) -> None:
+        """Display all cows in the herd."""
+        print("Index".ljust(5), "| Cow ID")
+        for index, cow in enumerate(self.cows_in_herd):
+            print(f"{index}".ljust(5), f"| {cow.cow_id}")
+
+    def list_results(self, cow_index: Union[int, str]) -> None:
+        """
+        Display results for a specific cow.
+
+        Args:
+            cow_index: Index of the cow in the herd, or its cow_id as a string.
+        """
+        cow = self._resolve_cow(cow_index)
+        cow.list_results()
+
+    def get_result(self, cow_index: Union[int, str], result_id: str) -> Any:
+        """
+        Return a specific result for a specific cow.
+
+        Args:
+            cow_index: Index of the cow in the herd, or its cow_id as a string.
+            result_id: ID of the result to return.
+        """
+        cow = self._resolve_cow(cow_index)
+        result = cow.get_result(result_id)
+        return result
+
+    def check_input(self) -> None:
+        """
+        Display the input structure of the first cow in the herd.
+        """
+        cow = self.cows_in_herd[0]
+        cow.print_input_structure()
+
+    def _structure_groups(self, refresh: bool = False) -> List[List[int]]:
+        """
+        Group the cows by the structure of their input data.
+
+        Args:
+            refresh: If True hash the current input of each cow instead of 
+                     using cached hashes, see Cow.get_structure_hash.
+
+        Returns:
+            Lists of positions of the cows with the same input structure, 
+            largest group first.
+        """
+        cows = self.cows_in_herd
+        store = self.columnar_store
+        if store is not None:
+            hashes = store.structure_hashes([cow._row for cow in cows])
+        else:
+            hashes = [cow.get_structure_hash(refresh) for cow in cows]
+        if not hashes:
+            return []
+        if hashes.count(hashes[0]) == len(hashes):
+            return [list(range(len(hashes)))]
+
+        groups = {}
+        for position, cow_hash in enumerate(hashes):
+            groups.setdefault(cow_hash, []).append(position)
+        # Ties keep the group of the earliest cow first
+        return sorted(groups.values(), key=len, reverse=True)
+
+    def check_data_consistency(self, verbose: bool = True) -> bool:
+        """
+        Check that all cows in the herd have a consistent input structure.
+
+        Cows are grouped by a hash of their current input structure, so 
+        direct changes to nested input data are detected. The largest group 
+        is taken as the expected structure and the paths that differ are 
+        reported for the cows of every other group.
+
+        Args:
+            verbose: If True print the cows with a different structure.
+
+        Returns:
+            True if all cows have a consistent input structure, False otherwise.
+        """
+        groups = self._structure_groups(refresh=True)
+        if len(groups) <= 1:
+            return True
+
+        if verbose:
+            cows = self.cows_in_herd
+            outliers = sorted(position for group in groups[1:] for position in group)
+            print("The following cow IDs have issues with their input data: "
+                  f"{[cows[position].cow_id for position in outliers]}")
+            expected = cows[groups[0][0]].get_input_structure()
+            for group in groups[1:]:
+                paths = _structure_differences(expected, cows[group[0]].get_input_structure())
+                print(f"  Differing paths {paths}: {[cows[position].cow_id for position in group]}")
+        return False
+
+    def _warn_inconsistent_structure(self) -> None:
+        """
+        Report an inconsistent input structure before a model runs.
+
+        Uses the cached structure hashes of the cows, see 
+        Cow.get_structure_hash. The report is only printed when the structure 
+        groups changed since the last report.
+        """
+        groups = self._structure_groups()
+        if len(groups) <= 1:
+            self._reported_structure = None
+            return
+        signature = tuple(len(group) for group in groups), tuple(group[0] for group in groups)
+        if signature != self._reported_structure:
+            self._reported_structure = signature
+            self.check_data_consistency()
+
+    def get_input_mapping(self, model_name: str) -> None:
+        """
+        Display the input mapping for a registered model.
+
+        Args:
+            model_name: Name of the model.
+        """
+        if self.check_data_consistency():
+            _ , input_mapping = self.model_registry.get_model(model_name)
+            input_data = self.cows_in_herd[0].input
+            utils.print_nested_dict_tree(
+                input_data, input_mapping=(model_name, input_mapping)
+                )
+        else:
+            raise ValueError("Structure of input data is inconsistent across herd")
+    
+    def list_models(self, verbose=True) -> None:
+        """
+        List all models registered to Herd
+
+        Args:
+            verbose: If True print full input mapping. If False print a table
+                     with model names and arguments.
+        """
+        models = [key for key in self.model_registry.models.keys()]
+        
+        if verbose:
+            for model in models:
+                print("\n" + "-"*25 + "\n")
+                self.get_input_mapping(model)
+        
+        if not verbose:
+            print("Model".ljust(10), "| Arguments")
+            for model in models:
+                args = [arg for arg in self.model_registry.models[model]["input_mapping"].keys()]
+                print(f"{model}".ljust(10), f"| {args}")
+
+    def remove_model(self, model_name: str) -> None:
+        """
+        Remove a model from ModelRegistry
+
+        Args:
+            model_name: Name of model to remove
+        """
+        if model_name in self.model_registry.models.keys():
+            self.model_registry.models.pop(model_name)
+            print(f"{model_name} has been removed.")
+        else:
+            print(f"ERROR: {model_name} is not registered.")
+
+    def get_model(self, model_name: str) -> Callable:
+        """
+        Return a function from ModelRegistry
+
+        Args:
+            model_name: Name of function to return
+        """
+
+        if model_name in self.model_registry.models.keys():
+            return self.model_registry.models[model_name]["function"]
+        print(f"{model_name} is not registered")
@@ -0,0 +1,131 @@
+import json
+from typing import Any, Dict, Iterator, List, TextIO
+
+from simoolator.cow import Cow
+
+_READ_SIZE = 1 << 16
+
+
+def _iter_json_array(file: TextIO, read_size: int = _READ_SIZE) -> Iterator[Any]:
+    """
+    Incrementally decode the elements of a top level JSON array.
+
+    Only the current element and a read buffer are held in memory.
+
+    Args:
+        file: Text file positioned at the opening bracket of the array.
+        read_size: Number of characters to read at a time.
+    """
+    decoder = json.JSONDecoder()
+    buffer = ""
+    while not buffer:
+        more = file.read(read_size)
+        if not more:
+            break
+        buffer = more.lstrip()
+    if not buffer.startswith("["):
+        raise ValueError("Expected a JSON array.")
+    position = 1
+    eof = False
+    expect_value = True
+    n_values = 0
+    chunk = read_size
+
+    while True:
+        # Skip whitespace and the comma separating elements
+        while True:
+            while position < len(buffer) and buffer[position] in " \t\r\n":
+                position += 1
+            if position < len(buffer) or eof:
+                break
+            more = file.read(read_size)
+            eof = not more
+            buffer, position = buffer[position:] + more, 0
+
+        if position >= len(buffer):
+            raise ValueError("Unexpected end of file in JSON array.")
+        if buffer[position] == "]":
+            if expect_value and n_values:
+                raise ValueError("Trailing comma in JSON array.")
+            return
+        if not expect_value:
+            if buffer[position] != ",":
+                raise ValueError(f"Expected ',' or ']' in JSON array, found {buffer[position]!r}.")
+            position += 1
+            expect_value = True
+            continue
+
+        try:
+            value, end = decoder.raw_decode(buffer, position)
+            # A value is only complete once a delimiter follows it, a number 
+            # at the end of the buffer may continue in the next read
+            complete = eof or (end < len(buffer) and buffer[end] in " \t\r\n,]")
+        except json.JSONDecodeError:
+            if eof:
+                raise
+            complete = False
+
+        if not complete:
+            more = file.read(chunk)
+            eof = not more
+            buffer, position = buffer[position:] + more, 0
+            # Grow reads so very large elements are not decoded repeatedly
+            chunk *= 2
+            continue
+
+        chunk = read_size
+        n_values += 1
+        yield value
+        position = end
+        expect_value = False
+        if position > read_size:
+            buffer, position = buffer[position:], 0
+
+
+def iter_cow_records(filename: str) -> Iterator[Dict[str, Any]]:
+    """
+    Yield the cow records in a JSON or NDJSON file one at a time.
+
+    Files starting with '[' are parsed incrementally as a JSON array, any
+    other file is read as NDJSON with one cow record per line.
+
+    Args:
+        filename: Path to the file.
+    """
+    with open(filename, "r") as file:
+        first = ""
+        while True:
+            first = file.read(1)
+            if not first or not first.isspace():
+                break
+        file.seek(0)
+
+        if first == "[":
+            yield from _iter_json_array(file)
+            return
+        for line in file:
+            line = line.strip()
+            if line:
+                yield json.loads(line)
+
+
+def iter_cows(filename: str, batch_size: int = 1000) -> Iterator[List[Cow]]:
+    """
+    Yield Cow instances from a JSON or NDJSON file in batches.
+
+    Each record must contain "cow_id" and "input_data" keys.
+
+    Args:
+        filename: Path to the file.
+        batch_size: Maximum number of cows in each batch.
+    """
+    if batch_size < 1:
+        raise ValueError("batch_size must be positive.")
+    batch = []
+    for cow_data in iter_cow_records(filename):
+        batch.append(Cow(cow_id=cow_data["cow_id"], input_data=cow_data["input_data"]))
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
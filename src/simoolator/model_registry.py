@@ -1,92 +1,342 @@
-import inspect
-from typing import Callable, Tuple, Dict, Any, List
-
-class ModelRegistry:
-    def __init__(self) -> None:
-        self.models = {}
-
-    def register_model(self, 
-                       model_function: Callable, 
-                       input_structure: dict
-    ) -> None:
-        """
-        Add new model function to registry with input mapping
-
-        Args:
-            model_function::Callalbe
-                Function to add to registry
-
-            input_structure::dict
-                Mapping of function arguments to data structure of Cow
-        """
-        input_mapping = self._determine_input_mapping(
-            model_function, input_structure
-            )
-        self.models[model_function.__name__] = {
-            'function': model_function,
-            'input_mapping': input_mapping
-        }
-
-    def _determine_input_mapping(self, 
-                                 model_function: Callable, 
-                                 input_structure: dict
-    ) -> dict:
-        """
-        Match arguments names with path to value in a nested dictionary
-
-        Args:
-            model_function::Callable
-                Function to map arguments for
-
-            input_structure::dict
-                Structure of the input data to map
-        """
-        def find_paths(input_structure: Dict[str, Any], 
-                       keys: List[str]
-        ) -> Dict[str, str]:
-            """
-            Recursively find paths to keys in a nested dictionary.
-
-            Args:
-                structure: The nested dictionary to search.
-                keys: The keys to find paths for.
-
-            Returns:
-                A dictionary mapping keys to their paths.
-            """
-            paths = {}
-
-            def recursive_search(current_structure: Any, 
-                                 current_path: List[str]
-            ) -> None:
-                """
-                Helper function to recursively search for keys in a nested dictionary.
-
-                Args:
-                    current_structure: The current level of the dictionary being searched.
-                    current_path: The path taken to reach the current level.
-                """
-                if isinstance(current_structure, dict):
-                    for key, value in current_structure.items():
-                        new_path = current_path + [key]
-                        if key in keys:
-                            paths[key] = '.'.join(new_path)
-                            keys.remove(key)
-                        if isinstance(value, dict) and keys:
-                            recursive_search(value, new_path)
-
-            recursive_search(input_structure, [])
-            return paths
-
-        signature = inspect.signature(model_function)
-        keys = list(signature.parameters.keys())
-        input_mapping = find_paths(input_structure, keys)
-        return input_mapping
-    
-    def get_model(self, model_name: str) -> Tuple[str, dict]:
-        """
-        Return a model function and the input mapping
-        """
-        if model_name not in self.models:
-            raise ValueError(f"Model {model_name} is not registered.")
-        return self.models[model_name]['function'], self.models[model_name]['input_mapping']
+from functools import lru_cache
+import inspect
+from operator import itemgetter
+from typing import Callable, Tuple, Dict, Any, Iterable, List, Optional
+import weakref
+
+# Input mapping paths starting with this key refer to results of other models
+RESULTS_KEY = "@results"
+
+class InputAccessor:
+    """
+    Compiled lookup of a dot-separated path in Cow.input.
+
+    The path is split once into a chain of itemgetters so resolving a value 
+    for each cow only walks the nested dictionary.
+    """
+    __slots__ = ("path", "_getters")
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._getters = tuple(itemgetter(key) for key in path.split("."))
+
+    def __call__(self, data: Any) -> Any:
+        for getter in self._getters:
+            data = getter(data)
+        return data
+
+    def __repr__(self) -> str:
+        return f"InputAccessor({self.path!r})"
+
+    def __getstate__(self) -> str:
+        return self.path
+
+    def __setstate__(self, path: str) -> None:
+        self.__init__(path)
+
+
+class PathIndex:
+    """
+    Dot-separated paths of an input structure indexed by their last key.
+
+    Built once per input structure, so mapping the arguments of a model is 
+    a lookup per argument. Keys of nested dictionaries are indexed as well 
+    as leaves, an argument can map to a whole sub-dictionary.
+    """
+    __slots__ = ("fingerprint", "by_name", "paths")
+
+    def __init__(self, input_structure: Dict[str, Any], fingerprint: int) -> None:
+        """
+        Index the paths of an input structure.
+
+        Args:
+            input_structure: Input data of a cow.
+            fingerprint: structure_hash of input_structure.
+        """
+        self.fingerprint = fingerprint
+        self.by_name: Dict[Any, List[str]] = {}
+        self.paths = set()
+        # Paths are listed depth first in the order of the input, as the 
+        # first match was used before paths were indexed
+        stack = [(iter(input_structure.items()), "")] if isinstance(input_structure, dict) else []
+        while stack:
+            items, prefix = stack[-1]
+            for key, value in items:
+                path = f"{prefix}.{key}" if prefix else str(key)
+                self.by_name.setdefault(key, []).append(path)
+                self.paths.add(path)
+                if isinstance(value, dict):
+                    stack.append((iter(value.items()), path))
+                    break
+            else:
+                stack.pop()
+
+    def find(self, name: str) -> List[str]:
+        """
+        Return the paths ending in name.
+        """
+        return self.by_name.get(name, [])
+
+
+@lru_cache(maxsize=256)
+def _compile_input_mapping(mapping_items: Tuple[Tuple[str, str], ...]
+) -> Dict[str, InputAccessor]:
+    return {key: InputAccessor(path) for key, path in mapping_items}
+
+
+def compile_input_mapping(input_mapping: Dict[str, str]) -> Dict[str, InputAccessor]:
+    """
+    Return an InputAccessor for each argument in an input mapping.
+
+    Results are cached, the returned dictionary must not be modified.
+
+    Args:
+        input_mapping: Mapping of function arguments to paths in Cow.input.
+    """
+    return _compile_input_mapping(tuple(input_mapping.items()))
+
+
+# Used defaults of each model function by mapped arguments. Functions are 
+# weakly referenced, so entries are dropped with the function
+_USED_DEFAULTS: "weakref.WeakKeyDictionary[Callable, Dict[Tuple[str, ...], Dict[str, Any]]]" = \
+    weakref.WeakKeyDictionary()
+
+
+def _used_defaults(model_function: Callable, 
+                   mapped_args: Tuple[str, ...]
+) -> Dict[str, Any]:
+    signature = inspect.signature(model_function)
+    return {key: val.default for key, val in signature.parameters.items()
+            if val.default is not inspect.Parameter.empty 
+            and key not in mapped_args}
+
+
+def get_used_defaults(model_function: Callable, 
+                      input_mapping: Dict[str, str]
+) -> Dict[str, Any]:
+    """
+    Return the default arguments of a model that are not set by input_mapping.
+
+    Results are cached, the returned dictionary must not be modified.
+
+    Args:
+        model_function: Model function to inspect.
+        input_mapping: Mapping of function arguments to paths in Cow.input.
+    """
+    mapped_args = tuple(input_mapping.keys())
+    try:
+        by_args = _USED_DEFAULTS.setdefault(model_function, {})
+    except TypeError: # Callables that can't be weakly referenced or hashed
+        return _used_defaults(model_function, mapped_args)
+    used_defaults = by_args.get(mapped_args)
+    if used_defaults is None:
+        used_defaults = by_args[mapped_args] = _used_defaults(model_function, mapped_args)
+    return used_defaults
+
+
+class ModelRegistry:
+    def __init__(self) -> None:
+        self.models = {}
+        self._path_index = None
+
+    def __getstate__(self) -> Dict[str, Any]:
+        # Structure hashes are only valid within one process
+        return {"models": self.models}
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        self.models = state["models"]
+        self._path_index = None
+
+    def get_path_index(self, 
+                       input_structure: Dict[str, Any], 
+                       fingerprint: Optional[int] = None
+    ) -> PathIndex:
+        """
+        Return the PathIndex of an input structure.
+
+        The index of the last structure is cached and rebuilt when the 
+        fingerprint changes.
+
+        Args:
+            input_structure: Input data of a cow.
+            fingerprint: structure_hash of input_structure, e.g. from 
+                         Cow.get_structure_hash. Computed if not given.
+        """
+        if fingerprint is None:
+            from simoolator.cow import structure_hash
+            fingerprint = structure_hash(input_structure)
+        index = getattr(self, "_path_index", None)
+        if index is None or index.fingerprint != fingerprint:
+            index = PathIndex(input_structure, fingerprint)
+            self._path_index = index
+        return index
+
+    def register_model(self, 
+                       model_function: Callable, 
+                       input_structure: dict,
+                       result_mapping: Optional[Dict[str, str]] = None,
+                       fingerprint: Optional[int] = None
+    ) -> None:
+        """
+        Add new model function to registry with input mapping
+
+        Args:
+            model_function::Callalbe
+                Function to add to registry
+
+            input_structure::dict
+                Mapping of function arguments to data structure of Cow
+
+            result_mapping::dict
+                Mapping of function arguments to the latest result of another 
+                registered model, given as "model_name" or as a dot-separated 
+                path into the result, e.g. "model_name.energy". Takes 
+                precedence over input_structure.
+
+            fingerprint::int
+                structure_hash of input_structure, if known
+        """
+        result_mapping = result_mapping or {}
+        parameters = inspect.signature(model_function).parameters
+        for arg, source in result_mapping.items():
+            if arg not in parameters:
+                raise ValueError(
+                    f"{arg} is not an argument of {model_function.__name__}."
+                    )
+            if not source:
+                raise ValueError(f"No model given for argument {arg}.")
+
+        index = self.get_path_index(input_structure, fingerprint)
+        input_mapping = self._determine_input_mapping(
+            model_function, input_structure, index.fingerprint, result_mapping
+            )
+        for arg, source in result_mapping.items():
+            input_mapping[arg] = f"{RESULTS_KEY}.{source}"
+        upstream = []
+        for source in result_mapping.values():
+            model_name = source.split(".")[0]
+            if model_name not in upstream:
+                upstream.append(model_name)
+
+        self.models[model_function.__name__] = {
+            'function': model_function,
+            'input_mapping': input_mapping,
+            'accessors': compile_input_mapping(input_mapping),
+            'used_defaults': get_used_defaults(model_function, input_mapping),
+            'upstream': tuple(upstream),
+            'structure': index.fingerprint
+        }
+
+    def _determine_input_mapping(self, 
+                                 model_function: Callable, 
+                                 input_structure: dict,
+                                 fingerprint: Optional[int] = None,
+                                 skip: Iterable[str] = ()
+    ) -> dict:
+        """
+        Match arguments names with path to value in a nested dictionary
+
+        Args:
+            model_function::Callable
+                Function to map arguments for
+
+            input_structure::dict
+                Structure of the input data to map
+
+            fingerprint::int
+                structure_hash of input_structure, if known
+
+            skip::Iterable
+                Arguments mapped elsewhere, e.g. to results
+        """
+        index = self.get_path_index(input_structure, fingerprint)
+        input_mapping = {}
+        for arg in inspect.signature(model_function).parameters:
+            paths = index.find(arg)
+            if not paths or arg in skip:
+                continue
+            if len(paths) > 1:
+                print(f"{arg} of {model_function.__name__} matches several input paths "
+                      f"{paths}, using {paths[0]}.")
+            input_mapping[arg] = paths[0]
+        return input_mapping
+
+    def validate_model(self, 
+                       model_name: str, 
+                       input_structure: Dict[str, Any], 
+                       fingerprint: Optional[int] = None
+    ) -> None:
+        """
+        Check the input mapping of a model against an input structure.
+
+        Only done when the structure differs from the one the mapping was 
+        last checked against. Arguments whose path is missing from the 
+        structure are mapped again by name if possible, the changes and 
+        arguments that can not be mapped are reported.
+
+        Args:
+            model_name: Name of the model.
+            input_structure: Input data of a cow.
+            fingerprint: structure_hash of input_structure, if known.
+        """
+        if model_name not in self.models:
+            raise ValueError(f"Model {model_name} is not registered.")
+        model = self.models[model_name]
+        index = self.get_path_index(input_structure, fingerprint)
+        if model.get('structure') == index.fingerprint:
+            return
+
+        input_mapping = dict(model['input_mapping'])
+        remapped = {}
+        missing = []
+        for arg, path in model['input_mapping'].items():
+            if path.startswith(RESULTS_KEY + ".") or path in index.paths:
+                continue
+            paths = index.find(arg)
+            if paths:
+                input_mapping[arg] = remapped[arg] = paths[0]
+            else:
+                missing.append(arg)
+        if remapped:
+            print(f"Input mapping of {model_name} updated for the input structure: {remapped}")
+            model['input_mapping'] = input_mapping
+            model['accessors'] = compile_input_mapping(input_mapping)
+            model['used_defaults'] = get_used_defaults(model['function'], input_mapping)
+        if missing:
+            print(f"Arguments of {model_name} missing from the input structure: {missing}")
+        model['structure'] = index.fingerprint
+    
+    def get_model(self, model_name: str) -> Tuple[str, dict]:
+        """
+        Return a model function and the input mapping
+        """
+        if model_name not in self.models:
+            raise ValueError(f"Model {model_name} is not registered.")
+        return self.models[model_name]['function'], self.models[model_name]['input_mapping']
+
+    def get_accessors(self, model_name: str
+    ) -> Tuple[Dict[str, InputAccessor], Dict[str, Any]]:
+        """
+        Return the compiled input accessors and unmapped default arguments 
+        of a model. 
+        """
+        if model_name not in self.models:
+            raise ValueError(f"Model {model_name} is not registered.")
+        model = self.models[model_name]
+        if 'accessors' not in model:
+            # Registries pickled before accessors were compiled at registration
+            model['accessors'] = compile_input_mapping(model['input_mapping'])
+            model['used_defaults'] = get_used_defaults(
+                model['function'], model['input_mapping']
+                )
+        return model['accessors'], model['used_defaults']
+
+    def get_upstream(self, model_name: str) -> Tuple[str, ...]:
+        """
+        Return the names of the models whose results are mapped to arguments 
+        of a model.
+        """
+        if model_name not in self.models:
+            raise ValueError(f"Model {model_name} is not registered.")
+        # Registries pickled before result mappings have no upstream models
+        return self.models[model_name].get('upstream', ())
@@ -0,0 +1,275 @@
+import ast
+import operator
+from typing import TYPE_CHECKING, Any, Callable, List, Optional, Sequence, Union
+
+try:
+    import numpy as np
+except ImportError: # numpy is only required for vectorized filtering
+    np = None
+
+from simoolator.cow import Cow
+
+if TYPE_CHECKING:
+    from simoolator.columnar import ColumnarStore
+
+_COMPARISONS = {
+    ast.Eq: operator.eq,
+    ast.NotEq: operator.ne,
+    ast.Lt: operator.lt,
+    ast.LtE: operator.le,
+    ast.Gt: operator.gt,
+    ast.GtE: operator.ge,
+    ast.In: lambda value, container: value in container,
+    ast.NotIn: lambda value, container: value not in container,
+    ast.Is: operator.is_,
+    ast.IsNot: operator.is_not,
+}
+# Comparisons that are also valid on object columns of a ColumnarStore
+_OBJECT_COMPARISONS = (ast.Eq, ast.NotEq, ast.In, ast.NotIn)
+
+
+class _MissingInput(Exception):
+    """
+    Raised when a path in a predicate can not be resolved for a cow.
+    """
+
+
+class _Path:
+    __slots__ = ("path",)
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+
+
+class _Literal:
+    __slots__ = ("value",)
+
+    def __init__(self, value: Any) -> None:
+        self.value = value
+
+
+class Predicate:
+    """
+    A filter over the input data of cows, parsed from an expression.
+
+    Expressions compare dot-separated input paths with literals or other
+    paths and combine comparisons with and, or, not and parentheses:
+
+        "weight > 600"
+        "body.weight > 600 and health.condition in ['good', 'fair']"
+        "500 <= weight < 700 or not milk.morning > milk.evening"
+
+    Cows missing a path, or whose values can not be compared, do not match.
+    Per-cow evaluation only resolves the paths needed to decide the result.
+    For herds with columnar storage the expression is evaluated on whole
+    columns with numpy.
+    """
+    def __init__(self, expression: str) -> None:
+        """
+        Parse an expression.
+
+        Args:
+            expression: Expression to parse.
+
+        Raises:
+            ValueError: If the expression is not a supported predicate.
+        """
+        self.expression = expression
+        try:
+            tree = ast.parse(expression.strip(), mode="eval")
+        except SyntaxError as e:
+            raise ValueError(f"Invalid predicate {expression!r}: {e.msg}") from None
+        self.paths: List[str] = []
+        self._tree = self._parse(tree.body)
+        self._evaluate = self._compile(self._tree)
+
+    def __repr__(self) -> str:
+        return f"Predicate({self.expression!r})"
+
+    # Parsing
+    def _error(self, node: ast.AST) -> ValueError:
+        return ValueError(
+            f"Unsupported expression {ast.unparse(node)!r} in predicate {self.expression!r}."
+            )
+
+    def _parse_operand(self, node: ast.AST) -> Union[_Path, _Literal]:
+        try:
+            return _Literal(ast.literal_eval(node))
+        except (ValueError, TypeError, SyntaxError):
+            pass
+        keys = []
+        while True:
+            if isinstance(node, ast.Attribute):
+                keys.append(node.attr)
+                node = node.value
+            elif (isinstance(node, ast.Subscript) and isinstance(node.slice, ast.Constant)
+                  and isinstance(node.slice.value, str)):
+                keys.append(node.slice.value)
+                node = node.value
+            elif isinstance(node, ast.Name):
+                keys.append(node.id)
+                break
+            else:
+                raise self._error(node)
+        path = ".".join(reversed(keys))
+        if path not in self.paths:
+            self.paths.append(path)
+        return _Path(path)
+
+    def _parse(self, node: ast.AST) -> tuple:
+        if isinstance(node, ast.BoolOp):
+            kind = "and" if isinstance(node.op, ast.And) else "or"
+            return (kind, [self._parse(value) for value in node.values])
+        if isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.Not):
+            return ("not", self._parse(node.operand))
+        if isinstance(node, ast.Compare):
+            operands = [self._parse_operand(node.left)]
+            operands += [self._parse_operand(comparator) for comparator in node.comparators]
+            if all(isinstance(operand, _Literal) for operand in operands):
+                raise self._error(node)
+            return ("compare", [type(op) for op in node.ops], operands)
+        raise self._error(node)
+
+    # Per-cow evaluation
+    def _compile(self, tree: tuple) -> Callable[[Cow], bool]:
+        kind = tree[0]
+        if kind == "and":
+            parts = [self._compile(part) for part in tree[1]]
+            return lambda cow: all(part(cow) for part in parts)
+        if kind == "or":
+            parts = [self._compile(part) for part in tree[1]]
+            return lambda cow: any(part(cow) for part in parts)
+        if kind == "not":
+            part = self._compile(tree[1])
+            return lambda cow: not part(cow)
+
+        _, ops, operands = tree
+        comparisons = [_COMPARISONS[op] for op in ops]
+
+        def resolve(operand: Union[_Path, _Literal], cow: Cow) -> Any:
+            if isinstance(operand, _Literal):
+                return operand.value
+            try:
+                return cow.get_input_value(operand.path)
+            except (KeyError, IndexError, TypeError):
+                raise _MissingInput(operand.path) from None
+
+        def compare(cow: Cow) -> bool:
+            left = resolve(operands[0], cow)
+            for comparison, operand in zip(comparisons, operands[1:]):
+                right = resolve(operand, cow)
+                if not comparison(left, right):
+                    return False
+                left = right
+            return True
+        return compare
+
+    def matches(self, cow: Cow) -> bool:
+        """
+        Return True if the input data of cow matches the predicate.
+
+        Args:
+            cow: Cow to test.
+        """
+        try:
+            return bool(self._evaluate(cow))
+        except (_MissingInput, TypeError):
+            return False
+
+    # Vectorized evaluation
+    def _column(self, operand: Union[_Path, _Literal], store: "ColumnarStore",
+                rows: "np.ndarray", object_ok: bool) -> Any:
+        if isinstance(operand, _Literal):
+            return operand.value
+        if operand.path not in store.columns:
+            return None
+        values = store.column(operand.path)[rows]
+        if values.dtype == object and not object_ok:
+            return None
+        return values
+
+    def _mask(self, tree: tuple, store: "ColumnarStore", rows: "np.ndarray") -> Optional["np.ndarray"]:
+        kind = tree[0]
+        if kind in ("and", "or"):
+            masks = [self._mask(part, store, rows) for part in tree[1]]
+            if any(mask is None for mask in masks):
+                return None
+            combine = np.logical_and if kind == "and" else np.logical_or
+            return combine.reduce(masks)
+        if kind == "not":
+            mask = self._mask(tree[1], store, rows)
+            return None if mask is None else ~mask
+
+        _, ops, operands = tree
+        mask = np.ones(len(rows), dtype=bool)
+        for op, left, right in zip(ops, operands, operands[1:]):
+            if op in (ast.Is, ast.IsNot):
+                return None
+            object_ok = op in _OBJECT_COMPARISONS
+            left_values = self._column(left, store, rows, object_ok)
+            right_values = self._column(right, store, rows, object_ok)
+            if left_values is None or right_values is None:
+                return None
+            if op in (ast.In, ast.NotIn):
+                if (not isinstance(left, _Path) or not isinstance(right, _Literal)
+                        or not isinstance(right.value, (list, tuple, set))):
+                    return None
+                result = np.array([value in right.value for value in left_values], dtype=bool) \
+                    if left_values.dtype == object else np.isin(left_values, list(right.value))
+                if op is ast.NotIn:
+                    result = ~result
+            else:
+                try:
+                    result = np.asarray(_COMPARISONS[op](left_values, right_values), dtype=bool)
+                except TypeError:
+                    return None
+                if result.shape != mask.shape:
+                    return None
+            mask &= result
+        return mask
+
+    def mask(self, store: "ColumnarStore", rows: Sequence[int]) -> Optional["np.ndarray"]:
+        """
+        Evaluate the predicate on columns of a ColumnarStore.
+
+        Args:
+            store: Store holding the input data.
+            rows: Rows to evaluate.
+
+        Returns:
+            Boolean array with one entry per row, or None if the predicate
+            can not be evaluated on the columns, e.g. it uses a path that is
+            not a leaf or orders values of an object column.
+        """
+        if np is None:
+            return None
+        try:
+            return self._mask(self._tree, store, np.asarray(rows, dtype=np.intp))
+        except (TypeError, ValueError):
+            return None
+
+
+def filter_positions(cows: Sequence[Cow],
+                     where: Union[str, Predicate, Callable[[Cow], bool]],
+                     store: Optional["ColumnarStore"] = None
+) -> List[int]:
+    """
+    Return the positions of the cows matching a predicate.
+
+    Args:
+        cows: Cows to filter.
+        where: Predicate expression, Predicate or function taking a Cow and
+               returning True for cows to keep.
+        store: ColumnarStore holding the input data of cows, used to
+               evaluate the predicate on whole columns.
+    """
+    if isinstance(where, str):
+        where = Predicate(where)
+    if not isinstance(where, Predicate):
+        return [position for position, cow in enumerate(cows) if where(cow)]
+
+    if store is not None and len(cows):
+        mask = where.mask(store, [cow._row for cow in cows])
+        if mask is not None:
+            return np.flatnonzero(mask).tolist()
+    return [position for position, cow in enumerate(cows) if where.matches(cow)]
@@ -0,0 +1,178 @@
+from typing import Any, Dict, List
+
+PHASES = ("inputs", "model", "metadata", "storage")
+
+# Durations are bucketed by their number of bits, bucket b holds durations in
+# [2 ** (b - 1), 2 ** b) nanoseconds. 64 buckets cover more than 290 years.
+_N_BUCKETS = 64
+
+
+class Histogram:
+    """
+    Log2 histogram of durations in nanoseconds.
+
+    Recording a duration is a few integer operations, and histograms from
+    different herds or worker processes can be merged.
+    """
+    __slots__ = ("counts", "count", "total_ns", "min_ns", "max_ns")
+
+    def __init__(self) -> None:
+        self.counts = [0] * _N_BUCKETS
+        self.count = 0
+        self.total_ns = 0
+        self.min_ns = None
+        self.max_ns = None
+
+    def __getstate__(self) -> Dict[str, Any]:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        for name, value in state.items():
+            setattr(self, name, value)
+
+    def add(self, duration_ns: int, count: int = 1) -> None:
+        """
+        Record a duration.
+
+        Args:
+            duration_ns: Duration in nanoseconds.
+            count: Number of times the duration occurred.
+        """
+        bucket = min(max(duration_ns, 0).bit_length(), _N_BUCKETS - 1)
+        self.counts[bucket] += count
+        self.count += count
+        self.total_ns += duration_ns * count
+        if self.min_ns is None or duration_ns < self.min_ns:
+            self.min_ns = duration_ns
+        if self.max_ns is None or duration_ns > self.max_ns:
+            self.max_ns = duration_ns
+
+    def merge(self, other: "Histogram") -> None:
+        """
+        Add the durations recorded in another histogram.
+
+        Args:
+            other: Histogram to merge into self.
+        """
+        if not other.count:
+            return
+        self.counts = [a + b for a, b in zip(self.counts, other.counts)]
+        self.count += other.count
+        self.total_ns += other.total_ns
+        self.min_ns = other.min_ns if self.min_ns is None else min(self.min_ns, other.min_ns)
+        self.max_ns = other.max_ns if self.max_ns is None else max(self.max_ns, other.max_ns)
+
+    def percentile(self, q: float) -> int:
+        """
+        Return an upper bound for the q-th percentile of the durations.
+
+        The result is the upper edge of the bucket holding the percentile,
+        capped at the largest recorded duration.
+
+        Args:
+            q: Percentile between 0 and 100.
+        """
+        if not self.count:
+            return 0
+        rank = q / 100 * self.count
+        seen = 0
+        for bucket, bucket_count in enumerate(self.counts):
+            seen += bucket_count
+            if bucket_count and seen >= rank:
+                return min((1 << bucket) - 1, self.max_ns)
+        return self.max_ns
+
+    def summary(self) -> Dict[str, Any]:
+        """
+        Return count, total, mean, min, max and approximate percentiles in
+        nanoseconds.
+        """
+        return {
+            "count": self.count,
+            "total_ns": self.total_ns,
+            "mean_ns": self.total_ns / self.count if self.count else 0,
+            "min_ns": self.min_ns,
+            "max_ns": self.max_ns,
+            "p50_ns": self.percentile(50),
+            "p90_ns": self.percentile(90),
+            "p99_ns": self.percentile(99),
+            "buckets": {f"<{1 << bucket}": count
+                        for bucket, count in enumerate(self.counts) if count}
+        }
+
+
+class Profiler:
+    """
+    Collects the time spent in each phase of model execution.
+
+    Pass a Profiler to Herd.execute_model to profile a run. Each cow run
+    records the time to gather its inputs, call the model, build the result
+    metadata and store the result. Vectorized execution records one sample
+    per phase for the whole batch. A Profiler can be reused for several runs
+    and herds, the durations are aggregated.
+    """
+    def __init__(self) -> None:
+        self.histograms: Dict[str, Histogram] = {phase: Histogram() for phase in PHASES}
+
+    def record(self, phase: str, duration_ns: int, count: int = 1) -> None:
+        """
+        Record the duration of a phase.
+
+        Args:
+            phase: One of "inputs", "model", "metadata" or "storage".
+            duration_ns: Duration in nanoseconds.
+            count: Number of times the duration occurred.
+        """
+        self.histograms[phase].add(duration_ns, count)
+
+    def record_run(self, timestamps: List[int]) -> None:
+        """
+        Record the phases of one model run.
+
+        Args:
+            timestamps: perf_counter_ns values taken before gathering inputs
+                        and after each phase in the order of PHASES.
+        """
+        histograms = self.histograms
+        for index, phase in enumerate(PHASES):
+            histograms[phase].add(timestamps[index + 1] - timestamps[index])
+
+    def merge(self, other: "Profiler") -> None:
+        """
+        Add the durations recorded by another Profiler, e.g. one from a
+        worker process.
+
+        Args:
+            other: Profiler to merge into self.
+        """
+        for phase, histogram in other.histograms.items():
+            self.histograms.setdefault(phase, Histogram()).merge(histogram)
+
+    def reset(self) -> None:
+        """
+        Remove all recorded durations.
+        """
+        self.histograms = {phase: Histogram() for phase in PHASES}
+
+    def summary(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Return the summary of each phase by phase name.
+        """
+        return {phase: histogram.summary() for phase, histogram in self.histograms.items()}
+
+    def report(self) -> None:
+        """
+        Display the time spent in each phase.
+        """
+        total = sum(histogram.total_ns for histogram in self.histograms.values()) or 1
+        print("Phase".ljust(10), "| Count".ljust(10), "| Total ms".ljust(12),
+              "| Mean us".ljust(10), "| p99 us".ljust(10), "| Share")
+        for phase, histogram in self.histograms.items():
+            summary = histogram.summary()
+            print(phase.ljust(10),
+                  f"| {summary['count']}".ljust(10),
+                  f"| {summary['total_ns'] / 1e6:.3f}".ljust(12),
+                  f"| {summary['mean_ns'] / 1e3:.2f}".ljust(10),
+                  f"| {summary['p99_ns'] / 1e3:.2f}".ljust(10),
+                  f"| {summary['total_ns'] / total:.1%}")
+
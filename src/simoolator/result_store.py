@@ -0,0 +1,216 @@
+import hashlib
+import json
+import os
+import re
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+try:
+    import numpy as np
+except ImportError: # numpy is only required once a ResultStore is created
+    np = None
+
+
+class StoredResult:
+    """
+    Reference to a result held in a ResultStore.
+
+    Stored in Cow.results in place of the result value. Cow.get_result and
+    Herd.get_result return the value read from the store.
+    """
+    __slots__ = ("store", "result_id", "row")
+
+    def __init__(self, store: "ResultStore", result_id: str, row: int) -> None:
+        self.store = store
+        self.result_id = result_id
+        self.row = row
+
+    def load(self) -> Any:
+        """
+        Return the result value.
+        """
+        return self.store.read(self.result_id, self.row)
+
+    def __repr__(self) -> str:
+        return f"StoredResult({self.result_id!r}, row={self.row})"
+
+    def __getstate__(self) -> Tuple["ResultStore", str, int]:
+        return self.store, self.result_id, self.row
+
+    def __setstate__(self, state: Tuple["ResultStore", str, int]) -> None:
+        self.store, self.result_id, self.row = state
+
+
+def _element_type(values: Sequence[Any]) -> Optional[type]:
+    """
+    Return bool, int or float if every value has exactly that type.
+    """
+    first = type(values[0])
+    if first not in (bool, int, float):
+        return None
+    if any(type(value) is not first for value in values):
+        return None
+    return first
+
+
+class ResultStore:
+    """
+    Memory-mapped storage for fixed-shape numeric model results.
+
+    Each result_id is written to a .npy file with one row per cow position in
+    the herd. Scalars are stored as a 1D array, lists or tuples of a fixed
+    length as a 2D array and dicts with fixed keys as a structured array.
+    Every cow must return the same Python type for each element, so values
+    read back are identical to the values returned by the model. Arrays are
+    opened read-only with mmap so several processes can share them.
+    """
+    _DTYPES = {bool: "bool", int: "int64", float: "float64"}
+
+    def __init__(self, directory: str) -> None:
+        """
+        Initialize a ResultStore.
+
+        Args:
+            directory: Directory for the array files. Created if missing,
+                       results already stored in it are available.
+        """
+        if np is None:
+            raise ImportError("ResultStore requires numpy to be installed.")
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self._arrays: Dict[str, "np.ndarray"] = {}
+        self._layouts: Dict[str, Dict[str, Any]] = {}
+        layout_file = os.path.join(directory, "layouts.json")
+        if os.path.exists(layout_file):
+            with open(layout_file, "r") as file:
+                self._layouts = json.load(file)
+
+    def __getstate__(self) -> str:
+        return self.directory
+
+    def __setstate__(self, directory: str) -> None:
+        self.__init__(directory)
+
+    def __contains__(self, result_id: str) -> bool:
+        return result_id in self._layouts
+
+    def _detect_layout(self, values: List[Any]) -> Optional[Dict[str, Any]]:
+        """
+        Return the layout for values or None if they do not share a fixed
+        numeric shape.
+        """
+        first = values[0]
+        if isinstance(first, (list, tuple)):
+            container = type(first)
+            if (type(first) not in (list, tuple) or not first
+                    or any(type(value) is not container or len(value) != len(first)
+                           for value in values)):
+                return None
+            columns = list(zip(*values))
+            types = [_element_type(column) for column in columns]
+            if None in types or len(set(types)) != 1:
+                return None
+            return {"kind": "sequence", "container": container.__name__,
+                    "dtype": self._DTYPES[types[0]]}
+        if isinstance(first, dict):
+            keys = list(first.keys())
+            if (type(first) is not dict or not keys
+                    or not all(isinstance(key, str) for key in keys)
+                    or any(type(value) is not dict or list(value.keys()) != keys
+                           for value in values)):
+                return None
+            types = [_element_type([value[key] for value in values]) for key in keys]
+            if None in types:
+                return None
+            return {"kind": "record", "fields": keys,
+                    "dtype": [self._DTYPES[element_type] for element_type in types]}
+        element_type = _element_type(values)
+        if element_type is None:
+            return None
+        return {"kind": "scalar", "dtype": self._DTYPES[element_type]}
+
+    def _path(self, result_id: str) -> str:
+        # Result ids contain the model name which may not be a valid filename
+        safe_id = re.sub(r"[^\w.-]", "_", result_id)
+        digest = hashlib.sha1(result_id.encode()).hexdigest()[:8]
+        return os.path.join(self.directory, f"{safe_id}_{digest}.npy")
+
+    def store(self,
+              result_id: str,
+              rows: Sequence[int],
+              values: List[Any],
+              n_rows: int
+    ) -> bool:
+        """
+        Write the results of a model run if they share a fixed numeric shape.
+
+        Args:
+            result_id: ID of the results.
+            rows: Position of each cow in the herd.
+            values: Result of each cow.
+            n_rows: Number of rows to allocate, the size of the herd.
+
+        Returns:
+            True if the results were stored, False if they are not fixed-shape
+            numeric values or result_id is already stored.
+        """
+        if not values or result_id in self._layouts:
+            return False
+        layout = self._detect_layout(values)
+        if layout is None:
+            return False
+
+        if layout["kind"] == "scalar":
+            dtype, shape, data = np.dtype(layout["dtype"]), (n_rows,), values
+        elif layout["kind"] == "sequence":
+            dtype = np.dtype(layout["dtype"])
+            shape, data = (n_rows, len(values[0])), values
+        else:
+            dtype = np.dtype(list(zip(layout["fields"], layout["dtype"])))
+            shape = (n_rows,)
+            data = [tuple(value.values()) for value in values]
+        try:
+            data = np.array(data, dtype=dtype)
+        except OverflowError:
+            return False
+
+        array = np.lib.format.open_memmap(
+            self._path(result_id), mode="w+", dtype=dtype, shape=shape
+            )
+        array[np.asarray(rows, dtype=np.intp)] = data
+        array.flush()
+        del array
+
+        self._layouts[result_id] = layout
+        with open(os.path.join(self.directory, "layouts.json"), "w") as file:
+            json.dump(self._layouts, file)
+        return True
+
+    def array(self, result_id: str) -> "np.ndarray":
+        """
+        Return the read-only memory-mapped array for a result_id.
+
+        Args:
+            result_id: ID of the results.
+        """
+        if result_id not in self._arrays:
+            if result_id not in self._layouts:
+                raise KeyError(result_id)
+            self._arrays[result_id] = np.load(self._path(result_id), mmap_mode="r")
+        return self._arrays[result_id]
+
+    def read(self, result_id: str, row: int) -> Any:
+        """
+        Return the result of one cow as the value the model returned.
+
+        Args:
+            result_id: ID of the results.
+            row: Position of the cow in the herd when the model ran.
+        """
+        layout = self._layouts[result_id]
+        value = self.array(result_id)[row]
+        if layout["kind"] == "scalar":
+            return value.item()
+        if layout["kind"] == "sequence":
+            values = value.tolist()
+            return tuple(values) if layout["container"] == "tuple" else values
+        return dict(zip(layout["fields"], value.item()))
@@ -0,0 +1,398 @@
+from bisect import bisect_right
+from collections.abc import Sequence
+import json
+import os
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Union
+
+import dill as pickle
+
+from simoolator.cow import Cow
+
+INDEX_FILE = "index.json"
+FORMAT_VERSION = 1
+
+
+class ShardedHerdStore:
+    """
+    Directory of herd shards with an index.
+
+    Cow inputs are written once in shards of a fixed number of cows. Each
+    later save appends a segment per shard holding only the results and
+    metadata added since the previous save, so saving after a model run does
+    not rewrite the existing data. Herd metadata is appended the same way and
+    the model registry, which is small, is rewritten on each save.
+
+    Layout:
+        index.json              Herd name and settings, shard files, cow ids 
+                                and segments
+        registry.pkl            Pickled ModelRegistry
+        indexes.pkl             Key of each secondary index of the herd
+        model_state.pkl         Latest result of each model by cow
+        shards/00000.pkl        List of (cow_id, input_data) tuples
+        segments/00000_0001.pkl Results and metadata added to shard 00000
+        metadata/0001.pkl       Herd metadata entries added in a save
+    """
+    def __init__(self, directory: str, index: Dict[str, Any]) -> None:
+        """
+        Initialize a store for an existing index. Use create or open.
+
+        Args:
+            directory: Path to the store directory.
+            index: Parsed contents of index.json.
+        """
+        self.directory = directory
+        self.index = index
+        self._offsets = []
+        total = 0
+        for shard in self.index["shards"]:
+            self._offsets.append(total)
+            total += len(shard["cow_ids"])
+        self.n_cows = total
+        # Number of results stored for each cow of the loaded shards
+        self._persisted_results: Dict[int, List[int]] = {}
+        self._persisted_metadata = 0
+
+    @classmethod
+    def create(cls, directory: str, name: str, shard_size: int) -> "ShardedHerdStore":
+        """
+        Create a new empty store.
+
+        Args:
+            directory: Path to the store directory, must not contain a store.
+            name: Name of the herd.
+            shard_size: Number of cows written to each shard.
+        """
+        if shard_size < 1:
+            raise ValueError("shard_size must be positive.")
+        if os.path.exists(os.path.join(directory, INDEX_FILE)):
+            raise FileExistsError(f"{directory} already contains a herd store.")
+        for subdirectory in ("shards", "segments", "metadata"):
+            os.makedirs(os.path.join(directory, subdirectory), exist_ok=True)
+        index = {
+            "format_version": FORMAT_VERSION,
+            "name": name,
+            "shard_size": shard_size,
+            "shards": [],
+            "metadata_segments": []
+        }
+        return cls(directory, index)
+
+    @classmethod
+    def open(cls, directory: str) -> "ShardedHerdStore":
+        """
+        Open an existing store.
+
+        Args:
+            directory: Path to the store directory.
+        """
+        with open(os.path.join(directory, INDEX_FILE), "r") as file:
+            index = json.load(file)
+        if index.get("format_version") != FORMAT_VERSION:
+            raise ValueError(f"Unsupported herd store version {index.get('format_version')}.")
+        return cls(directory, index)
+
+    # File helpers
+    def _dump(self, relative_path: str, data: Any) -> None:
+        path = os.path.join(self.directory, relative_path)
+        with open(path + ".tmp", "wb") as file:
+            pickle.dump(data, file)
+        os.replace(path + ".tmp", path)
+
+    def _load(self, relative_path: str) -> Any:
+        with open(os.path.join(self.directory, relative_path), "rb") as file:
+            return pickle.load(file)
+
+    def write_index(self) -> None:
+        """
+        Write index.json. The file is replaced atomically so an interrupted
+        save leaves the previous index intact.
+        """
+        path = os.path.join(self.directory, INDEX_FILE)
+        with open(path + ".tmp", "w") as file:
+            json.dump(self.index, file)
+        os.replace(path + ".tmp", path)
+
+    # Shards
+    @property
+    def n_shards(self) -> int:
+        return len(self.index["shards"])
+
+    def shard_of(self, position: int) -> int:
+        """
+        Return the shard holding the cow at a position in the herd.
+        """
+        if not 0 <= position < self.n_cows:
+            raise IndexError("Cow index out of range.")
+        return bisect_right(self._offsets, position) - 1
+
+    def shard_offset(self, shard: int) -> int:
+        """
+        Return the position in the herd of the first cow in a shard.
+        """
+        return self._offsets[shard]
+
+    def cow_ids(self) -> List[str]:
+        """
+        Return the ids of all stored cows without loading any shard.
+        """
+        return [cow_id for shard in self.index["shards"] for cow_id in shard["cow_ids"]]
+
+    def load_shard(self, shard: int) -> List[Cow]:
+        """
+        Load the cows of a shard and apply its result segments.
+
+        Args:
+            shard: Number of the shard.
+        """
+        entry = self.index["shards"][shard]
+        cows = [Cow(cow_id=cow_id, input_data=input_data)
+                for cow_id, input_data in self._load(entry["file"])]
+        for segment in entry["segments"]:
+            for position, (results, metadata) in self._load(segment).items():
+                cows[position].results.update(results)
+                cows[position].metadata.update(metadata)
+        self._persisted_results[shard] = [len(cow.results) for cow in cows]
+        return cows
+
+    def append_shard(self, cows: List[Cow]) -> None:
+        """
+        Write a new shard with the inputs, results and metadata of cows.
+
+        Args:
+            cows: Cows to write.
+        """
+        shard = self.n_shards
+        entry = {
+            "file": f"shards/{shard:05d}.pkl",
+            "cow_ids": [cow.cow_id for cow in cows],
+            "segments": []
+        }
+        self._dump(entry["file"], [(cow.cow_id, cow.input) for cow in cows])
+        self.index["shards"].append(entry)
+        self._offsets.append(self.n_cows)
+        self.n_cows += len(cows)
+        self._persisted_results[shard] = [0] * len(cows)
+        self.append_segment(shard, cows)
+
+    def append_segment(self, shard: int, cows: List[Cow]) -> None:
+        """
+        Write the results and metadata added to the cows of a loaded shard
+        since the last save.
+
+        Args:
+            shard: Number of the shard.
+            cows: Current cows of the shard.
+        """
+        persisted = self._persisted_results[shard]
+        segment = {}
+        for position, cow in enumerate(cows):
+            if len(cow.results) > persisted[position]:
+                new_ids = list(cow.results)[persisted[position]:]
+                segment[position] = (
+                    {result_id: cow.results[result_id] for result_id in new_ids},
+                    {result_id: cow.metadata[result_id] for result_id in new_ids
+                     if result_id in cow.metadata}
+                )
+                persisted[position] = len(cow.results)
+        if segment:
+            entry = self.index["shards"][shard]
+            file = f"segments/{shard:05d}_{len(entry['segments']) + 1:04d}.pkl"
+            self._dump(file, segment)
+            entry["segments"].append(file)
+
+    # Registry and herd metadata
+    def write_registry(self, model_registry: Any) -> None:
+        self._dump("registry.pkl", model_registry)
+        self.index["registry"] = "registry.pkl"
+
+    def load_registry(self) -> Any:
+        return self._load(self.index["registry"])
+
+    def write_model_state(self, model_state: Dict[str, Any]) -> None:
+        self._dump("model_state.pkl", model_state)
+        self.index["model_state"] = "model_state.pkl"
+
+    def write_indexes(self, indexes: Dict[str, Any]) -> None:
+        self._dump("indexes.pkl", indexes)
+        self.index["indexes"] = "indexes.pkl"
+
+    def load_indexes(self) -> Dict[str, Any]:
+        if "indexes" not in self.index:
+            return {}
+        return self._load(self.index["indexes"])
+
+    def load_settings(self) -> Dict[str, Any]:
+        # Stores saved before the settings were written
+        return self.index.get("settings", {})
+
+    def load_model_state(self) -> Dict[str, Any]:
+        # Stores saved before the model state was written
+        if "model_state" not in self.index:
+            return {}
+        return self._load(self.index["model_state"])
+
+    def append_metadata(self, metadata: Dict[str, Any]) -> None:
+        """
+        Write the herd metadata entries added since the last save.
+        """
+        keys = list(metadata)[self._persisted_metadata:]
+        if keys:
+            file = f"metadata/{len(self.index['metadata_segments']) + 1:04d}.pkl"
+            self._dump(file, {key: metadata[key] for key in keys})
+            self.index["metadata_segments"].append(file)
+            self._persisted_metadata = len(metadata)
+
+    def load_metadata(self) -> Dict[str, Any]:
+        metadata = {}
+        for file in self.index["metadata_segments"]:
+            metadata.update(self._load(file))
+        self._persisted_metadata = len(metadata)
+        return metadata
+
+    # Saving
+    def save(self,
+             name: str,
+             cows: Union[List[Cow], "ShardedCowList"],
+             model_registry: Any,
+             metadata: Dict[str, Any],
+             model_state: Optional[Dict[str, Any]] = None,
+             settings: Optional[Dict[str, Any]] = None,
+             indexes: Optional[Dict[str, Any]] = None
+    ) -> None:
+        """
+        Append everything added to a herd since the last save.
+
+        Args:
+            name: Name of the herd.
+            cows: Cows in the herd. Cows already in the store must still be
+                  at the same position.
+            model_registry: ModelRegistry of the herd.
+            metadata: Herd metadata.
+            model_state: Latest result of each model by cow, see 
+                         Herd.get_latest_result_id.
+            settings: Herd settings that can be written as JSON, stored in 
+                      index.json.
+            indexes: Key of each secondary index by index name.
+        """
+        if isinstance(cows, ShardedCowList) and cows.store is self:
+            loaded = cows.loaded_shards()
+        else:
+            if self.n_cows > len(cows):
+                raise ValueError("Cows were removed since the herd was saved, save to a new directory.")
+            loaded = {}
+            for shard in range(self.n_shards):
+                offset = self.shard_offset(shard)
+                loaded[shard] = cows[offset:offset + len(self.index["shards"][shard]["cow_ids"])]
+
+        for shard, shard_cows in loaded.items():
+            if [cow.cow_id for cow in shard_cows] != self.index["shards"][shard]["cow_ids"]:
+                raise ValueError("Cows were reordered since the herd was saved, save to a new directory.")
+            if shard not in self._persisted_results:
+                # The herd was saved to this store but not loaded from it
+                self._persisted_results[shard] = [0] * len(shard_cows)
+            self.append_segment(shard, shard_cows)
+
+        shard_size = self.index["shard_size"]
+        if isinstance(cows, ShardedCowList) and cows.store is self:
+            new_cows = cows.unsaved_cows()
+        else:
+            new_cows = cows[self.n_cows:]
+        for start in range(0, len(new_cows), shard_size):
+            self.append_shard(new_cows[start:start + shard_size])
+
+        self.index["name"] = name
+        if settings is not None:
+            self.index["settings"] = settings
+        if indexes is not None:
+            self.write_indexes(indexes)
+        self.write_registry(model_registry)
+        if model_state is not None:
+            self.write_model_state(model_state)
+        self.append_metadata(metadata)
+        self.write_index()
+
+
+class ShardedCowList(Sequence):
+    """
+    Sequence of the cows in a ShardedHerdStore.
+
+    Shards are loaded the first time one of their cows is accessed and then
+    kept in memory. Cows appended to the list are held in memory until the
+    herd is saved.
+    """
+    def __init__(self, store: ShardedHerdStore) -> None:
+        self.store = store
+        self._shards: Dict[int, List[Cow]] = {}
+        self._unsaved: List[Cow] = []
+
+    def __len__(self) -> int:
+        return self.store.n_cows + len(self._unsaved)
+
+    def __getitem__(self, index: Union[int, slice]) -> Union[Cow, List[Cow]]:
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if index >= self.store.n_cows:
+            if index >= len(self):
+                raise IndexError("Cow index out of range.")
+            return self._unsaved[index - self.store.n_cows]
+        shard = self.store.shard_of(index)
+        return self._shard(shard)[index - self.store.shard_offset(shard)]
+
+    def __iter__(self) -> Iterator[Cow]:
+        for shard in range(self.store.n_shards):
+            yield from self._shard(shard)
+        yield from self._unsaved
+
+    def __reduce__(self):
+        # Pickling the herd as a single file stores a plain list of all cows
+        return (list, (list(self),))
+
+    def cow_ids(self) -> List[str]:
+        """
+        Return the ids of all cows without loading any shard.
+        """
+        return self.store.cow_ids() + [cow.cow_id for cow in self._unsaved]
+
+    def iter_shards(self) -> Iterator[List[Cow]]:
+        """
+        Yield the cows of each shard followed by the unsaved cows.
+
+        Shards that are not loaded are read without being kept in memory, so 
+        a pass over the herd holds one shard at a time.
+        """
+        for shard in range(self.store.n_shards):
+            cows = self._shards.get(shard)
+            yield cows if cows is not None else self.store.load_shard(shard)
+        if self._unsaved:
+            yield self._unsaved
+
+    def _shard(self, shard: int) -> List[Cow]:
+        if shard not in self._shards:
+            self._shards[shard] = self.store.load_shard(shard)
+        return self._shards[shard]
+
+    def loaded_shards(self) -> Dict[int, List[Cow]]:
+        """
+        Return the shards that have been loaded, by shard number.
+        """
+        return dict(self._shards)
+
+    def unsaved_cows(self) -> List[Cow]:
+        """
+        Return cows appended since the last save and mark them as saved.
+        """
+        cows = self._unsaved
+        first_shard = self.store.n_shards
+        shard_size = self.store.index["shard_size"]
+        for number, start in enumerate(range(0, len(cows), shard_size)):
+            self._shards[first_shard + number] = cows[start:start + shard_size]
+        self._unsaved = []
+        return cows
+
+    def append(self, cow: Cow) -> None:
+        self._unsaved.append(cow)
+
+    def extend(self, cows: Iterable[Cow]) -> None:
+        self._unsaved.extend(cows)
@@ -0,0 +1,285 @@
+from itertools import product
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+try:
+    import numpy as np
+except ImportError: # numpy is only required for sweeps
+    np = None
+
+# Cells of a sweep are stored as a single array, or one array per key for
+# models returning dicts
+SweepValues = Union["np.ndarray", Dict[Any, "np.ndarray"]]
+
+
+def expand_grid(grid: Dict[str, Iterable[Any]]) -> Tuple[Dict[str, List[Any]], List[Dict[str, Any]]]:
+    """
+    Return the values of each argument of a grid and its scenarios.
+
+    Scenarios are the cartesian product of the values, the last argument
+    varies fastest.
+
+    Args:
+        grid: Values of each argument.
+    """
+    if not isinstance(grid, dict) or not grid:
+        raise ValueError("grid must map at least one argument to its values.")
+    values = {arg: list(arg_values) for arg, arg_values in grid.items()}
+    for arg, arg_values in values.items():
+        if not arg_values:
+            raise ValueError(f"No values given for {arg}.")
+    scenarios = [dict(zip(values, combination)) for combination in product(*values.values())]
+    return values, scenarios
+
+
+def is_numeric(array: "np.ndarray") -> bool:
+    """
+    Return True if an array holds bools or numbers.
+    """
+    return array.dtype.kind in "biuf"
+
+
+def split_sweep_output(output: Any, shape: Tuple[int, ...]) -> SweepValues:
+    """
+    Return the output of a model called on arrays as arrays of shape.
+
+    Outputs with the number of dimensions of shape are broadcast to it, dicts
+    are split into one array per key.
+
+    Args:
+        output: Value returned by the model.
+        shape: (cows, scenarios) or (scenarios,).
+
+    Raises:
+        ValueError: If the output does not hold one number per cell.
+    """
+    if isinstance(output, dict):
+        if not output or any(isinstance(value, dict) for value in output.values()):
+            raise ValueError("Only flat dicts of numbers are split.")
+        return {key: split_sweep_output(value, shape) for key, value in output.items()}
+    array = np.asarray(output)
+    if array.ndim != len(shape) or not is_numeric(array):
+        raise ValueError(f"Output with shape {array.shape} does not match {shape}.")
+    return np.broadcast_to(array, shape)
+
+
+def as_row(block: SweepValues) -> SweepValues:
+    """
+    Return the (scenarios,) arrays of one cow as a block with one row.
+    """
+    if isinstance(block, dict):
+        return {key: values[None, :] for key, values in block.items()}
+    return block[None, :]
+
+
+def _cell_kind(value: Any) -> Any:
+    """
+    Return the keys of a dict of numbers, "number" for a number and None for
+    other values.
+    """
+    if isinstance(value, dict):
+        if value and all(isinstance(item, (int, float, np.number)) for item in value.values()):
+            return tuple(value)
+        return None
+    if isinstance(value, (int, float, np.number)):
+        return "number"
+    return None
+
+
+def block_from_results(results: List[List[Any]], valid: "np.ndarray") -> SweepValues:
+    """
+    Pack results of single model calls into the arrays of a block.
+
+    Args:
+        results: One list of results per cow, one result per scenario.
+        valid: Boolean array, False for cells whose call failed.
+    """
+    kinds = {_cell_kind(value) for row, row_valid in zip(results, valid)
+             for value, is_valid in zip(row, row_valid) if is_valid}
+    kind = kinds.pop() if len(kinds) == 1 else None
+    if kind == "number":
+        return np.array([[value if is_valid else 0 for value, is_valid in zip(row, row_valid)]
+                         for row, row_valid in zip(results, valid)])
+    if isinstance(kind, tuple):
+        return {key: np.array([[value[key] if is_valid else 0
+                                for value, is_valid in zip(row, row_valid)]
+                               for row, row_valid in zip(results, valid)])
+                for key in kind}
+    block = np.empty(valid.shape, dtype=object)
+    for row, row_results in enumerate(results):
+        for column, value in enumerate(row_results):
+            block[row, column] = value
+    return block
+
+
+def _block_cells(block: SweepValues) -> "np.ndarray":
+    if isinstance(block, np.ndarray):
+        return block.astype(object)
+    cells = np.empty(next(iter(block.values())).shape, dtype=object)
+    for index in np.ndindex(cells.shape):
+        cells[index] = {key: values[index].item() for key, values in block.items()}
+    return cells
+
+
+def _assemble(blocks: List[Tuple["np.ndarray", "np.ndarray"]],
+              valid: "np.ndarray"
+) -> "np.ndarray":
+    dtype = np.result_type(*(block.dtype for _, block in blocks)) if blocks else np.dtype(np.float64)
+    if not valid.all() and dtype.kind in "biu":
+        # Failed cells hold NaN
+        dtype = np.dtype(np.float64)
+    values = np.empty(valid.shape, dtype=dtype)
+    for positions, block in blocks:
+        values[positions] = block
+    if not valid.all():
+        values[~valid] = None if dtype == object else np.nan
+    return values
+
+
+def assemble_blocks(blocks: List[Tuple[Sequence[int], SweepValues]],
+                    valid: "np.ndarray"
+) -> SweepValues:
+    """
+    Combine the blocks of a sweep into arrays with one row per cow.
+
+    Args:
+        blocks: (positions, block) pairs, each block holds the cells of the
+                cows at positions.
+        valid: Boolean (cows, scenarios) array, False for failed cells.
+
+    Returns:
+        One array, or one array per key if every block holds dicts with the
+        same keys. Failed cells are NaN in numeric arrays and None in object
+        arrays.
+    """
+    blocks = [(np.asarray(positions, dtype=np.intp), block) for positions, block in blocks]
+    keys = {tuple(block) if isinstance(block, dict) else None for _, block in blocks}
+    if len(keys) == 1 and None not in keys:
+        return {key: _assemble([(positions, block[key]) for positions, block in blocks], valid)
+                for key in keys.pop()}
+    if None in keys and len(keys) > 1:
+        blocks = [(positions, _block_cells(block)) for positions, block in blocks]
+    return _assemble(blocks, valid)
+
+
+class SweepResult:
+    """
+    Results of a model run over a grid of argument values, see Herd.sweep.
+
+    Results are held in arrays with one row per cow and one column per
+    scenario, numeric results in typed arrays with NaN for failed runs.
+    Models returning dicts of numbers have one array per key. Other results
+    are stored in object arrays.
+    """
+    def __init__(self,
+                 model_name: str,
+                 run_id: str,
+                 cow_ids: List[str],
+                 grid: Dict[str, List[Any]],
+                 values: SweepValues,
+                 valid: "np.ndarray",
+                 errors: Dict[Tuple[str, int], Exception]
+    ) -> None:
+        """
+        Initialize a SweepResult.
+
+        Args:
+            model_name: Name of the model.
+            run_id: ID of the sweep in the herd metadata.
+            cow_ids: IDs of the cows, one per row.
+            grid: Values of each argument, see expand_grid.
+            values: Array of results or arrays of results by key.
+            valid: Boolean array, False for runs that failed.
+            errors: Exception of each failed run by (cow_id, scenario).
+        """
+        self.model_name = model_name
+        self.run_id = run_id
+        self.cow_ids = cow_ids
+        self.grid = grid
+        self.values = values
+        self.valid = valid
+        self.errors = errors
+        self._positions = None
+
+    def __getstate__(self) -> Dict[str, Any]:
+        state = self.__dict__.copy()
+        state["_positions"] = None
+        return state
+
+    def __repr__(self) -> str:
+        return (f"SweepResult({self.model_name!r}, {len(self.cow_ids)} cows, "
+                f"{self.shape[1]} scenarios)")
+
+    @property
+    def shape(self) -> Tuple[int, int]:
+        """(cows, scenarios)"""
+        return self.valid.shape
+
+    @property
+    def scenarios(self) -> List[Dict[str, Any]]:
+        """Argument values of each scenario, in column order."""
+        return expand_grid(self.grid)[1]
+
+    def scenario_index(self, **overrides: Any) -> int:
+        """
+        Return the column of the scenario with the given argument values.
+
+        Args:
+            overrides: Value of every argument in the grid.
+        """
+        if set(overrides) != set(self.grid):
+            raise ValueError(f"Give a value for each of {list(self.grid)}.")
+        index = 0
+        for arg, values in self.grid.items():
+            if overrides[arg] not in values:
+                raise ValueError(f"{overrides[arg]!r} is not a value of {arg}.")
+            index = index * len(values) + values.index(overrides[arg])
+        return index
+
+    def array(self, key: Optional[Any] = None) -> "np.ndarray":
+        """
+        Return the results with one axis for the cows and one per argument.
+
+        Args:
+            key: Key of the results to return if the model returns dicts.
+        """
+        values = self.values
+        if isinstance(values, dict):
+            if key not in values:
+                raise ValueError(f"Choose a key from {list(values)}.")
+            values = values[key]
+        elif key is not None:
+            raise ValueError("The model does not return dicts.")
+        return values.reshape(len(self.cow_ids), *(len(arg_values) 
+                                                   for arg_values in self.grid.values()))
+
+    def _cell(self, row: int, column: int) -> Any:
+        if not self.valid[row, column]:
+            return None
+        if isinstance(self.values, dict):
+            return {key: values[row, column].item() for key, values in self.values.items()}
+        value = self.values[row, column]
+        return value.item() if isinstance(value, np.generic) else value
+
+    def get(self, cow_id: Union[int, float, str], **overrides: Any) -> Any:
+        """
+        Return the result of a cow in a scenario, None if the run failed.
+
+        Args:
+            cow_id: ID of the cow.
+            overrides: Value of every argument in the grid.
+        """
+        if self._positions is None:
+            self._positions = {cow_id: row for row, cow_id in enumerate(self.cow_ids)}
+        if str(cow_id) not in self._positions:
+            raise ValueError(f"Cow {cow_id} is not in the sweep.")
+        return self._cell(self._positions[str(cow_id)], self.scenario_index(**overrides))
+
+    def scenario(self, **overrides: Any) -> Dict[str, Any]:
+        """
+        Return the results of every cow in a scenario by cow_id.
+
+        Args:
+            overrides: Value of every argument in the grid.
+        """
+        column = self.scenario_index(**overrides)
+        return {cow_id: self._cell(row, column) for row, cow_id in enumerate(self.cow_ids)}
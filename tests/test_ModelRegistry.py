@@ -1,8 +1,14 @@
+import gc
 from typing import Callable, Dict, Any
+import weakref
 
 import pytest
 
-from simoolator.model_registry import ModelRegistry
+import dill as pickle
+
+from simoolator.model_registry import (
+    InputAccessor, ModelRegistry, PathIndex, compile_input_mapping, get_used_defaults
+    )
 
 class TestModelRegistry:
     @pytest.fixture(autouse=True)
@@ -23,6 +29,63 @@ class TestModelRegistry:
         assert registered_model['function'] == model_function
         assert registered_model['input_mapping'] == {'milk': 'milk'}
 
+    def test_register_model_compiles_accessors(self):
+        def model_function(milk, weight, factor=2, offset=1):
+            return milk + weight
+
+        input_structure = {'milk': {'morning': 10}, 'weight': 500, 'factor': 3}
+        self.registry.register_model(model_function, input_structure)
+
+        registered_model = self.registry.models[model_function.__name__]
+        assert set(registered_model['accessors'].keys()) == {'milk', 'weight', 'factor'}
+        assert registered_model['accessors']['weight'].path == 'weight'
+        assert registered_model['used_defaults'] == {'offset': 1}
+
+    def test_register_model_result_mapping(self):
+        def model_function(weight, energy, factor=2):
+            return weight + energy
+
+        self.registry.register_model(
+            model_function, {'weight': 500, 'energy': 1},
+            result_mapping={'energy': 'feed_model.energy', 'factor': 'scale_model'}
+            )
+        registered_model = self.registry.models['model_function']
+        assert registered_model['input_mapping'] == {
+            'weight': 'weight', 'energy': '@results.feed_model.energy', 
+            'factor': '@results.scale_model'
+        }
+        assert registered_model['used_defaults'] == {}
+        assert self.registry.get_upstream('model_function') == ('feed_model', 'scale_model')
+
+        with pytest.raises(ValueError, match="milk is not an argument"):
+            self.registry.register_model(model_function, {}, result_mapping={'milk': 'feed'})
+
+    def test_get_upstream(self):
+        self.registry.register_model(lambda milk: milk, {'milk': 1})
+        assert self.registry.get_upstream('<lambda>') == ()
+        # Registries pickled before result mappings existed
+        del self.registry.models['<lambda>']['upstream']
+        assert self.registry.get_upstream('<lambda>') == ()
+        with pytest.raises(ValueError, match="Model missing is not registered."):
+            self.registry.get_upstream('missing')
+
+    def test_get_accessors(self):
+        def model_function(milk, factor=2):
+            return milk * factor
+
+        self.registry.register_model(model_function, {'milk': {'morning': 10}})
+        accessors, used_defaults = self.registry.get_accessors('model_function')
+        assert accessors['milk']({'milk': {'morning': 10}}) == {'morning': 10}
+        assert used_defaults == {'factor': 2}
+
+        # Registries pickled before accessors existed compile them on demand
+        del self.registry.models['model_function']['accessors']
+        accessors, used_defaults = self.registry.get_accessors('model_function')
+        assert accessors['milk'].path == 'milk'
+
+        with pytest.raises(ValueError, match="Model missing is not registered."):
+            self.registry.get_accessors('missing')
+
     def test_get_model(self):
         model_function = lambda milk: milk
         input_structure = {'milk': {'morning': 10, 'evening': 8}}
@@ -54,3 +117,105 @@ class TestModelRegistry:
         
         input_mapping = self.registry._determine_input_mapping(model_function, input_structure)
         assert input_mapping == expected_mapping
+
+    def test_determine_input_mapping_ambiguous(self, capsys):
+        def model_function(morning, evening, weight):
+            return morning
+
+        input_structure = {
+            'milk': {'morning': 10, 'evening': 8},
+            'feed': {'morning': 5},
+            'weight': 500
+        }
+        input_mapping = self.registry._determine_input_mapping(model_function, input_structure)
+        assert input_mapping == {
+            'morning': 'milk.morning', 'evening': 'milk.evening', 'weight': 'weight'
+        }
+        assert capsys.readouterr().out == (
+            "morning of model_function matches several input paths "
+            "['milk.morning', 'feed.morning'], using milk.morning.\n"
+        )
+
+    def test_path_index(self):
+        index = PathIndex({'milk': {'morning': 10}, 'feed': {'morning': 5, 1: 'a'}}, 0)
+        assert index.find('milk') == ['milk']
+        assert index.find('morning') == ['milk.morning', 'feed.morning']
+        assert index.find('missing') == []
+        assert 'feed.1' in index.paths
+
+    def test_get_path_index_is_cached(self):
+        input_structure = {'milk': {'morning': 10}, 'weight': 500}
+        index = self.registry.get_path_index(input_structure)
+        assert self.registry.get_path_index(dict(input_structure)) is index
+
+        # A known fingerprint skips indexing the structure
+        self.registry.register_model(lambda weight: weight, {}, fingerprint=index.fingerprint)
+        assert self.registry.models['<lambda>']['input_mapping'] == {'weight': 'weight'}
+        assert self.registry.get_path_index({'weight': 500}) is not index
+
+        registry = pickle.loads(pickle.dumps(self.registry))
+        assert registry._path_index is None
+        assert registry.models['<lambda>']['input_mapping'] == {'weight': 'weight'}
+
+    def test_validate_model(self, capsys):
+        def model_function(morning, weight, feed):
+            return morning + weight
+
+        self.registry.register_model(
+            model_function, {'milk': {'morning': 10}, 'weight': 500}, 
+            result_mapping={'feed': 'feed_model'}
+            )
+        self.registry.validate_model('model_function', {'milk': {'morning': 10}, 'weight': 500})
+        assert capsys.readouterr().out == ""
+
+        self.registry.validate_model('model_function', {'morning': 12, 'height': 140})
+        assert self.registry.models['model_function']['input_mapping'] == {
+            'morning': 'morning', 'weight': 'weight', 'feed': '@results.feed_model'
+        }
+        assert self.registry.get_accessors('model_function')[0]['morning'].path == 'morning'
+        assert capsys.readouterr().out == (
+            "Input mapping of model_function updated for the input structure: "
+            "{'morning': 'morning'}\n"
+            "Arguments of model_function missing from the input structure: ['weight']\n"
+        )
+        with pytest.raises(ValueError, match="Model missing is not registered."):
+            self.registry.validate_model('missing', {})
+
+
+class TestInputAccessor:
+    def test_call(self):
+        accessor = InputAccessor('milk.morning')
+        assert accessor({'milk': {'morning': 10}}) == 10
+        with pytest.raises(KeyError):
+            accessor({'milk': {'evening': 8}})
+
+    def test_pickle(self):
+        accessor = pickle.loads(pickle.dumps(InputAccessor('milk.morning')))
+        assert accessor.path == 'milk.morning'
+        assert accessor({'milk': {'morning': 10}}) == 10
+
+    def test_compile_input_mapping_is_cached(self):
+        input_mapping = {'milk': 'milk.morning', 'weight': 'weight'}
+        accessors = compile_input_mapping(input_mapping)
+        assert accessors is compile_input_mapping(dict(input_mapping))
+        assert accessors['milk'].path == 'milk.morning'
+
+    def test_get_used_defaults(self):
+        def model_function(milk, weight=500, factor=2):
+            return milk
+
+        used_defaults = get_used_defaults(model_function, {'milk': 'milk', 'weight': 'weight'})
+        assert used_defaults == {'factor': 2}
+        assert used_defaults is get_used_defaults(model_function, {'milk': 'milk', 'weight': 'weight'})
+
+        # The cache does not keep model functions alive
+        reference = weakref.ref(model_function)
+        del model_function
+        gc.collect()
+        assert reference() is None
+
+        class Unhashable:
+            __hash__ = None
+            def __call__(self, milk, factor=2):
+                return milk
+        assert get_used_defaults(Unhashable(), {'milk': 'milk'}) == {'factor': 2}
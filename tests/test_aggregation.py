@@ -0,0 +1,113 @@
+import math
+import random
+import statistics
+
+import dill as pickle
+import numpy as np
+import pytest
+
+from simoolator.aggregation import ResultAggregator, StreamingStats, TDigest, validate_stats
+
+
+class TestStreamingStats:
+    @pytest.fixture(autouse=True)
+    def setup(self):
+        rng = random.Random(0)
+        self.values = [rng.gauss(100, 15) for _ in range(5000)]
+        self.stats = StreamingStats()
+
+    def test_add(self):
+        for value in self.values:
+            self.stats.add(value)
+        assert self.stats.count == 5000
+        assert self.stats.mean == pytest.approx(statistics.mean(self.values))
+        assert self.stats.variance == pytest.approx(statistics.variance(self.values))
+        assert self.stats.min == min(self.values)
+        assert self.stats.max == max(self.values)
+
+    def test_add_many_matches_add(self):
+        self.stats.add_many(self.values[:1000])
+        self.stats.add_many(np.array(self.values[1000:]))
+        assert self.stats.mean == pytest.approx(statistics.mean(self.values))
+        assert self.stats.variance == pytest.approx(statistics.variance(self.values))
+
+    def test_quantiles(self):
+        self.stats.add_many(self.values)
+        for q in (0.01, 0.25, 0.5, 0.9, 0.99):
+            expected = np.quantile(self.values, q)
+            assert self.stats.quantile(q) == pytest.approx(expected, rel=0.01)
+        assert self.stats.quantile(0) == min(self.values)
+        assert self.stats.quantile(1) == max(self.values)
+
+    def test_merge(self):
+        first, second = StreamingStats(), StreamingStats()
+        first.add_many(self.values[:3000])
+        for value in self.values[3000:]:
+            second.add(value)
+        first.merge(pickle.loads(pickle.dumps(second)))
+        assert first.count == 5000
+        assert first.mean == pytest.approx(statistics.mean(self.values))
+        assert first.variance == pytest.approx(statistics.variance(self.values))
+        assert first.quantile(0.5) == pytest.approx(statistics.median(self.values), rel=0.01)
+
+    def test_histogram(self):
+        self.stats.add_many(self.values)
+        histogram = self.stats.histogram(bins=5)
+        assert histogram["edges"][0] == min(self.values)
+        assert histogram["edges"][-1] == max(self.values)
+        assert sum(histogram["counts"]) == pytest.approx(5000)
+        expected, _ = np.histogram(self.values, bins=histogram["edges"])
+        assert histogram["counts"] == pytest.approx(expected.tolist(), abs=50)
+
+    def test_summary(self):
+        assert math.isnan(self.stats.summary(["mean"])["mean"])
+        self.stats.add_many([1, 2, 3, 4])
+        summary = self.stats.summary(["count", "sum", "mean", "std", "min", "max", "median"])
+        assert summary == {"count": 4, "sum": 10, "mean": 2.5, 
+                           "std": pytest.approx(statistics.stdev([1, 2, 3, 4])),
+                           "min": 1, "max": 4, "median": 2.5}
+
+    def test_validate_stats(self):
+        validate_stats(["mean", "p99.9", "histogram"])
+        with pytest.raises(ValueError, match="Unknown statistic 'average'"):
+            validate_stats(["average"])
+        with pytest.raises(ValueError, match="Unknown statistic 'p101'"):
+            validate_stats(["p101"])
+
+
+class TestTDigest:
+    def test_compression(self):
+        digest = TDigest(compression=50)
+        digest.add_many(np.arange(100000))
+        assert len(digest.means) <= 50
+        assert sum(digest.weights) == 100000
+
+        with pytest.raises(ValueError, match="compression"):
+            TDigest(compression=1)
+
+
+class TestResultAggregator:
+    @pytest.fixture(autouse=True)
+    def setup(self):
+        self.aggregator = ResultAggregator()
+
+    def test_scalar_results(self):
+        self.aggregator.add_many([1, 2.5, None, "text"])
+        self.aggregator.add(3)
+        assert self.aggregator.summary(["count", "max"]) == {"count": 3, "max": 3}
+        assert self.aggregator.skipped == 2
+
+    def test_dict_and_sequence_results(self):
+        self.aggregator.add_many([{"milk": 10, "fat": 0.4}, {"milk": 12, "fat": 0.5}])
+        assert self.aggregator.summary(["mean"]) == {
+            "milk": {"mean": 11}, "fat": {"mean": pytest.approx(0.45)}
+        }
+        other = ResultAggregator()
+        other.add_array(np.array([(14, 0.6)], dtype=[("milk", "int64"), ("fat", "float64")]))
+        self.aggregator.merge(other)
+        assert self.aggregator.summary(["count", "max"])["milk"] == {"count": 3, "max": 14}
+
+        sequences = ResultAggregator()
+        sequences.add_many([(1, 2), (3, 4)])
+        sequences.add_array(np.array([[5, 6]]))
+        assert sequences.summary(["mean"]) == {0: {"mean": 3}, 1: {"mean": 4}}
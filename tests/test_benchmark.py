@@ -0,0 +1,49 @@
+import json
+
+import pytest
+
+from simoolator.benchmark import main, make_cow_records, run_benchmark, write_herd_json
+from simoolator.herd import Herd
+
+
+class TestBenchmark:
+    def test_make_cow_records(self):
+        records = make_cow_records(3, depth=4, seed=1)
+        assert [record["cow_id"] for record in records] == ["cow_1", "cow_2", "cow_3"]
+        diet = records[0]["input_data"]["diet"]
+        assert "level_4_intake" in diet["supplement"]["supplement"]
+        assert records == make_cow_records(3, depth=4, seed=1)
+
+        with pytest.raises(ValueError, match="depth"):
+            make_cow_records(1, depth=1)
+
+    def test_write_herd_json(self, tmp_path):
+        filename = tmp_path / "herd.json"
+        write_herd_json(filename, 5, depth=3)
+        herd = Herd(name="Benchmark")
+        herd.load_cows_from_json(filename)
+        assert len(herd.cows_in_herd) == 5
+        assert herd.check_data_consistency()
+
+    def test_run_benchmark(self, tmp_path):
+        report = run_benchmark(n_cows=4, depth=3, modes=["linear", "gpu"],
+                               repeat=2, directory=tmp_path)
+        assert report["parameters"]["n_cows"] == 4
+        assert "gpu" in report["skipped"]
+        for name in ("load_cows_from_json", "register_model", "check_data_consistency",
+                     "execute_model_linear", "save", "load"):
+            assert len(report["timings"][name]["times"]) == 2
+        assert report["timings"]["execute_model_linear"]["min"] > 0
+        herd = Herd.load(str(tmp_path / "benchmark_herd.pkl"))
+        assert all(len(cow.results) == 1 for cow in herd.cows_in_herd)
+        assert len(herd.metadata) == 1
+
+    def test_main(self, tmp_path):
+        output = tmp_path / "report.json"
+        main(["--cows", "3", "--modes", "linear", "--repeat", "1", "--output", str(output)])
+        with open(output) as file:
+            report = json.load(file)
+        assert list(report["timings"]) == [
+            "load_cows_from_json", "register_model", "check_data_consistency",
+            "execute_model_linear", "save", "load"
+        ]
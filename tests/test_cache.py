@@ -0,0 +1,113 @@
+import os
+
+import dill as pickle
+import pytest
+
+from simoolator.cache import ResultCache, fingerprint_inputs, model_fingerprint
+
+
+def make_model(offset):
+    def model(weight, factor=2):
+        return weight * factor + offset
+    return model
+
+
+class TestFingerprints:
+    def test_model_fingerprint_stable(self):
+        def model(weight, factor=2):
+            return weight * factor
+
+        def same_model(weight, factor=2):
+            return weight * factor
+        same_model.__qualname__ = model.__qualname__
+
+        assert model_fingerprint(model) == model_fingerprint(model)
+        assert model_fingerprint(model) == model_fingerprint(same_model)
+
+    def test_model_fingerprint_changes(self):
+        def model(weight, factor=2):
+            return weight * factor
+        base = model_fingerprint(model)
+
+        model.__defaults__ = (3,)
+        assert model_fingerprint(model) != base
+        assert model_fingerprint(make_model(1)) != model_fingerprint(make_model(2))
+
+        def model(weight, factor=2):
+            return weight + factor
+        assert model_fingerprint(model) != base
+
+    def test_fingerprint_inputs(self):
+        assert fingerprint_inputs({"weight": 500}) == fingerprint_inputs({"weight": 500})
+        assert fingerprint_inputs({"weight": 500}) != fingerprint_inputs({"weight": 501})
+
+
+class TestResultCache:
+    def test_get_and_put(self):
+        cache = ResultCache()
+        assert cache.get("key") is None
+        cache.put("key", [1, 2])
+        assert cache.get("key") == [1, 2]
+        assert "key" in cache
+        assert (cache.hits, cache.misses) == (1, 1)
+
+    def test_lru_eviction(self):
+        cache = ResultCache(max_entries=2)
+        cache.put("a", 1)
+        cache.put("b", 2)
+        cache.get("a")
+        cache.put("c", 3)
+        assert len(cache) == 2
+        assert "b" not in cache
+        assert cache.get("a") == 1
+
+    def test_disk_tier(self, tmpdir):
+        directory = str(tmpdir.join("cache"))
+        cache = ResultCache(max_entries=1, directory=directory)
+        cache.put("abc", {"value": 1})
+        cache.put("def", None)
+        assert cache.get("abc", "missing") == {"value": 1}
+
+        new_cache = ResultCache(directory=directory)
+        assert new_cache.get("def", "missing") is None
+        assert new_cache.get("xyz", "missing") == "missing"
+
+    def test_disk_limit(self, tmpdir):
+        directory = str(tmpdir.join("cache"))
+        cache = ResultCache(max_entries=1, directory=directory, max_disk_entries=10)
+        for value in range(10):
+            cache.put(f"key{value}", value)
+        os.utime(cache._disk_path("key0"), (0, 0))
+        os.utime(cache._disk_path("key1"), (1, 1))
+        cache.put("key10", 10)
+        assert ResultCache(directory=directory)._disk_entries == 9
+        assert "key0" not in cache and "key1" not in cache
+        assert cache.get("key2") == 2
+
+    def test_clear(self, tmpdir):
+        directory = str(tmpdir.join("cache"))
+        cache = ResultCache(directory=directory)
+        cache.put("key", 1)
+        cache.clear()
+        assert len(cache) == 0
+        assert cache.get("key") == 1
+        cache.clear(disk=True)
+        assert "key" not in cache
+        assert ResultCache(directory=directory)._disk_entries == 0
+
+    def test_make_key(self):
+        key = ResultCache.make_key("model", {"weight": 500})
+        assert key.startswith("model_")
+        assert key == ResultCache.make_key("model", {"weight": 500})
+
+    def test_pickle(self):
+        cache = ResultCache()
+        cache.put("key", 1)
+        loaded = pickle.loads(pickle.dumps(cache))
+        assert loaded.get("key") == 1
+
+    def test_invalid_max_entries(self):
+        with pytest.raises(ValueError):
+            ResultCache(max_entries=-1)
+        with pytest.raises(ValueError):
+            ResultCache(max_disk_entries=0)
@@ -0,0 +1,81 @@
+import os
+
+import pytest
+
+from simoolator.checkpoint import Checkpoints, ResultLog
+
+
+class TestResultLog:
+    @pytest.fixture(autouse=True)
+    def setup(self, tmp_path):
+        self.log = ResultLog(str(tmp_path / "run.log"))
+        self.log.append("run", {"model_name": "model", "cow_ids": ["1", "2", "3"]})
+
+    def test_read(self):
+        self.log.append("results", [("1", "model_1", 10, None)])
+        self.log.append("errors", {"2": "ValueError: Too heavy", "3": "KeyError: 'milk'"})
+        self.log.append("results", [("2", "model_2", 20, {"model_name": "model"})])
+        state = self.log.read()
+        assert state["run"]["cow_ids"] == ["1", "2", "3"]
+        assert state["results"] == {"1": ("model_1", 10, None), 
+                                    "2": ("model_2", 20, {"model_name": "model"})}
+        assert state["errors"] == {"3": "KeyError: 'milk'"}
+        assert state["done"] is False
+
+        self.log.append("done", {})
+        assert self.log.read()["done"] is True
+
+    def test_incomplete_record(self):
+        self.log.append("results", [("1", "model_1", 10, None)])
+        size = os.path.getsize(self.log.filename)
+        self.log.append("results", [("2", "model_2", 20, None)])
+        with open(self.log.filename, "r+b") as file:
+            file.truncate(os.path.getsize(self.log.filename) - 3)
+
+        assert list(self.log.read()["results"]) == ["1"]
+        self.log.repair()
+        assert os.path.getsize(self.log.filename) == size
+        self.log.append("results", [("3", "model_3", 30, None)])
+        assert list(self.log.read()["results"]) == ["1", "3"]
+
+    def test_not_a_log(self, tmp_path):
+        log = ResultLog(str(tmp_path / "empty.log"))
+        open(log.filename, "wb").close()
+        with pytest.raises(ValueError, match="is not a result log"):
+            log.read()
+
+
+class TestCheckpoints:
+    @pytest.fixture(autouse=True)
+    def setup(self, tmp_path):
+        self.checkpoints = Checkpoints(str(tmp_path / "checkpoints"), every_n_cows=10)
+
+    def test_create_log(self):
+        run_id, second_id = "model_20240501_123000", "model_20240501_123000_1"
+        log = self.checkpoints.create_log(run_id)
+        self.checkpoints.create_log(second_id)
+        assert sorted(self.checkpoints.list_runs()) == [run_id, second_id]
+        # Each run has its own log
+        with pytest.raises(FileExistsError):
+            self.checkpoints.create_log(run_id)
+
+        log.append("run", {"model_name": "model"})
+        assert self.checkpoints.incomplete_runs() == [run_id]
+        log.append("done", {})
+        assert self.checkpoints.incomplete_runs() == []
+
+    def test_open_log(self):
+        with pytest.raises(ValueError, match="No checkpoint for run missing"):
+            self.checkpoints.open_log("missing")
+
+    def test_invalid_settings(self, tmp_path):
+        with pytest.raises(ValueError, match="every_n_cows"):
+            Checkpoints(str(tmp_path), every_n_cows=0)
+        with pytest.raises(ValueError, match="every_seconds"):
+            Checkpoints(str(tmp_path), every_seconds=0)
+
+    def test_pickle(self):
+        import dill as pickle
+        checkpoints = pickle.loads(pickle.dumps(self.checkpoints))
+        assert checkpoints.directory == self.checkpoints.directory
+        assert checkpoints.every_n_cows == 10
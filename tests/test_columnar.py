@@ -0,0 +1,167 @@
+import dill as pickle
+import numpy as np
+import pytest
+
+from simoolator.columnar import ColumnarCow, ColumnarCowList, ColumnarStore
+from simoolator.cow import Cow
+
+
+class TestColumnarStore:
+    @pytest.fixture(autouse=True)
+    def setup(self):
+        self.input_data = {
+            "milk": {"morning": 10, "evening": 8.5},
+            "weight": 500,
+            "health": {"condition": "good", "vaccinated": True}
+        }
+        self.store = ColumnarStore(self.input_data, capacity=1)
+        self.store.append(self.input_data)
+
+    def test_initialization(self):
+        assert self.store.paths == [
+            "milk.morning", "milk.evening", "weight", 
+            "health.condition", "health.vaccinated"
+        ]
+        assert self.store.columns["milk.morning"].dtype == np.int64
+        assert self.store.columns["milk.evening"].dtype == np.float64
+        assert self.store.columns["health.vaccinated"].dtype == np.bool_
+        assert self.store.columns["health.condition"].dtype == object
+        assert len(self.store) == 1
+
+    def test_from_columns(self):
+        weights = np.array([500, 740])
+        store = ColumnarStore.from_columns({
+            "weight": weights,
+            "milk.morning": [10.5, 12.0],
+            "health.condition": ["good", None]
+        })
+        assert store.columns["weight"] is weights
+        assert store.columns["milk.morning"].dtype == np.float64
+        assert store.columns["health.condition"].dtype == object
+        assert store.get_input(1) == {
+            "weight": 740, "milk": {"morning": 12.0}, "health": {"condition": None}
+        }
+        store.append({"weight": 600, "milk": {"morning": 9.0}, "health": {"condition": "fair"}})
+        assert store.column("weight").tolist() == [500, 740, 600]
+
+        with pytest.raises(ValueError, match="same, non-zero number"):
+            ColumnarStore.from_columns({"weight": [500], "milk.morning": []})
+        with pytest.raises(ValueError, match="both a leaf and a nested dictionary"):
+            ColumnarStore.from_columns({"milk.morning": [10], "milk": [1]})
+
+    def test_initialization_requires_dict(self):
+        with pytest.raises(ValueError, match="non-empty dict"):
+            ColumnarStore([1, 2, 3])
+
+    def test_get_input(self):
+        input_data = self.store.get_input(0)
+        assert input_data == self.input_data
+        assert type(input_data["weight"]) is int
+        assert type(input_data["health"]["vaccinated"]) is bool
+
+    def test_get_value(self):
+        assert self.store.get_value(0, "milk.evening") == 8.5
+        assert self.store.get_value(0, "milk") == {"morning": 10, "evening": 8.5}
+        with pytest.raises(KeyError):
+            self.store.get_value(0, "milk.noon")
+        with pytest.raises(IndexError):
+            self.store.get_value(1, "weight")
+
+    def test_append_grows_columns(self):
+        for weight in range(600, 610):
+            self.store.append({**self.input_data, "weight": weight})
+        assert len(self.store) == 11
+        assert self.store.column("weight").tolist() == [500] + list(range(600, 610))
+
+    def test_append_structure_mismatch(self):
+        with pytest.raises(ValueError, match="does not match"):
+            self.store.append({"milk": {"morning": 10}, "weight": 500})
+
+    def test_set_value_promotes_column(self):
+        self.store.set_value(0, "weight", "heavy")
+        assert self.store.columns["weight"].dtype == object
+        assert self.store.get_value(0, "weight") == "heavy"
+
+    def test_wide_ints(self):
+        self.store.append({**self.input_data, "weight": 2 ** 70})
+        assert self.store.columns["weight"].dtype == object
+        assert self.store.column("weight").tolist() == [500, 2 ** 70]
+        store = ColumnarStore.from_columns({"weight": [500, 2 ** 64]})
+        assert store.columns["weight"].dtype == object
+        assert store.get_input(1) == {"weight": 2 ** 64}
+
+    def test_gather(self):
+        self.store.append({**self.input_data, "weight": 700})
+        assert self.store.gather("weight", [1, 0]).tolist() == [700, 500]
+        assert self.store.gather("health.condition", [0]) is None
+        assert self.store.gather("milk", [0]) is None
+
+    def test_structure_hashes(self):
+        self.store.append(self.input_data)
+        self.store.append({**self.input_data, "health": {"condition": None, "vaccinated": False}})
+        hashes = self.store.structure_hashes([0, 1, 2])
+        assert hashes[0] == hashes[1] != hashes[2]
+
+
+class TestColumnarCow:
+    @pytest.fixture(autouse=True)
+    def setup(self):
+        self.cow1 = Cow(cow_id=1, input_data={"milk": {"morning": 10, "evening": 8},
+                                              "weight": 500})
+        self.cow2 = Cow(cow_id=2, input_data={"milk": {"morning": 12, "evening": 9},
+                                              "weight": 740})
+        self.cow1.results = {"result1": 100}
+        self.store = ColumnarStore(self.cow1.input)
+        self.cows = ColumnarCowList(self.store, [self.cow1, self.cow2])
+
+    def test_views(self):
+        assert all(isinstance(cow, ColumnarCow) for cow in self.cows)
+        assert isinstance(self.cows[0], Cow)
+        assert not hasattr(self.cows[0], "__dict__")
+        view = ColumnarCow(3, self.store, 0)
+        assert view._results is None and view._metadata is None
+        assert self.cows[0].cow_id == "1"
+        assert self.cows[0].input == self.cow1.input
+        assert self.cows[0].results is self.cow1.results
+        assert self.cows[1].get_input_value("milk.morning") == 12
+
+    def test_set_input(self):
+        self.cows[1].set_input_value("weight", 750)
+        assert self.store.get_value(1, "weight") == 750
+        self.cows[1].input = {"milk": {"morning": 1, "evening": 2}, "weight": 3}
+        assert self.cows[1].input == {"milk": {"morning": 1, "evening": 2}, "weight": 3}
+
+    def test_append_mismatch(self):
+        cow3 = Cow(cow_id=3, input_data={"milk": 12})
+        with pytest.raises(ValueError, match="Cow 3"):
+            self.cows.append(cow3)
+
+    def test_mutation(self):
+        cow3 = Cow(cow_id=3, input_data={"milk": {"morning": 7, "evening": 6}, "weight": 600})
+        cow4 = Cow(cow_id=4, input_data={"milk": {"morning": 5, "evening": 4}, "weight": 550})
+        self.cows += [cow3]
+        self.cows.insert(0, cow4)
+        self.cows[1] = cow3
+        self.cows[2:3] = [cow4]
+        assert isinstance(self.cows, ColumnarCowList)
+        assert all(isinstance(cow, ColumnarCow) and cow._store is self.store
+                   for cow in self.cows)
+        assert [cow.cow_id for cow in self.cows] == ["4", "3", "4", "3"]
+        assert self.cows[1].input == cow3.input
+        assert self.cows[2].get_input_value("weight") == 550
+        with pytest.raises(ValueError, match="Cow 5"):
+            self.cows[0] = Cow(cow_id=5, input_data={"milk": 12})
+
+    def test_run_model(self):
+        def model_function(milk, weight):
+            return milk["morning"] + milk["evening"] + weight
+
+        self.cows[0].run_model(model_function, {"milk": "milk", "weight": "weight"})
+        assert 518 in self.cows[0].results.values()
+
+    def test_pickle(self):
+        loaded = pickle.loads(pickle.dumps(self.cows))
+        assert isinstance(loaded, ColumnarCowList)
+        assert loaded[0]._store is loaded.store
+        assert loaded[1].input == self.cow2.input
+        assert loaded[0].results == {"result1": 100}
@@ -1,8 +1,11 @@
 import datetime
+import pickle
 
 import pytest
 
-from simoolator.cow import Cow
+from simoolator.cow import CompactCow, Cow, MetadataSummary, structure_hash
+from simoolator.model_registry import compile_input_mapping
+from simoolator.profiling import Profiler
 
 
 class TestCow:
@@ -73,6 +76,65 @@ class TestCow:
             }
         assert metadata["default_args"] == {}
 
+    def test_run_model_metadata_summary(self):
+        result_id = self.cow.run_model(
+            lambda weight: weight, {"weight": "weight"}, metadata_level="summary"
+            )
+        summary = self.cow.metadata[result_id]
+        assert isinstance(summary, MetadataSummary)
+        assert summary.__getstate__() == (summary.start_time, summary.run_time_ns, False)
+        assert set(summary.as_dict()) == {"start_time", "end_time", "run_time", "cache_hit"}
+
+        restored = MetadataSummary.__new__(MetadataSummary)
+        restored.__setstate__(summary.__getstate__())
+        assert restored == summary
+
+    def test_run_model_metadata_none(self):
+        result_id = self.cow.run_model(
+            lambda weight: weight, {"weight": "weight"}, metadata_level="none"
+            )
+        assert self.cow.results[result_id] == 500
+        assert self.cow.metadata == {}
+
+        with pytest.raises(ValueError, match="Invalid metadata level"):
+            self.cow.run_model(lambda weight: weight, {"weight": "weight"}, metadata_level="all")
+
+    def test_get_input_value(self):
+        assert self.cow.get_input_value("milk.morning") == 10
+        assert self.cow.get_input_value("weight") == 500
+        with pytest.raises(KeyError):
+            self.cow.get_input_value("milk.noon")
+
+    def test_resolve_inputs(self):
+        accessors = compile_input_mapping({"morning": "milk.morning", "weight": "weight"})
+        assert self.cow.resolve_inputs(accessors) == {"morning": 10, "weight": 500}
+
+    def test_run_model_with_accessors(self):
+        def dummy_model(morning, factor=3):
+            return morning * factor
+
+        input_mapping = {"morning": "milk.morning"}
+        self.cow.run_model(
+            dummy_model, input_mapping, compile_input_mapping(input_mapping), {"factor": 3}
+            )
+        metadata = list(self.cow.metadata.values())[0]
+        assert list(self.cow.results.values()) == [30]
+        assert metadata["input_args"] == {"morning": 10}
+        assert metadata["default_args"] == {"factor": 3}
+
+    def test_run_model_profiler(self):
+        profiler = Profiler()
+        self.cow.run_model(lambda weight: weight * 2, {"weight": "weight"}, profiler=profiler)
+        self.cow.run_model(lambda weight: weight * 3, {"weight": "weight"}, profiler=profiler)
+        assert list(self.cow.results.values())[-1] == 1500
+        summary = profiler.summary()
+        assert set(summary) == {"inputs", "model", "metadata", "storage"}
+        assert all(phase["count"] == 2 for phase in summary.values())
+
+    def test_set_input_value(self):
+        self.cow.set_input_value("milk.morning", 11)
+        assert self.cow.input["milk"]["morning"] == 11
+
     def test_list_results(self, capsys):
         self.cow.results = {"result1": 100, "result2": 200}
         self.cow.list_results()
@@ -102,3 +164,75 @@ class TestCow:
             "health": {"temperature": "float", "heart_rate": "int"}
         }
         assert structure == expected_structure
+
+    def test_structure_hash(self):
+        reordered = {
+            "weight": 720,
+            "health": {"heart_rate": 58, "temperature": 100.1},
+            "milk": {"evening": 9, "morning": 11}
+        }
+        assert structure_hash(reordered) == structure_hash(self.cow.input)
+        assert structure_hash({"weight": 1.5}) != structure_hash({"weight": 1})
+        assert structure_hash({"weight": [1, 2]}) != structure_hash({"weight": [1]})
+
+    def test_get_structure_hash(self):
+        cow_hash = self.cow.get_structure_hash()
+        assert cow_hash == structure_hash(self.cow.input)
+        self.cow.set_input_value("weight", 500.5)
+        assert self.cow.get_structure_hash() != cow_hash
+        self.cow.input = {"weight": 500}
+        assert self.cow.get_structure_hash() == structure_hash({"weight": 500})
+
+        # Direct changes need invalidate_structure
+        self.cow.input["milk"] = 10
+        assert self.cow.get_structure_hash() == structure_hash({"weight": 500})
+        self.cow.invalidate_structure()
+        assert self.cow.get_structure_hash() == structure_hash({"weight": 500, "milk": 10})
+        self.cow.input["milk"] = 11.5
+        assert self.cow.get_structure_hash(refresh=True) == structure_hash({"weight": 500, "milk": 1.5})
+        assert self.cow.get_structure_hash() == structure_hash({"weight": 500, "milk": 1.5})
+
+
+class TestCompactCow:
+    @pytest.fixture(autouse=True)
+    def setup(self):
+        self.cow = CompactCow(cow_id=1, input_data={"milk": {"morning": 10}, "weight": 500})
+
+    def test_initialization(self):
+        assert self.cow.cow_id == "1"
+        assert not hasattr(self.cow, "__dict__")
+        assert isinstance(self.cow, Cow)
+        with pytest.raises(AttributeError):
+            self.cow.weight = 500
+        assert self.cow._results is None
+        assert self.cow._metadata is None
+
+    def test_run_model(self):
+        result_id = self.cow.run_model(lambda weight: weight * 2, {"weight": "weight"})
+        assert self.cow.get_result(result_id) == 1000
+        assert self.cow.metadata[result_id]["input_args"] == {"weight": 500}
+
+    def test_result_ids_interned(self):
+        other = CompactCow(cow_id=2, input_data={"weight": 600})
+        self.cow.store_result("".join(["model_", "20240101_000000"]), 1, None)
+        other.store_result("".join(["model_", "20240101_000000"]), 2, None)
+        assert next(iter(self.cow.results)) is next(iter(other.results))
+        assert self.cow._metadata is None
+
+    def test_state_compatible_with_cow(self):
+        self.cow.store_result("result1", 100, {"meta": "data"})
+        state = self.cow.__getstate__()
+        cow = Cow(cow_id=0, input_data=None)
+        cow.__setstate__(state)
+        assert cow.__getstate__() == state
+
+        compact = CompactCow.from_cow(cow)
+        assert compact.__getstate__() == state
+        assert CompactCow(cow_id=3, input_data=1).__getstate__()["results"] == {}
+
+    def test_pickle(self):
+        self.cow.store_result("result1", 100, {"meta": "data"})
+        loaded = pickle.loads(pickle.dumps(self.cow))
+        assert isinstance(loaded, CompactCow)
+        assert loaded.results == {"result1": 100}
+        assert loaded.metadata == {"result1": {"meta": "data"}}
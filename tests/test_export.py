@@ -0,0 +1,75 @@
+import numpy as np
+import pytest
+
+from simoolator.export import (
+    flatten_value, infer_format, merge_kinds, read_batches, split_columns, unflatten,
+    value_kind, write_batches
+    )
+
+
+class TestExport:
+    @pytest.fixture(autouse=True)
+    def setup(self):
+        self.kinds = {"cow_id": "str", "weight": "int", "tags": "json", "note": None,
+                      "name": "str"}
+        self.batches = [
+            {"cow_id": ["1", "2"], "weight": np.array([500, 740]),
+             "tags": [["a"], None], "note": [None, None], "name": ["123", "true"]},
+            {"cow_id": ["3"], "weight": [600], "tags": [{"b": 1}], "note": [None],
+             "name": [""]}
+        ]
+
+    def test_infer_format(self):
+        assert infer_format("herd.parquet") == "parquet"
+        assert infer_format("herd.feather") == "arrow"
+        assert infer_format("herd.txt", "csv") == "csv"
+        with pytest.raises(ValueError, match="Can't infer the format"):
+            infer_format("herd.txt")
+        with pytest.raises(ValueError, match="Invalid format"):
+            infer_format("herd.csv", "xlsx")
+
+    def test_flatten_value(self):
+        assert list(flatten_value({"milk": {"morning": 10}, "empty": {}}, "")) == [
+            ("milk.morning", 10), ("empty", {})
+        ]
+        assert list(flatten_value(5, "@results.model")) == [("@results.model", 5)]
+        assert list(flatten_value({}, "")) == []
+
+    def test_unflatten(self):
+        paths = [("milk", "morning"), ("milk", "evening"), ("weight",)]
+        assert unflatten(paths, [10, None, 500]) == {
+            "milk": {"morning": 10, "evening": None}, "weight": 500
+        }
+        assert unflatten(paths, [10, None, 500], {1}) == {"milk": {"morning": 10}, "weight": 500}
+
+    def test_kinds(self):
+        assert [value_kind(value) for value in (None, True, np.int64(1), 1.5, "a", [1])] == [
+            None, "bool", "int", "float", "str", "json"
+        ]
+        assert merge_kinds(None, "int") == "int"
+        assert merge_kinds("int", "float") == "float"
+        assert merge_kinds("int", "bool") == "json"
+        assert merge_kinds("str", None) == "str"
+
+    def test_split_columns(self):
+        names = ["cow_id", "weight", "@run_id.model", "@results.model.a", "@results.models",
+                 "@missing"]
+        assert split_columns(names, "@results") == (["weight"], {"model": ["@results.model.a"]})
+
+    @pytest.mark.parametrize("format", ["csv", "parquet", "arrow"])
+    def test_write_and_read_batches(self, tmp_path, format):
+        if format != "csv":
+            pytest.importorskip("pyarrow")
+        filename = tmp_path / f"herd.{format}"
+        write_batches(filename, format, self.kinds, iter(self.batches))
+
+        batches = list(read_batches(filename, format, batch_size=2))
+        columns = {name: [value for batch in batches for value in list(batch[name])]
+                   for name in self.kinds}
+        assert columns == {
+            "cow_id": ["1", "2", "3"],
+            "weight": [500, 740, 600],
+            "tags": [["a"], None, {"b": 1}],
+            "note": [None, None, None],
+            "name": ["123", "true", ""]
+        }
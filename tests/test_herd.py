@@ -1,14 +1,25 @@
+import asyncio
 import datetime
 import json
+import time
 import unittest.mock
 
+import numpy as np
 import pytest
 
-from simoolator.cow import Cow
+from simoolator.cache import ResultCache
+from simoolator.cow import CompactCow, Cow, MetadataSummary
+from simoolator.export import read_batches
 from simoolator.herd import Herd
-from simoolator.model_registry import ModelRegistry
+from simoolator.model_registry import RESULTS_KEY, ModelRegistry
+from simoolator.profiling import Profiler
+from simoolator.result_store import StoredResult
 import simoolator.utils as utils
 
+# Models that close over a list change fingerprint as the list grows, 
+# record calls in a global instead
+MODEL_CALLS = []
+
 
 class TestHerd:
     @pytest.fixture(autouse=True)
@@ -33,7 +44,13 @@ class TestHerd:
             "name": self.herd.name,
             "cows_in_herd": self.herd.cows_in_herd,
             "model_registry": self.herd.model_registry,
-            "metadata": self.herd.metadata
+            "metadata": self.herd.metadata,
+            "result_store": None,
+            "model_state": {},
+            "metadata_level": "full",
+            "groups": {},
+            "indexes": {},
+            "checkpoints": None
         }
         assert state == expected_state
 
@@ -56,6 +73,34 @@ class TestHerd:
         assert len(self.herd.cows_in_herd) == 3
         assert self.herd.cows_in_herd[-1] == cow3
 
+    def test_to_columnar(self):
+        self.cow1.results = {"result1": 100}
+        self.herd.to_columnar()
+
+        store = self.herd.columnar_store
+        assert store is not None
+        assert store.column("weight").tolist() == [500, 740]
+        assert self.herd.cows_in_herd[0].input == self.cow1.input
+        assert self.herd.cows_in_herd[0].results == {"result1": 100}
+
+        cow3 = Cow(cow_id=3, input_data={"milk": {"morning": 14, "evening": 10},
+                                         "weight": 610})
+        self.herd.add_cow(cow3)
+        assert len(store) == 3
+        assert self.herd.cows_in_herd[-1].cow_id == "3"
+
+    def test_to_columnar_empty_herd(self):
+        with pytest.raises(ValueError, match="No cows in the herd"):
+            Herd(name="Empty").to_columnar()
+
+    def test_columnar_save_and_load(self, tmpdir):
+        self.herd.to_columnar()
+        file = tmpdir.join("herd.pkl")
+        self.herd.save(str(file))
+        loaded_herd = Herd.load(str(file))
+        assert loaded_herd.columnar_store is not None
+        assert loaded_herd.cows_in_herd[1].input == self.cow2.input
+
     def test_load_cows_from_json(self, tmpdir):
         cows_data = [
             {"cow_id": 3, "input_data": {"milk": {"morning": 14, "evening": 10}}},
@@ -67,6 +112,151 @@ class TestHerd:
         assert len(self.herd.cows_in_herd) == 4
         assert self.herd.cows_in_herd[-1].cow_id == "4"
 
+    def test_load_cows_from_json_compact(self, tmpdir):
+        cows_data = [{"cow_id": 3, "input_data": {"milk": {"morning": 14, "evening": 10}}}]
+        file = tmpdir.join("cows.json")
+        file.write(json.dumps(cows_data))
+        herd = Herd(name="Compact")
+        herd.load_cows_from_json(str(file), compact=True)
+        assert isinstance(herd.cows_in_herd[0], CompactCow)
+
+        model_function = lambda milk: milk["morning"]
+        herd.register_model(model_function)
+        herd.execute_model(model_function.__name__, "cpu", max_workers=1)
+        assert list(herd.cows_in_herd[0].results.values()) == [14]
+
+    def test_load_cows_from_json_duplicates(self, tmpdir):
+        cows_data = [
+            {"cow_id": 3, "input_data": {"weight": 1}},
+            {"cow_id": 3, "input_data": {"weight": 2}},
+            {"cow_id": 1, "input_data": {"weight": 3}}
+        ]
+        file = tmpdir.join("cows.json")
+        file.write(json.dumps(cows_data))
+        with pytest.raises(ValueError, match=r"Duplicate cow IDs .*\['3', '1'\]"):
+            self.herd.load_cows_from_json(str(file))
+        assert len(self.herd.cows_in_herd) == 2
+
+    def test_load_cows_from_ndjson(self, tmpdir):
+        cows_data = [
+            {"cow_id": 3, "input_data": {"milk": {"morning": 14, "evening": 10}}},
+            {"cow_id": 4, "input_data": {"milk": {"morning": 16, "evening": 11}}}
+        ]
+        file = tmpdir.join("cows.ndjson")
+        file.write("\n".join(json.dumps(cow) for cow in cows_data))
+        self.herd.load_cows_from_json(str(file))
+        assert len(self.herd.cows_in_herd) == 4
+        assert self.herd.cows_in_herd[-1].input == {"milk": {"morning": 16, "evening": 11}}
+
+    @pytest.mark.parametrize("format", ["csv", "parquet", "arrow"])
+    @pytest.mark.parametrize("columnar", [False, True])
+    def test_export_and_import_cows(self, tmp_path, format, columnar):
+        if format != "csv":
+            pytest.importorskip("pyarrow")
+        self.cow2.input["tags"] = ["heifer"]
+        model_function = lambda milk: {"total": milk["morning"] + milk["evening"]}
+        self.herd.register_model(model_function)
+        self.herd.execute_model(model_function.__name__)
+        if columnar:
+            del self.cow2.input["tags"]
+            self.herd.to_columnar()
+        filename = tmp_path / f"herd.{format}"
+        self.herd.export(filename, batch_size=1)
+
+        herd = Herd(name="Imported")
+        herd.import_cows(filename, columnar=columnar)
+        assert [cow.input for cow in herd.cows_in_herd] == [
+            cow.input for cow in self.herd.cows_in_herd
+        ]
+        assert (herd.columnar_store is not None) == columnar
+        result_id = self.herd.get_latest_result_id(1, model_function.__name__)
+        assert herd.get_latest_result_id(1, model_function.__name__) == result_id
+        assert herd.get_run_results(model_function.__name__, result_id) == {
+            "1": {"total": 18}, "2": {"total": 21}
+        }
+        # Imported results have no model fingerprint
+        herd.register_model(model_function)
+        assert herd.stale_cows(model_function.__name__) == ["1", "2"]
+
+        with pytest.raises(ValueError, match=r"Duplicate cow IDs .*\['1', '2'\]"):
+            herd.import_cows(filename)
+
+    @pytest.mark.parametrize("format", ["csv", "parquet"])
+    def test_export_and_import_sparse(self, tmp_path, format):
+        if format != "csv":
+            pytest.importorskip("pyarrow")
+        self.cow1.input.update({"name": "123", "note": None})
+        self.cow2.input.update({"name": "true"})
+        model_function = lambda weight: {"heavy": None} if weight > 600 else weight
+        self.herd.register_model(model_function)
+        self.herd.execute_model(model_function.__name__)
+        filename = tmp_path / f"herd.{format}"
+        self.herd.export(filename)
+
+        herd = Herd(name="Imported")
+        herd.import_cows(filename)
+        assert [cow.input for cow in herd.cows_in_herd] == [
+            cow.input for cow in self.herd.cows_in_herd
+        ]
+        result_id = self.herd.get_latest_result_id(1, model_function.__name__)
+        assert herd.get_run_results(model_function.__name__, result_id) == {
+            "1": 500, "2": {"heavy": None}
+        }
+        batch = next(read_batches(filename, format))
+        assert list(batch["@missing"]) == [["@results.<lambda>.heavy"], 
+                                           ["note", "@results.<lambda>"]]
+
+    def test_export_options(self, tmp_path):
+        self.herd.register_model(lambda weight: weight * 2)
+        with pytest.raises(ValueError, match="<lambda> has no results in the herd"):
+            self.herd.export(tmp_path / "herd.csv", models=["<lambda>"])
+        with pytest.raises(ValueError, match="Can't infer the format"):
+            self.herd.export(tmp_path / "herd.txt")
+
+        self.herd.execute_model("<lambda>")
+        self.herd.export(tmp_path / "herd.txt", format="csv", models=[])
+        with open(tmp_path / "herd.txt") as file:
+            assert file.readline().strip() == "cow_id,milk.morning,milk.evening,weight"
+        with pytest.raises(ValueError, match="requires an empty herd"):
+            self.herd.import_cows(tmp_path / "herd.txt", format="csv", columnar=True)
+
+    def test_stream_model_from_json(self, tmpdir):
+        cows_data = [
+            {"cow_id": i, "input_data": {"milk": {"morning": i, "evening": 1}, "weight": 10 * i}}
+            for i in range(5)
+        ]
+        file = tmpdir.join("cows.ndjson")
+        file.write("\n".join(json.dumps(cow) for cow in cows_data))
+
+        def model_function(weight):
+            return weight + 1
+
+        herd = Herd(name="Streamed")
+        herd.register_model(model_function, input_structure=cows_data[0]["input_data"])
+        results = []
+        run_ids = set()
+        for batch in herd.stream_model_from_json(str(file), "model_function", batch_size=2):
+            results.extend(list(cow.results.values())[0] for cow in batch)
+            run_ids.update(result_id for cow in batch for result_id in cow.results)
+            # Streamed cows are not recorded in the herd
+            assert herd.model_state == {}
+
+        assert results == [1, 11, 21, 31, 41]
+        assert herd.cows_in_herd == []
+        assert len(run_ids) == 1
+        run_id = run_ids.pop()
+        assert list(herd.metadata) == [run_id]
+        assert herd.metadata[run_id]["streamed_cows"] == 5
+
+    def test_stream_model_from_json_not_registered(self, tmpdir):
+        with pytest.raises(ValueError, match="not registered"):
+            next(self.herd.stream_model_from_json("cows.json", "missing"))
+
+    def test_register_model_empty_herd(self):
+        herd = Herd(name="Empty")
+        with pytest.raises(ValueError, match="No cows in the herd"):
+            herd.register_model(lambda milk: milk)
+
     def test_save_and_load(self, tmpdir):
         file = tmpdir.join("herd.pkl")
         self.herd.save(str(file))
@@ -74,6 +264,96 @@ class TestHerd:
         assert loaded_herd.name == self.herd.name
         assert len(loaded_herd.cows_in_herd) == 2
 
+    def test_save_and_load_chunked(self, tmpdir):
+        directory = str(tmpdir.join("herd"))
+        model_function = lambda weight: weight * 2
+        self.herd.register_model(model_function)
+        self.herd.execute_model(model_function.__name__)
+        self.herd.save_chunked(directory, shard_size=1)
+
+        loaded_herd = Herd.load_chunked(directory)
+        assert loaded_herd.name == "TestHerd"
+        assert len(loaded_herd.cows_in_herd) == 2
+        assert loaded_herd.cows_in_herd.loaded_shards() == {}
+        assert list(loaded_herd.cows_in_herd[1].results.values()) == [1480]
+        assert list(loaded_herd.cows_in_herd.loaded_shards()) == [1]
+        assert loaded_herd.metadata.keys() == self.herd.metadata.keys()
+        assert model_function.__name__ in loaded_herd.model_registry.models
+
+    def test_save_chunked_appends(self, tmpdir):
+        directory = str(tmpdir.join("herd"))
+        self.herd.save_chunked(directory, shard_size=1)
+        model_function = lambda weight: weight * 2
+        self.herd.register_model(model_function)
+        self.herd.execute_model(model_function.__name__)
+        self.herd.add_cow(Cow(cow_id=3, input_data={"milk": {"morning": 1, "evening": 1},
+                                                    "weight": 1}))
+        self.herd.save_chunked(directory)
+
+        loaded_herd = Herd.load_chunked(directory)
+        assert [cow.cow_id for cow in loaded_herd.cows_in_herd] == ["1", "2", "3"]
+        assert list(loaded_herd.cows_in_herd[0].results.values()) == [1000]
+
+        loaded_herd.execute_model(model_function.__name__)
+        loaded_herd.save_chunked(directory)
+        assert len(Herd.load_chunked(directory).cows_in_herd[2].results) == 1
+
+    def test_save_chunked_to_new_directory(self, tmpdir):
+        model_function = lambda weight: weight * 2
+        self.herd.register_model(model_function)
+        self.herd.execute_model(model_function.__name__)
+        self.herd.save_chunked(str(tmpdir.join("a")), shard_size=1)
+
+        loaded_herd = Herd.load_chunked(str(tmpdir.join("a")))
+        loaded_herd.add_cow(Cow(cow_id=3, input_data={"milk": {"morning": 1, "evening": 1},
+                                                      "weight": 1}))
+        loaded_herd.save_chunked(str(tmpdir.join("b")))
+        copied_herd = Herd.load_chunked(str(tmpdir.join("b")))
+        assert [cow.cow_id for cow in copied_herd.cows_in_herd] == ["1", "2", "3"]
+        assert list(copied_herd.cows_in_herd[1].results.values()) == [1480]
+
+    def test_result_store(self, tmpdir):
+        def model_function(weight):
+            return [weight * 1.0, weight / 2]
+
+        self.herd.enable_result_store(str(tmpdir.join("results")))
+        self.herd.register_model(model_function)
+        self.herd.execute_model(model_function.__name__)
+
+        result_id = list(self.cow2.results.keys())[0]
+        assert isinstance(self.cow2.results[result_id], StoredResult)
+        assert self.herd.get_result(1, result_id) == [740.0, 370.0]
+        assert self.cow1.get_result(result_id) == [500.0, 250.0]
+
+        file = tmpdir.join("herd.pkl")
+        self.herd.save(str(file))
+        loaded_herd = Herd.load(str(file))
+        assert loaded_herd.result_store.directory == self.herd.result_store.directory
+        assert loaded_herd.get_result(1, result_id) == [740.0, 370.0]
+
+    def test_result_store_chunked(self, tmpdir):
+        self.herd.enable_result_store(str(tmpdir.join("results")))
+        self.herd.register_model(lambda weight: weight * 2)
+        self.herd.execute_model("<lambda>")
+        directory = str(tmpdir.join("herd"))
+        self.herd.save_chunked(directory)
+
+        loaded_herd = Herd.load_chunked(directory)
+        assert loaded_herd.result_store.directory == str(tmpdir.join("results"))
+        loaded_herd.execute_model("<lambda>")
+        result_id = loaded_herd.get_latest_result_id(1, "<lambda>")
+        assert isinstance(loaded_herd.cows_in_herd[1].results[result_id], StoredResult)
+        assert loaded_herd.get_result(1, result_id) == 1480
+
+    def test_result_store_non_numeric(self, tmpdir):
+        model_function = lambda weight: "heavy" if weight > 600 else "light"
+        self.herd.enable_result_store(str(tmpdir.join("results")))
+        self.herd.register_model(model_function)
+        self.herd.execute_model(model_function.__name__)
+
+        result_id = list(self.cow1.results.keys())[0]
+        assert self.cow1.results[result_id] == "light"
+
     def test_execute_method(self):
         with unittest.mock.patch.object(Cow, 'run_model') as mock_run_model:
             self.herd.execute_method('run_model', lambda x: x)
@@ -96,6 +376,850 @@ class TestHerd:
             self.herd.execute_model(model_function.__name__, 'linear')
             mock_execute_model_linear.assert_called_once()
 
+    def test_execute_model_cpu(self):
+        def model_function(milk, weight):
+            return milk["morning"] + milk["evening"] + weight
+
+        self.herd.register_model(model_function)
+        self.herd.execute_model(
+            model_function.__name__, "cpu", max_workers=2, chunk_size=1
+            )
+
+        result_id = list(self.cow1.results.keys())[0]
+        assert self.cow1.results[result_id] == 518
+        assert self.cow1.metadata[result_id]["input_args"] == {
+            "milk": {"morning": 10, "evening": 8}, "weight": 500
+            }
+        assert list(self.cow2.results.values()) == [761]
+
+        run_metadata = list(self.herd.metadata.values())[0]
+        assert run_metadata["execution_mode"] == "cpu"
+        assert run_metadata["max_workers"] == 2
+        assert run_metadata["chunk_size"] == 1
+        assert run_metadata["errors"] == {}
+
+    def test_execute_model_cpu_errors(self, capsys):
+        def model_function(weight):
+            if weight > 600:
+                raise ValueError("too heavy")
+            return weight
+
+        self.herd.register_model(model_function)
+        self.herd.execute_model(model_function.__name__, "cpu", max_workers=2)
+        captured = capsys.readouterr()
+
+        assert list(self.cow1.results.values()) == [500]
+        assert self.cow2.results == {}
+        errors = list(self.herd.metadata.values())[0]["errors"]
+        assert list(errors.keys()) == ["2"]
+        assert isinstance(errors["2"], ValueError)
+        assert "2: too heavy" in captured.out
+
+    def test_execute_model_threads(self, capsys):
+        def model_function(weight):
+            if weight == 13:
+                raise ValueError("unlucky")
+            return weight * 2
+
+        for cow_id in range(3, 40):
+            self.herd.add_cow(Cow(cow_id=cow_id, input_data={"weight": cow_id}))
+        self.herd.register_model(model_function)
+        self.herd.execute_model(model_function.__name__, "threads", max_workers=4, chunk_size=5)
+
+        assert list(self.cow2.results.values()) == [1480]
+        assert list(self.herd.get_cow(39).results.values()) == [78]
+        assert self.herd.get_cow(13).results == {}
+        metadata = list(self.cow1.metadata.values())[0]
+        assert metadata["input_args"] == {"weight": 500}
+
+        run_metadata = list(self.herd.metadata.values())[0]
+        assert run_metadata["execution_mode"] == "threads"
+        assert run_metadata["max_workers"] == 4
+        assert run_metadata["chunk_size"] == 5
+        assert list(run_metadata["errors"]) == ["13"]
+        assert "13: unlucky" in capsys.readouterr().out
+
+    def test_execute_model_threads_invalid(self):
+        model_function = lambda weight: weight
+        self.herd.register_model(model_function)
+        with pytest.raises(ValueError, match="must be positive"):
+            self.herd.execute_model(model_function.__name__, "threads", max_workers=0)
+
+    def test_execute_model_vectorized(self):
+        calls = []
+        def model_function(weight, factor=2):
+            calls.append(weight)
+            return [weight * factor, {"half": weight / 2}]
+
+        self.herd.register_model(model_function)
+        self.herd.execute_model(model_function.__name__, "vectorized")
+
+        assert len(calls) == 1
+        assert list(self.cow1.results.values()) == [[1000, {"half": 250.0}]]
+        assert list(self.cow2.results.values()) == [[1480, {"half": 370.0}]]
+        metadata = list(self.cow2.metadata.values())[0]
+        assert metadata["input_args"] == {"weight": 740}
+        assert metadata["default_args"] == {"factor": 2}
+
+        run_metadata = list(self.herd.metadata.values())[0]
+        assert run_metadata["execution_mode"] == "vectorized"
+        assert run_metadata["vectorized_cows"] == 2
+        assert run_metadata["fallback_cows"] == 0
+
+    def test_execute_model_vectorized_fallback(self):
+        cow3 = Cow(cow_id=3, input_data={"milk": {"morning": 14, "evening": 10},
+                                         "weight": "heavy"})
+        self.herd.add_cow(cow3)
+        def model_function(weight):
+            return weight * 2
+
+        self.herd.register_model(model_function)
+        self.herd.execute_model(model_function.__name__, "vectorized")
+
+        assert list(self.cow1.results.values()) == [1000]
+        assert list(cow3.results.values()) == ["heavyheavy"]
+        run_metadata = list(self.herd.metadata.values())[0]
+        assert run_metadata["vectorized_cows"] == 2
+        assert run_metadata["fallback_cows"] == 1
+
+    def test_execute_model_vectorized_model_not_vectorizable(self, capsys):
+        def model_function(weight):
+            if weight > 600:
+                raise ValueError("too heavy")
+            return weight
+
+        self.herd.register_model(model_function)
+        self.herd.execute_model(model_function.__name__, "vectorized")
+
+        assert list(self.cow1.results.values()) == [500]
+        assert self.cow2.results == {}
+        run_metadata = list(self.herd.metadata.values())[0]
+        assert run_metadata["vectorized_cows"] == 0
+        assert isinstance(run_metadata["errors"]["2"], ValueError)
+
+    def test_execute_model_vectorized_columnar(self):
+        calls = []
+        def model_function(milk, weight):
+            calls.append(weight)
+            return weight + 1
+
+        self.herd.to_columnar()
+        self.herd.register_model(model_function)
+        self.herd.execute_model(model_function.__name__, "vectorized")
+
+        # milk maps to a nested dict, so the herd runs cow by cow
+        assert len(calls) == 2
+        assert list(self.herd.cows_in_herd[1].results.values()) == [741]
+
+        def weight_model(weight, factor=2):
+            calls.append(weight)
+            return weight * factor
+
+        self.herd.register_model(weight_model)
+        self.herd.execute_model(weight_model.__name__, "vectorized")
+        assert len(calls) == 3
+        assert 1480 in self.herd.cows_in_herd[1].results.values()
+        metadata = list(self.herd.cows_in_herd[0].metadata.values())[-1]
+        assert metadata["input_args"] == {"weight": 500}
+
+        self.herd.metadata_level = "summary"
+        self.herd.execute_model(weight_model.__name__, "vectorized")
+        assert len(calls) == 4
+        summaries = [list(cow.metadata.values())[-1] for cow in self.herd.cows_in_herd]
+        assert summaries[0] is summaries[1]
+
+    def test_execute_model_cache(self):
+        calls = MODEL_CALLS
+        calls.clear()
+        def model_function(weight):
+            MODEL_CALLS.append(weight)
+            return weight * 2
+
+        cache = ResultCache()
+        self.herd.register_model(model_function)
+        self.herd.execute_model(model_function.__name__, cache=cache)
+        assert calls == [500, 740]
+        assert len(cache) == 2
+
+        self.cow2.input["weight"] = 750
+        self.herd.execute_model(model_function.__name__, cache=cache)
+        assert calls == [500, 740, 750]
+
+        metadata = list(self.cow1.metadata.values())[-1]
+        assert metadata["cache_hit"] is True
+        assert metadata["input_args"] == {"weight": 500}
+        assert self.cow1.get_result(list(self.cow1.results)[-1]) == 1000
+        assert self.cow2.get_result(list(self.cow2.results)[-1]) == 1500
+
+        run_metadata = list(self.herd.metadata.values())[-1]
+        assert run_metadata["cache_hits"] == 1
+        assert run_metadata["cache_misses"] == 1
+
+    def test_execute_model_cache_all_hits(self):
+        model_function = lambda weight: weight * 2
+        cache = ResultCache()
+        self.herd.register_model(model_function)
+        self.herd.execute_model(model_function.__name__, "vectorized", cache=cache)
+        self.herd.metadata.clear()
+        self.herd.execute_model(model_function.__name__, "vectorized", cache=cache)
+
+        run_metadata = list(self.herd.metadata.values())[0]
+        assert run_metadata["execution_mode"] == "vectorized"
+        assert run_metadata["cache_hits"] == 2
+        assert run_metadata["errors"] == {}
+
+    def test_execute_model_incremental(self):
+        MODEL_CALLS.clear()
+        def model_function(weight):
+            MODEL_CALLS.append(weight)
+            return weight * 2
+
+        self.herd.register_model(model_function)
+        assert self.herd.stale_cows(model_function.__name__) == ["1", "2"]
+        self.herd.execute_model(model_function.__name__, incremental=True)
+        assert MODEL_CALLS == [500, 740]
+        assert self.herd.stale_cows(model_function.__name__) == []
+
+        self.herd.execute_model(model_function.__name__, incremental=True)
+        assert MODEL_CALLS == [500, 740]
+        assert list(self.herd.metadata.values())[-1]["skipped_cows"] == 2
+
+        self.cow2.input["weight"] = 750
+        assert self.herd.stale_cows(model_function.__name__) == ["2"]
+        self.herd.execute_model(model_function.__name__, incremental=True)
+        assert MODEL_CALLS == [500, 740, 750]
+        result_id = self.herd.get_latest_result_id(1, model_function.__name__)
+        assert self.cow2.get_result(result_id) == 1500
+
+    def test_execute_model_incremental_model_changed(self):
+        model_function = lambda weight: weight * 2
+        self.herd.register_model(model_function)
+        self.herd.execute_model(model_function.__name__, incremental=True)
+
+        model_function = lambda weight: weight * 3
+        self.herd.remove_model(model_function.__name__)
+        self.herd.register_model(model_function)
+        assert self.herd.stale_cows(model_function.__name__) == ["1", "2"]
+
+    def test_execute_model_incremental_after_full_run(self):
+        model_function = lambda weight: weight * 2
+        self.herd.register_model(model_function)
+        assert self.herd.get_latest_result_id(0, model_function.__name__) is None
+        self.herd.execute_model(model_function.__name__)
+        assert self.herd.get_latest_result_id(0, model_function.__name__) in self.cow1.results
+        # Inputs are only fingerprinted by incremental runs
+        assert self.herd.stale_cows(model_function.__name__) == ["1", "2"]
+
+    @pytest.mark.parametrize("execution_mode", 
+                             ["linear", "cpu", "threads", "vectorized", "async"])
+    def test_execute_model_run_id(self, execution_mode):
+        model_function = lambda weight: weight * 2
+        self.herd.register_model(model_function)
+        self.herd.execute_model(model_function.__name__, execution_mode)
+        self.herd.execute_model(model_function.__name__, execution_mode)
+
+        first_id, second_id = self.herd.metadata
+        assert first_id != second_id
+        assert self.herd.metadata[second_id]["run_id"] == second_id
+        assert list(self.cow1.results) == [first_id, second_id]
+        assert list(self.cow2.results) == [first_id, second_id]
+        assert self.herd.list_runs(model_function.__name__) == [first_id, second_id]
+        assert self.herd.get_run_cows(model_function.__name__, second_id) == ["1", "2"]
+
+    def test_run_index(self, tmp_path):
+        def model_function(weight):
+            if weight > 600:
+                raise ValueError("Too heavy")
+            return weight * 2
+
+        self.herd.register_model(model_function)
+        self.herd.execute_model("model_function", cache=ResultCache())
+        self.herd.execute_model("model_function", where="weight > 0", retries=1)
+        first_id, second_id = self.herd.list_runs("model_function")
+        assert self.herd.get_run_cows("model_function", first_id) == ["1"]
+        assert self.herd.get_run_results("model_function", second_id) == {"1": 1000}
+        with pytest.raises(ValueError, match="No run missing of model_function"):
+            self.herd.get_run_cows("model_function", "missing")
+
+        self.herd.remove_cow(1)
+        assert self.herd.get_run_cows("model_function", first_id) == []
+
+        filename = tmp_path / "herd.pkl"
+        self.herd.save(filename)
+        assert Herd.load(filename).list_runs("model_function") == [first_id, second_id]
+
+    @pytest.mark.parametrize("execution_mode", ["linear", "cpu", "threads", "vectorized"])
+    def test_execute_model_profiler(self, execution_mode):
+        model_function = lambda weight: weight * 2
+        self.herd.register_model(model_function)
+        profiler = Profiler()
+        self.herd.execute_model(model_function.__name__, execution_mode, profiler=profiler)
+
+        assert list(self.cow2.results.values()) == [1480]
+        expected_count = 1 if execution_mode == "vectorized" else 2
+        for phase in profiler.summary().values():
+            assert phase["count"] == expected_count
+            assert phase["total_ns"] >= 0
+
+    @pytest.mark.parametrize("execution_mode", ["linear", "cpu", "threads", "vectorized"])
+    def test_metadata_level_summary(self, execution_mode):
+        herd = Herd(name="Summary", metadata_level="summary")
+        herd.add_cow(self.cow1)
+        model_function = lambda weight, factor=2: weight * factor
+        herd.register_model(model_function)
+        herd.execute_model(model_function.__name__, execution_mode)
+
+        result_id = list(self.cow1.results)[0]
+        assert self.cow1.results[result_id] == 1000
+        summary = self.cow1.metadata[result_id]
+        assert isinstance(summary, MetadataSummary)
+        assert summary.run_time_ns >= 0
+        assert summary.cache_hit is False
+        assert "start_time" in summary.as_dict()
+
+        run_metadata = list(herd.metadata.values())[0]
+        assert run_metadata["model_name"] == "<lambda>"
+        assert run_metadata["default_args"] == {"factor": 2}
+        assert run_metadata["metadata_level"] == "summary"
+
+    @pytest.mark.parametrize("execution_mode", ["linear", "cpu", "vectorized"])
+    def test_metadata_level_none(self, execution_mode):
+        self.herd.metadata_level = "none"
+        model_function = lambda weight: weight * 2
+        self.herd.register_model(model_function)
+        self.herd.execute_model(model_function.__name__, execution_mode)
+        assert list(self.cow2.results.values()) == [1480]
+        assert self.cow2.metadata == {}
+
+    def test_metadata_level_cache_hit(self):
+        self.herd.metadata_level = "summary"
+        model_function = lambda weight: weight * 2
+        cache = ResultCache()
+        self.herd.register_model(model_function)
+        self.herd.execute_model(model_function.__name__, cache=cache)
+        self.cow1.results.clear()
+        self.cow1.metadata.clear()
+        self.herd.execute_model(model_function.__name__, cache=cache)
+        assert list(self.cow1.metadata.values())[0].cache_hit is True
+
+    def test_metadata_level_saved(self, tmpdir):
+        self.herd.metadata_level = "summary"
+        self.herd.register_model(lambda weight: weight * 2)
+        self.herd.execute_model("<lambda>")
+        directory = str(tmpdir.join("herd"))
+        self.herd.save_chunked(directory)
+
+        loaded_herd = Herd.load_chunked(directory)
+        assert loaded_herd.metadata_level == "summary"
+        assert isinstance(list(loaded_herd.cows_in_herd[0].metadata.values())[0], MetadataSummary)
+        file = str(tmpdir.join("herd.pkl"))
+        self.herd.save(file)
+        assert Herd.load(file).metadata_level == "summary"
+
+    def test_metadata_level_invalid(self):
+        with pytest.raises(ValueError, match="Invalid metadata level"):
+            Herd(name="Invalid", metadata_level="some")
+
+    def test_execute_model_where(self):
+        model_function = lambda weight: weight * 2
+        self.herd.register_model(model_function)
+        self.herd.execute_model(model_function.__name__, where="weight > 600")
+        assert self.cow1.results == {}
+        assert list(self.cow2.results.values()) == [1480]
+
+        run_metadata = list(self.herd.metadata.values())[-1]
+        assert run_metadata["where"] == "weight > 600"
+        assert run_metadata["selected_cows"] == 1
+
+    @pytest.mark.parametrize("execution_mode", ["linear", "cpu", "vectorized"])
+    def test_execute_model_where_columnar(self, execution_mode):
+        self.herd.to_columnar()
+        model_function = lambda weight: weight * 2
+        self.herd.register_model(model_function)
+        self.herd.execute_model(
+            model_function.__name__, execution_mode, where="milk.morning < 11"
+            )
+        assert list(self.herd.cows_in_herd[0].results.values()) == [1000]
+        assert self.herd.cows_in_herd[1].results == {}
+
+    def test_execute_model_where_incremental(self):
+        MODEL_CALLS.clear()
+        def model_function(weight):
+            MODEL_CALLS.append(weight)
+            return weight
+
+        self.herd.register_model(model_function)
+        self.herd.execute_model(model_function.__name__, incremental=True, where="weight < 600")
+        self.herd.execute_model(model_function.__name__, incremental=True)
+        assert MODEL_CALLS == [500, 740]
+        assert list(self.herd.metadata.values())[-1]["skipped_cows"] == 1
+
+    def test_execute_model_result_mapping(self, capsys):
+        def feed_model(weight):
+            return {"intake": weight / 10}
+
+        def growth_model(weight, intake):
+            return weight + intake
+
+        self.herd.register_model(feed_model)
+        self.herd.register_model(growth_model, result_mapping={"intake": "feed_model.intake"})
+        self.herd.execute_model("growth_model")
+        assert self.cow1.results == {}
+        assert "1: 'feed_model'" in capsys.readouterr().out
+
+        self.herd.execute_model("feed_model")
+        self.herd.execute_model("growth_model")
+        result_id = self.herd.get_latest_result_id(0, "growth_model")
+        assert self.cow1.results[result_id] == 550
+        assert self.cow1.metadata[result_id]["input_args"] == {"weight": 500, "intake": 50}
+        assert RESULTS_KEY not in self.cow1.input
+
+    def test_execute_pipeline(self):
+        MODEL_CALLS.clear()
+        def feed_model(weight):
+            MODEL_CALLS.append("feed")
+            return weight // 100
+
+        def milk_model(milk):
+            MODEL_CALLS.append("milk")
+            return milk["morning"] + milk["evening"]
+
+        def efficiency_model(feed, milk_yield):
+            MODEL_CALLS.append("efficiency")
+            return milk_yield / feed
+
+        self.herd.register_model(feed_model)
+        self.herd.register_model(milk_model)
+        self.herd.register_model(
+            efficiency_model, result_mapping={"feed": "feed_model", "milk_yield": "milk_model"}
+            )
+        self.herd.execute_pipeline(["efficiency_model"])
+        assert sorted(MODEL_CALLS[:4]) == ["feed", "feed", "milk", "milk"]
+        assert MODEL_CALLS[4:] == ["efficiency", "efficiency"]
+        result_id = self.herd.get_latest_result_id(1, "efficiency_model")
+        assert self.cow2.results[result_id] == 3
+
+        # Unchanged upstream results are not recomputed
+        MODEL_CALLS.clear()
+        self.herd.execute_pipeline(["feed_model", "milk_model", "efficiency_model"])
+        assert MODEL_CALLS == []
+
+        # Upstream models rerun on changed inputs, downstream models only 
+        # if the upstream results changed
+        self.cow1.input["weight"] = 520
+        self.cow2.input["weight"] = 900
+        self.herd.execute_pipeline(["efficiency_model"], execution_mode={"feed_model": "threads"})
+        assert MODEL_CALLS == ["feed", "feed", "efficiency"]
+        result_id = self.herd.get_latest_result_id(1, "efficiency_model")
+        assert self.cow2.results[result_id] == 21 / 9
+
+    def test_execute_pipeline_invalid(self):
+        def first(weight, second_result):
+            return weight
+        def second(first_result):
+            return first_result
+
+        self.herd.register_model(first, result_mapping={"second_result": "second"})
+        self.herd.register_model(second, {}, result_mapping={"first_result": "first"})
+        with pytest.raises(ValueError, match="dependency cycle"):
+            self.herd.execute_pipeline(["first"])
+        with pytest.raises(ValueError, match="Model missing is not registered."):
+            self.herd.execute_pipeline(["missing"])
+        self.herd.register_model(lambda weight: weight)
+        with pytest.raises(ValueError, match="Invalid execution mode"):
+            self.herd.execute_pipeline(["<lambda>"], execution_mode="serial")
+
+    def test_execute_model_retries(self, capsys):
+        attempts = {}
+        def flaky_model(weight):
+            attempts[weight] = attempts.get(weight, 0) + 1
+            if weight == 740 and attempts[weight] < 3:
+                raise RuntimeError("Temporary failure")
+            return weight
+
+        self.herd.register_model(flaky_model)
+        self.herd.execute_model("flaky_model", retries=1)
+        assert self.cow2.results == {}
+        # Errors are reported once, after the last attempt
+        assert capsys.readouterr().out.count("2: Temporary failure") == 1
+        self.herd.execute_model("flaky_model", retries=1)
+        assert list(self.cow2.results.values()) == [740]
+        assert attempts == {500: 2, 740: 3}
+        assert list(self.herd.metadata.values())[-1]["retries"] == 1
+        # The cow succeeded on its retry
+        assert list(self.herd.metadata.values())[-1]["errors"] == {}
+
+        with pytest.raises(ValueError, match="retries"):
+            self.herd.execute_model("flaky_model", retries=-1)
+
+    def test_checkpoint_and_resume(self, tmp_path):
+        for cow_id in range(3, 11):
+            self.herd.add_cow(Cow(cow_id=cow_id, input_data={"weight": cow_id}))
+        MODEL_CALLS.clear()
+        def model_function(weight):
+            if weight == 7 and "crashed" not in MODEL_CALLS:
+                MODEL_CALLS.append("crashed")
+                raise KeyboardInterrupt # Stops the run like a crash would
+            MODEL_CALLS.append(weight)
+            return weight * 2
+
+        self.herd.enable_checkpoints(tmp_path, every_n_cows=3, every_seconds=None)
+        self.herd.register_model(model_function)
+        with pytest.raises(KeyboardInterrupt):
+            self.herd.execute_model("model_function")
+        run_id, = self.herd.checkpoints.incomplete_runs()
+        assert run_id.startswith("model_function_")
+
+        # Continue in a new herd as after a restart
+        herd = Herd(name="Restarted")
+        for cow_id in range(1, 11):
+            herd.add_cow(Cow(cow_id=cow_id, input_data={"weight": cow_id}))
+        herd.register_model(model_function)
+        herd.enable_checkpoints(tmp_path)
+        MODEL_CALLS[:] = ["crashed"]
+        herd.resume(run_id)
+        assert MODEL_CALLS == ["crashed", 7, 8, 9, 10]
+        # Results of the first six cows are restored from the log
+        assert [herd.get_result(cow_id, herd.get_latest_result_id(cow_id, "model_function")) 
+                for cow_id in range(10)] == [1000, 1480, 6, 8, 10, 12, 14, 16, 18, 20]
+        assert herd.checkpoints.incomplete_runs() == []
+        assert list(herd.metadata.values())[-1]["run_id"] == run_id
+
+        herd.resume(run_id)
+        assert MODEL_CALLS == ["crashed", 7, 8, 9, 10]
+
+    def test_checkpoint_errors(self, tmp_path):
+        def model_function(weight):
+            if weight > 600:
+                raise ValueError("Too heavy")
+            return weight
+
+        self.herd.enable_checkpoints(tmp_path, every_seconds=None)
+        self.herd.register_model(model_function)
+        self.herd.execute_model("model_function", retries=1)
+        run_id = list(self.herd.metadata)[-1]
+        state = self.herd.checkpoints.open_log(run_id).read()
+        assert list(state["results"]) == ["1"]
+        assert state["errors"] == {"2": "ValueError: Too heavy"}
+
+    def test_resume_without_checkpoints(self, tmp_path):
+        with pytest.raises(ValueError, match="enable_checkpoints"):
+            self.herd.resume("model_20240101_000000")
+        self.herd.enable_checkpoints(tmp_path)
+        with pytest.raises(ValueError, match="No checkpoint for run"):
+            self.herd.resume("model_20240101_000000")
+
+    def test_aggregate(self):
+        for cow_id in range(3, 11):
+            self.herd.add_cow(Cow(cow_id=cow_id, input_data={"milk": {"morning": cow_id, "evening": 1},
+                                                             "weight": 100 * cow_id}))
+        self.herd.register_model(lambda weight: weight)
+        self.herd.execute_model("<lambda>", where="weight < 800")
+        assert self.herd.aggregate("<lambda>", stats=["count", "mean", "min", "max"]) == {
+            "count": 7, "mean": pytest.approx(3740 / 7), "min": 300, "max": 740
+        }
+        # Only the latest result of each cow is aggregated
+        self.herd.execute_model("<lambda>")
+        summary = self.herd.aggregate("<lambda>", stats=["count", "median", "variance"])
+        weights = [500, 740] + [100 * cow_id for cow_id in range(3, 11)]
+        assert summary["count"] == 10
+        assert summary["median"] == pytest.approx(np.median(weights), rel=0.05)
+        assert summary["variance"] == pytest.approx(np.var(weights, ddof=1))
+
+        by_evening = self.herd.aggregate("<lambda>", stats=["count"], by="milk.evening")
+        assert by_evening == {8: {"count": 1}, 9: {"count": 1}, 1: {"count": 8}}
+        by_function = self.herd.aggregate(
+            "<lambda>", stats=["max"], by=lambda cow: cow.input["weight"] > 600
+            )
+        assert by_function == {False: {"max": 600}, True: {"max": 1000}}
+
+        self.herd.add_group("small", [1, 3])
+        self.herd.add_group("large", [2, 10])
+        assert self.herd.aggregate("<lambda>", stats=["mean"], by="groups") == {
+            "small": {"mean": 400}, "large": {"mean": 870}
+        }
+        with pytest.raises(ValueError, match="Unknown statistic"):
+            self.herd.aggregate("<lambda>", stats=["mode"])
+
+    def test_aggregate_result_store(self, tmp_path):
+        self.herd.enable_result_store(str(tmp_path / "results"))
+        def model_function(weight, milk):
+            return {"weight": weight, "milk": milk["morning"] + milk["evening"]}
+        self.herd.register_model(model_function)
+        self.herd.execute_model("model_function")
+        assert isinstance(next(iter(self.cow1.results.values())), StoredResult)
+        assert self.herd.aggregate("model_function", stats=["sum"]) == {
+            "weight": {"sum": 1240}, "milk": {"sum": 39}
+        }
+
+    def test_aggregate_result_store_chunked(self, tmp_path):
+        self.herd.enable_result_store(str(tmp_path / "results"))
+        self.herd.register_model(lambda weight: weight)
+        self.herd.execute_model("<lambda>")
+        self.herd.save_chunked(str(tmp_path / "herd"), shard_size=1)
+
+        herd = Herd.load_chunked(str(tmp_path / "herd"))
+        assert herd.aggregate("<lambda>", stats=["sum"]) == {"sum": 1240}
+        # Stores saved before the result store directory was recorded
+        herd.result_store = None
+        assert herd.aggregate("<lambda>", stats=["count"]) == {"count": 2}
+
+    def test_aggregate_chunked(self, tmp_path):
+        self.herd.register_model(lambda weight: weight)
+        self.herd.execute_model("<lambda>")
+        self.herd.save_chunked(str(tmp_path / "herd"), shard_size=1)
+        herd = Herd.load_chunked(str(tmp_path / "herd"))
+        accumulated = herd.accumulate("<lambda>")
+        assert herd.cows_in_herd.loaded_shards() == {}
+        assert accumulated.summary(["count", "mean"]) == {"count": 2, "mean": 620}
+
+    def test_sweep(self, tmp_path):
+        def model_function(weight, morning, feed=10, factor=1.0):
+            return weight * factor + morning + feed
+        self.herd.register_model(model_function)
+        sweep = self.herd.sweep("model_function", {"feed": [0, 5, 10], "factor": [1.0, 2.0]})
+
+        assert sweep.shape == (2, 6)
+        assert sweep.cow_ids == ["1", "2"]
+        assert sweep.values.dtype == np.float64
+        assert sweep.array().shape == (2, 3, 2)
+        assert sweep.get(2, feed=5, factor=2.0) == 740 * 2 + 12 + 5
+        assert sweep.scenario(feed=0, factor=1.0) == {"1": 510, "2": 752}
+        assert sweep.scenarios[1] == {"feed": 0, "factor": 2.0}
+        metadata = self.herd.metadata[sweep.run_id]
+        assert metadata["execution_mode"] == "sweep"
+        assert metadata["vectorized_cows"] == 2
+        assert metadata["fallback_cows"] == 0
+        # Results are not stored in the cows
+        assert self.cow1.results == {}
+        assert self.herd.list_sweeps("model_function") == [sweep.run_id]
+        assert self.herd.get_sweep("model_function") is sweep
+
+        scalar = self.herd.sweep("model_function", {"feed": [0, 5, 10], "factor": [1.0, 2.0]}, 
+                                 vectorize=False)
+        np.testing.assert_array_equal(scalar.values, sweep.values)
+        assert self.herd.metadata[scalar.run_id]["fallback_cows"] == 2
+        assert self.herd.get_sweep("model_function", sweep.run_id) is sweep
+
+        filename = tmp_path / "herd.pkl"
+        self.herd.save(filename)
+        loaded = Herd.load(filename).get_sweep("model_function", sweep.run_id)
+        assert loaded.get(1, feed=10, factor=1.0) == 520
+
+    def test_sweep_fallback(self):
+        def model_function(weight, feed=10):
+            if weight > 600 and feed > 5:
+                raise ValueError("Too heavy")
+            return {"weight": weight, "feed": feed}
+        self.herd.register_model(model_function)
+        self.herd.add_cow(Cow(cow_id=3, input_data={"milk": {"morning": 1, "evening": 1}}))
+        sweep = self.herd.sweep("model_function", {"feed": [0, 10]})
+
+        np.testing.assert_array_equal(sweep.valid, [[True, True], [True, False], [False, False]])
+        np.testing.assert_array_equal(sweep.values["weight"][:2], [[500, 500], [740, np.nan]])
+        assert sweep.get(1, feed=10) == {"weight": 500, "feed": 10}
+        assert sweep.get(2, feed=10) is None
+        assert isinstance(sweep.errors[("2", 1)], ValueError)
+        assert isinstance(sweep.errors[("3", 0)], KeyError)
+        metadata = self.herd.metadata[sweep.run_id]
+        assert metadata["vectorized_cows"] == 0
+        assert metadata["fallback_cows"] == 2
+        assert set(metadata["errors"]) == {"2", "3"}
+
+    def test_sweep_scenario_vectorized(self):
+        def model_function(weight, feed=10):
+            return weight + feed if weight < 600 else weight - feed
+        self.herd.register_model(model_function)
+        sweep = self.herd.sweep("model_function", {"feed": [1, 2]}, where="weight > 0")
+
+        assert sweep.values.tolist() == [[501, 502], [739, 738]]
+        metadata = self.herd.metadata[sweep.run_id]
+        assert metadata["vectorized_cows"] == 0
+        assert metadata["scenario_vectorized_cows"] == 2
+
+    def test_sweep_invalid(self):
+        self.herd.register_model(lambda weight, feed=10: weight + feed)
+        with pytest.raises(ValueError, match="factor is not an argument of <lambda>"):
+            self.herd.sweep("<lambda>", {"factor": [1, 2]})
+        with pytest.raises(ValueError, match="No values given for feed"):
+            self.herd.sweep("<lambda>", {"feed": []})
+        with pytest.raises(ValueError, match="No sweep"):
+            self.herd.get_sweep("<lambda>")
+
+    def test_select_where(self):
+        self.herd.add_group("all", [1, 2])
+        sub_herd = self.herd.select(group="all", where=lambda cow: cow.input["weight"] > 600)
+        assert sub_herd.cows_in_herd == [self.cow2]
+        assert self.herd.select(where="milk.evening == 8").cows_in_herd == [self.cow1]
+
+    def test_execute_model_async(self):
+        async def model_function(weight):
+            await asyncio.sleep(0.01)
+            return weight * 2
+
+        for cow_id in range(3, 40):
+            self.herd.add_cow(Cow(cow_id=cow_id, input_data={"weight": cow_id}))
+        self.herd.register_model(model_function)
+        start = time.perf_counter()
+        self.herd.execute_model(model_function.__name__, "async", max_workers=40)
+        assert time.perf_counter() - start < 0.3
+        assert list(self.cow2.results.values()) == [1480]
+        assert list(self.herd.get_cow(39).results.values()) == [78]
+        metadata = list(self.cow1.metadata.values())[0]
+        assert metadata["input_args"] == {"weight": 500}
+
+        run_metadata = list(self.herd.metadata.values())[0]
+        assert run_metadata["execution_mode"] == "async"
+        assert run_metadata["max_concurrency"] == 40
+        assert run_metadata["errors"] == {}
+
+    def test_execute_model_async_sync_model(self):
+        def model_function(weight):
+            time.sleep(0.05)
+            return weight + 1
+
+        self.herd.register_model(model_function)
+        start = time.perf_counter()
+        self.herd.execute_model(model_function.__name__, "async")
+        assert time.perf_counter() - start < 0.095
+        assert list(self.cow1.results.values()) == [501]
+
+    def test_execute_model_async_errors_and_timeout(self, capsys):
+        async def model_function(weight):
+            if weight > 600:
+                await asyncio.sleep(1)
+            if weight == 500:
+                raise ValueError("too light")
+            return weight
+
+        self.herd.add_cow(Cow(cow_id=3, input_data={"weight": 550}))
+        self.herd.register_model(model_function)
+        self.herd.execute_model(model_function.__name__, "async", timeout=0.05)
+        errors = list(self.herd.metadata.values())[0]["errors"]
+        assert list(errors) == ["1", "2"]
+        assert isinstance(errors["1"], ValueError)
+        assert isinstance(errors["2"], TimeoutError)
+        assert list(self.herd.get_cow(3).results.values()) == [550]
+        assert "2: Model did not finish within 0.05 seconds." in capsys.readouterr().out
+
+    def test_execute_model_async_in_running_loop(self):
+        model_function = lambda weight: weight * 3
+        self.herd.register_model(model_function)
+
+        async def main():
+            self.herd.execute_model(model_function.__name__, "async")
+        asyncio.run(main())
+        assert list(self.cow1.results.values()) == [1500]
+
+    def test_execute_model_invalid_mode(self):
+        model_function = lambda milk: milk
+        self.herd.register_model(model_function)
+
+        with pytest.raises(ValueError, match="Invalid execution mode"):
+            self.herd.execute_model(model_function.__name__, "quantum")
+
+    def test_add_cow_duplicate(self):
+        with pytest.raises(ValueError, match="Cow 1 is already in the herd"):
+            self.herd.add_cow(Cow(cow_id=1, input_data={}))
+
+    def test_get_cow(self):
+        assert self.herd.get_cow(2) is self.cow2
+        assert self.herd.get_cow("1") is self.cow1
+        assert self.herd.get_cow_position("2") == 1
+        with pytest.raises(ValueError, match="Cow 3 is not in the herd"):
+            self.herd.get_cow(3)
+
+    def test_get_cow_after_direct_change(self):
+        self.herd.cows_in_herd.reverse()
+        assert self.herd.get_cow_position(1) == 1
+        cow3 = Cow(cow_id=3, input_data={})
+        self.herd.cows_in_herd.append(cow3)
+        assert self.herd.get_cow(3) is cow3
+
+    def test_remove_cow(self):
+        self.herd.add_group("heavy", [2])
+        self.herd.create_index("weight", "weight")
+        assert self.herd.remove_cow(1) is self.cow1
+        assert self.herd.cows_in_herd == [self.cow2]
+        assert self.herd.get_cow_position(2) == 0
+        assert self.herd.lookup("weight", 500) == []
+
+        self.herd.add_cow(Cow(cow_id=3, input_data={"weight": 1}))
+        self.herd.add_cow(Cow(cow_id=4, input_data={"weight": 2}))
+        self.herd.remove_cow(3)
+        # The index is updated in place instead of being rebuilt
+        assert self.herd._cow_index == {"2": 0, "4": 1}
+        self.herd.remove_cow(4)
+
+        self.herd.remove_cow(2)
+        assert self.herd.groups == {"heavy": []}
+        with pytest.raises(ValueError, match="not in the herd"):
+            self.herd.remove_cow(2)
+
+    def test_groups(self):
+        self.herd.add_group("heavy", [2, "2"])
+        self.herd.add_group("heavy", [1])
+        assert self.herd.groups == {"heavy": ["2", "1"]}
+        with pytest.raises(ValueError, match="not in the herd"):
+            self.herd.add_group("light", [7])
+        self.herd.remove_group("heavy")
+        with pytest.raises(ValueError, match="Group heavy does not exist"):
+            self.herd.remove_group("heavy")
+
+    def test_create_index(self):
+        self.herd.create_index("morning", "milk.morning")
+        self.herd.create_index("heavy", lambda cow: cow.input["weight"] > 600)
+        self.herd.add_cow(Cow(cow_id=3, input_data={"milk": {"morning": 10, "evening": 7},
+                                                    "weight": 800}))
+        assert self.herd.lookup("morning", 10) == ["1", "3"]
+        assert self.herd.lookup("morning", 99) == []
+        assert self.herd.lookup("heavy", True) == ["2", "3"]
+        with pytest.raises(ValueError, match="Index weight does not exist"):
+            self.herd.lookup("weight", 500)
+        with pytest.raises(ValueError, match="hashable"):
+            self.herd.create_index("milk", "milk")
+
+    @pytest.mark.parametrize("chunked", [False, True])
+    def test_groups_and_indexes_saved(self, tmpdir, chunked):
+        self.herd.add_group("heavy", [2])
+        self.herd.create_index("morning", "milk.morning")
+        self.herd.create_index("heavy", lambda cow: cow.input["weight"] > 600)
+        if chunked:
+            self.herd.save_chunked(str(tmpdir.join("herd")), shard_size=1)
+            loaded_herd = Herd.load_chunked(str(tmpdir.join("herd")))
+            assert loaded_herd.cows_in_herd.loaded_shards() == {}
+        else:
+            self.herd.save(str(tmpdir.join("herd.pkl")))
+            loaded_herd = Herd.load(str(tmpdir.join("herd.pkl")))
+
+        assert loaded_herd.groups == {"heavy": ["2"]}
+        loaded_herd.add_cow(Cow(cow_id=3, input_data={"milk": {"morning": 10, "evening": 7},
+                                                      "weight": 800}))
+        assert loaded_herd.lookup("morning", 10) == ["1", "3"]
+        assert loaded_herd.lookup("heavy", True) == ["2", "3"]
+
+    def test_select(self):
+        self.herd.add_cow(Cow(cow_id=3, input_data={"milk": {"morning": 10, "evening": 7},
+                                                    "weight": 800}))
+        self.herd.create_index("morning", "milk.morning")
+        self.herd.add_group("group", [3, 2])
+
+        assert self.herd.select(cow_ids=[2, 1]).cows_in_herd == [self.cow1, self.cow2]
+        sub_herd = self.herd.select(group="group", index="morning", value=10)
+        assert [cow.cow_id for cow in sub_herd.cows_in_herd] == ["3"]
+        with pytest.raises(ValueError, match="Select cows"):
+            self.herd.select()
+
+        model_function = lambda weight: weight + 1
+        self.herd.register_model(model_function)
+        sub_herd.execute_model(model_function.__name__)
+        assert list(self.herd.get_cow(3).results.values()) == [801]
+        assert self.cow1.results == {}
+
+    def test_get_result_by_cow_id(self):
+        self.cow2.store_result("result", 5, None)
+        assert self.herd.get_result("2", "result") == 5
+
     def test_list_cows(self, capsys):
         self.herd.list_cows()
         captured = capsys.readouterr()
@@ -125,6 +1249,63 @@ class TestHerd:
         self.herd.add_cow(cow3)
         assert self.herd.check_data_consistency() == False
 
+    def test_check_data_consistency_nested_change(self):
+        assert self.herd.check_data_consistency() == True
+        self.herd.cows_in_herd[1].input["milk"]["noon"] = 5
+        assert self.herd.check_data_consistency(verbose=False) == False
+        del self.herd.cows_in_herd[1].input["milk"]["noon"]
+        assert self.herd.check_data_consistency() == True
+
+    def test_check_data_consistency_report(self, capsys):
+        self.herd.add_cow(Cow(cow_id=3, input_data={"milk": {"morning": 10}, "weight": 1.5}))
+        self.herd.add_cow(Cow(cow_id=4, input_data={"milk": {"morning": 10, "evening": 8},
+                                                    "weight": 1}))
+        self.herd.add_cow(Cow(cow_id=5, input_data={"milk": {"morning": 10}, "weight": 2.5}))
+        assert self.herd.check_data_consistency(verbose=False) == False
+        assert capsys.readouterr().out == ""
+
+        # The largest group is the expected structure
+        self.herd.check_data_consistency()
+        assert capsys.readouterr().out == (
+            "The following cow IDs have issues with their input data: ['3', '5']\n"
+            "  Differing paths ['milk.evening', 'weight']: ['3', '5']\n"
+            )
+
+    def test_check_data_consistency_columnar(self, capsys):
+        self.herd.to_columnar()
+        assert self.herd.check_data_consistency()
+        self.herd.cows_in_herd[1].set_input_value("weight", "heavy")
+        assert not self.herd.check_data_consistency()
+        assert "Differing paths ['weight']: ['2']" in capsys.readouterr().out
+
+    def test_execute_model_checks_consistency(self, capsys):
+        self.herd.register_model(lambda weight: weight)
+        self.herd.execute_model("<lambda>")
+        assert capsys.readouterr().out == ""
+
+        self.herd.add_cow(Cow(cow_id=3, input_data={"weight": 3}))
+        self.herd.execute_model("<lambda>")
+        assert "Differing paths ['milk']: ['3']" in capsys.readouterr().out
+        # The same inconsistency is only reported once
+        self.herd.execute_model("<lambda>")
+        assert capsys.readouterr().out == ""
+
+    def test_execute_model_revalidates_input_mapping(self, capsys):
+        self.herd.register_model(lambda morning: morning)
+        for cow in self.herd.cows_in_herd:
+            cow.input = {"morning": cow.input["milk"]["morning"]}
+        self.herd.execute_model("<lambda>")
+        assert "updated for the input structure: {'morning': 'morning'}" in capsys.readouterr().out
+        assert [cow.get_result(self.herd.get_latest_result_id(position, "<lambda>")) 
+                for position, cow in enumerate(self.herd.cows_in_herd)] == [10, 12]
+
+    def test_execute_model_revalidates_nested_change(self, capsys):
+        self.herd.register_model(lambda morning: morning)
+        for cow in self.herd.cows_in_herd:
+            cow.input["morning"] = cow.input.pop("milk")["morning"]
+        self.herd.execute_model("<lambda>")
+        assert "updated for the input structure: {'morning': 'morning'}" in capsys.readouterr().out
+
     def test_get_input_mapping(self):
         with unittest.mock.patch.object(utils, 'print_nested_dict_tree') as mock_print_nested_dict_tree:
             self.herd.model_registry.get_model = unittest.mock.MagicMock(return_value=(None, {"milk": {"morning": "int"}}))
@@ -0,0 +1,62 @@
+import io
+import json
+
+import pytest
+
+from simoolator.cow import Cow
+from simoolator.loaders import _iter_json_array, iter_cow_records, iter_cows
+
+
+class TestLoaders:
+    @pytest.fixture(autouse=True)
+    def setup(self):
+        self.cows_data = [
+            {"cow_id": i, "input_data": {"milk": {"morning": 10 + i, "evening": 8},
+                                         "weight": 500.5 + i, "name": "cow [,]"}}
+            for i in range(5)
+        ]
+
+    def test_iter_json_array_small_reads(self):
+        text = "  \n" + json.dumps(self.cows_data, indent=4)
+        records = list(_iter_json_array(io.StringIO(text), read_size=7))
+        assert records == self.cows_data
+
+    def test_iter_json_array_numbers_across_reads(self):
+        records = list(_iter_json_array(io.StringIO("[12345, 678.5 ,9]"), read_size=3))
+        assert records == [12345, 678.5, 9]
+
+    def test_iter_json_array_empty(self):
+        assert list(_iter_json_array(io.StringIO("[ ]"))) == []
+
+    def test_iter_json_array_invalid(self):
+        with pytest.raises(ValueError, match="Expected a JSON array"):
+            list(_iter_json_array(io.StringIO('{"cow_id": 1}')))
+        with pytest.raises(ValueError, match="Expected ','"):
+            list(_iter_json_array(io.StringIO("[1 2]")))
+        with pytest.raises(ValueError, match="Trailing comma"):
+            list(_iter_json_array(io.StringIO("[1, ]")))
+        with pytest.raises(ValueError):
+            list(_iter_json_array(io.StringIO('[{"cow_id": 1}'), read_size=4))
+
+    def test_iter_cow_records_json(self, tmpdir):
+        file = tmpdir.join("cows.json")
+        file.write(json.dumps(self.cows_data))
+        assert list(iter_cow_records(str(file))) == self.cows_data
+
+    def test_iter_cow_records_ndjson(self, tmpdir):
+        file = tmpdir.join("cows.ndjson")
+        file.write("\n".join(json.dumps(cow) for cow in self.cows_data) + "\n\n")
+        assert list(iter_cow_records(str(file))) == self.cows_data
+
+    def test_iter_cows(self, tmpdir):
+        file = tmpdir.join("cows.json")
+        file.write(json.dumps(self.cows_data))
+        batches = list(iter_cows(str(file), batch_size=2))
+        assert [len(batch) for batch in batches] == [2, 2, 1]
+        assert all(isinstance(cow, Cow) for batch in batches for cow in batch)
+        assert batches[2][0].cow_id == "4"
+        assert batches[0][1].input == self.cows_data[1]["input_data"]
+
+    def test_iter_cows_invalid_batch_size(self, tmpdir):
+        with pytest.raises(ValueError, match="batch_size must be positive"):
+            next(iter_cows("cows.json", batch_size=0))
@@ -0,0 +1,72 @@
+import pytest
+
+from simoolator.columnar import ColumnarCowList, ColumnarStore
+from simoolator.cow import Cow
+from simoolator.predicates import Predicate, filter_positions
+
+
+class TestPredicate:
+    @pytest.fixture(autouse=True)
+    def setup(self):
+        inputs = [
+            {"body": {"weight": 550, "height": 1.4}, "condition": "good", "age": 3},
+            {"body": {"weight": 650, "height": 1.5}, "condition": "fair", "age": 5},
+            {"body": {"weight": 720, "height": 1.6}, "condition": "good", "age": 7},
+        ]
+        self.cows = [Cow(cow_id=i, input_data=data) for i, data in enumerate(inputs)]
+        self.columnar = ColumnarCowList(ColumnarStore(inputs[0]), self.cows)
+
+    def check(self, expression, expected):
+        predicate = Predicate(expression)
+        assert [i for i, cow in enumerate(self.cows) if predicate.matches(cow)] == expected
+        mask = predicate.mask(self.columnar.store, [0, 1, 2])
+        if mask is not None:
+            assert mask.nonzero()[0].tolist() == expected
+        assert filter_positions(self.columnar, expression, self.columnar.store) == expected
+
+    def test_comparisons(self):
+        self.check("body.weight > 600", [1, 2])
+        self.check("body.weight <= 650", [0, 1])
+        self.check("600 < body.weight", [1, 2])
+        self.check("500 < body.weight < 700", [0, 1])
+        self.check("condition == 'good'", [0, 2])
+        self.check("condition != 'good'", [1])
+        self.check("age in [3, 7]", [0, 2])
+        self.check("condition not in ('fair',)", [0, 2])
+        self.check("body['height'] >= 1.5", [1, 2])
+
+    def test_boolean_operators(self):
+        self.check("body.weight > 600 and condition == 'good'", [2])
+        self.check("age < 4 or age > 6", [0, 2])
+        self.check("not (body.weight > 600)", [0])
+        self.check("age > 4 and (condition == 'fair' or body.height > 1.55)", [1, 2])
+
+    def test_path_comparison(self):
+        self.check("body.height < age", [0, 1, 2])
+
+    def test_vectorized_mask(self):
+        store = self.columnar.store
+        assert Predicate("body.weight > 600").mask(store, [0, 1, 2]) is not None
+        assert Predicate("condition == 'good'").mask(store, [0, 1, 2]) is not None
+        # Ordering object columns and non-leaf paths use per-cow evaluation
+        assert Predicate("condition > 'f'").mask(store, [0, 1, 2]) is None
+        assert Predicate("body == 1").mask(store, [0, 1, 2]) is None
+
+    def test_missing_and_incomparable(self):
+        self.cows.append(Cow(cow_id=3, input_data={"body": {"weight": "heavy"}}))
+        self.cows.append(Cow(cow_id=4, input_data={"age": 9}))
+        predicate = Predicate("body.weight > 600")
+        assert [predicate.matches(cow) for cow in self.cows[3:]] == [False, False]
+        assert Predicate("not body.weight > 600").matches(self.cows[4]) is False
+
+    def test_paths(self):
+        predicate = Predicate("body.weight > 600 and body.weight < age")
+        assert predicate.paths == ["body.weight", "age"]
+
+    def test_invalid(self):
+        for expression in ("body.weight >", "1 < 2", "weight + 1 > 2", "f(weight) > 1", "weight"):
+            with pytest.raises(ValueError):
+                Predicate(expression)
+
+    def test_callable(self):
+        assert filter_positions(self.cows, lambda cow: cow.cow_id != "1") == [0, 2]
@@ -0,0 +1,57 @@
+import pytest
+
+from simoolator.profiling import PHASES, Histogram, Profiler
+
+
+class TestProfiler:
+    @pytest.fixture(autouse=True)
+    def setup(self):
+        self.profiler = Profiler()
+
+    def test_histogram(self):
+        histogram = Histogram()
+        for duration in (100, 120, 1000, 50000):
+            histogram.add(duration)
+        summary = histogram.summary()
+        assert summary["count"] == 4
+        assert summary["total_ns"] == 51220
+        assert summary["min_ns"] == 100
+        assert summary["max_ns"] == 50000
+        assert summary["p50_ns"] == 127
+        assert summary["p99_ns"] == 50000
+        assert summary["buckets"] == {"<128": 2, "<1024": 1, "<65536": 1}
+
+    def test_histogram_empty(self):
+        summary = Histogram().summary()
+        assert summary["count"] == 0
+        assert summary["mean_ns"] == 0
+        assert summary["p90_ns"] == 0
+
+    def test_record_run(self):
+        self.profiler.record_run([0, 10, 110, 115, 135])
+        summary = self.profiler.summary()
+        assert list(summary) == list(PHASES)
+        assert [summary[phase]["total_ns"] for phase in PHASES] == [10, 100, 5, 20]
+
+    def test_merge(self):
+        other = Profiler()
+        self.profiler.record("model", 100)
+        other.record("model", 300, count=2)
+        self.profiler.merge(other)
+        summary = self.profiler.summary()["model"]
+        assert summary["count"] == 3
+        assert summary["total_ns"] == 700
+        assert summary["min_ns"] == 100
+        assert summary["max_ns"] == 300
+
+    def test_reset(self):
+        self.profiler.record("inputs", 5)
+        self.profiler.reset()
+        assert self.profiler.summary()["inputs"]["count"] == 0
+
+    def test_report(self, capsys):
+        self.profiler.record_run([0, 10, 110, 115, 135])
+        self.profiler.report()
+        captured = capsys.readouterr()
+        assert "model" in captured.out
+        assert "74.1%" in captured.out
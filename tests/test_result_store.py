@@ -0,0 +1,52 @@
+import dill as pickle
+import numpy as np
+import pytest
+
+from simoolator.result_store import ResultStore, StoredResult
+
+
+class TestResultStore:
+    @pytest.fixture(autouse=True)
+    def setup(self, tmpdir):
+        self.directory = str(tmpdir.join("results"))
+        self.store = ResultStore(self.directory)
+
+    def test_store_scalars(self):
+        assert self.store.store("model_1", [0, 2], [1.5, 2.5], n_rows=3)
+        assert "model_1" in self.store
+        assert self.store.read("model_1", 2) == 2.5
+        array = self.store.array("model_1")
+        assert isinstance(array, np.memmap)
+        assert array.tolist() == [1.5, 0.0, 2.5]
+
+    def test_store_sequences(self):
+        assert self.store.store("model_2", [0, 1], [(1, 2, 3), (4, 5, 6)], n_rows=2)
+        assert self.store.read("model_2", 1) == (4, 5, 6)
+        assert self.store.array("model_2").shape == (2, 3)
+
+    def test_store_records(self):
+        values = [{"total": 10.0, "count": 1}, {"total": 12.5, "count": 2}]
+        assert self.store.store("model_3", [0, 1], values, n_rows=2)
+        assert self.store.read("model_3", 1) == {"total": 12.5, "count": 2}
+        assert type(self.store.read("model_3", 0)["count"]) is int
+
+    def test_store_rejects(self):
+        assert not self.store.store("mixed", [0, 1], [1, 2.5], n_rows=2)
+        assert not self.store.store("strings", [0], ["a"], n_rows=1)
+        assert not self.store.store("ragged", [0, 1], [[1, 2], [1]], n_rows=2)
+        assert not self.store.store("keys", [0, 1], [{"a": 1}, {"b": 1}], n_rows=2)
+        assert not self.store.store("overflow", [0], [2 ** 70], n_rows=1)
+        assert self.store.store("model_1", [0], [1], n_rows=1)
+        assert not self.store.store("model_1", [0], [2], n_rows=1)
+        with pytest.raises(KeyError):
+            self.store.array("strings")
+
+    def test_reopen(self):
+        self.store.store("model_1", [0], [True], n_rows=1)
+        assert ResultStore(self.directory).read("model_1", 0) is True
+
+    def test_stored_result_pickle(self):
+        self.store.store("<lambda>_1", [0], [7], n_rows=1)
+        result = pickle.loads(pickle.dumps(StoredResult(self.store, "<lambda>_1", 0)))
+        assert result.load() == 7
+        assert result.store.directory == self.directory
@@ -0,0 +1,111 @@
+import os
+
+import pytest
+
+from simoolator.cow import Cow
+from simoolator.model_registry import ModelRegistry
+from simoolator.storage import ShardedCowList, ShardedHerdStore
+
+
+class TestShardedHerdStore:
+    @pytest.fixture(autouse=True)
+    def setup(self, tmpdir):
+        self.directory = str(tmpdir.join("store"))
+        self.cows = [Cow(cow_id=i, input_data={"weight": 500 + i}) for i in range(5)]
+        self.cows[0].results = {"result1": 100}
+        self.cows[0].metadata = {"result1": {"model_name": "model"}}
+        self.registry = ModelRegistry()
+        self.store = ShardedHerdStore.create(self.directory, "TestHerd", shard_size=2)
+        self.store.save("TestHerd", self.cows, self.registry, {"run1": {"errors": {}}})
+
+    def test_create(self):
+        assert self.store.n_cows == 5
+        assert self.store.n_shards == 3
+        assert self.store.cow_ids() == ["0", "1", "2", "3", "4"]
+        assert os.path.exists(os.path.join(self.directory, "index.json"))
+        assert len(self.store.index["shards"][0]["segments"]) == 1
+        assert self.store.index["shards"][1]["segments"] == []
+
+    def test_create_existing(self):
+        with pytest.raises(FileExistsError):
+            ShardedHerdStore.create(self.directory, "TestHerd", shard_size=2)
+
+    def test_open_and_load_shard(self):
+        store = ShardedHerdStore.open(self.directory)
+        assert store.shard_of(3) == 1
+        assert store.shard_offset(2) == 4
+        cows = store.load_shard(0)
+        assert [cow.cow_id for cow in cows] == ["0", "1"]
+        assert cows[0].results == {"result1": 100}
+        assert cows[0].metadata == {"result1": {"model_name": "model"}}
+        assert store.load_metadata() == {"run1": {"errors": {}}}
+        assert isinstance(store.load_registry(), ModelRegistry)
+        assert store.load_settings() == {}
+
+    def test_settings(self):
+        self.store.save("TestHerd", self.cows, self.registry, {}, settings={"result_store": "results"})
+        assert ShardedHerdStore.open(self.directory).load_settings() == {"result_store": "results"}
+
+    def test_save_appends_segments(self):
+        self.cows[3].results["result2"] = 200
+        self.cows.append(Cow(cow_id=5, input_data={"weight": 505}))
+        self.store.save("TestHerd", self.cows, self.registry, {"run1": {}, "run2": {}})
+
+        assert self.store.index["shards"][1]["segments"] == ["segments/00001_0001.pkl"]
+        assert self.store.index["shards"][0]["segments"] == ["segments/00000_0001.pkl"]
+        assert self.store.n_shards == 4
+        assert len(self.store.index["metadata_segments"]) == 2
+
+        store = ShardedHerdStore.open(self.directory)
+        assert store.load_shard(1)[1].results == {"result2": 200}
+        assert store.load_shard(3)[0].input == {"weight": 505}
+
+    def test_save_reordered(self):
+        self.cows.reverse()
+        with pytest.raises(ValueError, match="reordered"):
+            self.store.save("TestHerd", self.cows, self.registry, {})
+        with pytest.raises(ValueError, match="removed"):
+            self.store.save("TestHerd", self.cows[:2], self.registry, {})
+
+
+class TestShardedCowList:
+    @pytest.fixture(autouse=True)
+    def setup(self, tmpdir):
+        directory = str(tmpdir.join("store"))
+        cows = [Cow(cow_id=i, input_data={"weight": 500 + i}) for i in range(5)]
+        ShardedHerdStore.create(directory, "TestHerd", shard_size=2).save(
+            "TestHerd", cows, ModelRegistry(), {}
+            )
+        self.store = ShardedHerdStore.open(directory)
+        self.cows = ShardedCowList(self.store)
+
+    def test_lazy_loading(self):
+        assert len(self.cows) == 5
+        assert self.cows.loaded_shards() == {}
+        assert self.cows[3].cow_id == "3"
+        assert list(self.cows.loaded_shards()) == [1]
+        assert self.cows[3] is self.cows[-2]
+        assert [cow.cow_id for cow in self.cows[1:4]] == ["1", "2", "3"]
+        with pytest.raises(IndexError):
+            self.cows[5]
+
+    def test_iteration_and_append(self):
+        self.cows.append(Cow(cow_id=5, input_data={"weight": 505}))
+        assert len(self.cows) == 6
+        assert [cow.cow_id for cow in self.cows] == ["0", "1", "2", "3", "4", "5"]
+        assert self.cows[5].cow_id == "5"
+
+    def test_cow_ids(self):
+        self.cows.append(Cow(cow_id=5, input_data={"weight": 505}))
+        assert self.cows.cow_ids() == ["0", "1", "2", "3", "4", "5"]
+        assert self.cows.loaded_shards() == {}
+
+    def test_save_appends_only_loaded_shards(self):
+        self.cows[0].results["result1"] = 1
+        self.cows.append(Cow(cow_id=5, input_data={"weight": 505}))
+        self.store.save("TestHerd", self.cows, ModelRegistry(), {})
+
+        assert set(self.cows.loaded_shards()) == {0, 3}
+        assert self.store.n_cows == 6
+        assert self.store.index["shards"][0]["segments"] == ["segments/00000_0001.pkl"]
+        assert self.cows[5].cow_id == "5"
@@ -0,0 +1,112 @@
+import pickle
+import subprocess
+import sys
+
+import numpy as np
+import pytest
+
+from simoolator.sweep import (
+    SweepResult, as_row, assemble_blocks, block_from_results, expand_grid, split_sweep_output
+    )
+
+
+class TestSweep:
+    @pytest.fixture(autouse=True)
+    def setup(self):
+        self.grid = {"feed": [10, 12, 14], "factor": [1.0, 1.5]}
+        self.valid = np.array([[True] * 6, [True, False, True, True, True, True]])
+        values = np.arange(12, dtype=np.float64).reshape(2, 6)
+        values[1, 1] = np.nan
+        self.result = SweepResult("model", "model_run", ["1", "2"], self.grid, values,
+                                  self.valid, {("2", 1): ValueError("Too heavy")})
+
+    def test_expand_grid(self):
+        values, scenarios = expand_grid({"feed": (10, 12), "factor": iter([1.0, 1.5])})
+        assert values == {"feed": [10, 12], "factor": [1.0, 1.5]}
+        assert scenarios == [
+            {"feed": 10, "factor": 1.0}, {"feed": 10, "factor": 1.5},
+            {"feed": 12, "factor": 1.0}, {"feed": 12, "factor": 1.5}
+        ]
+        with pytest.raises(ValueError, match="at least one argument"):
+            expand_grid({})
+        with pytest.raises(ValueError, match="No values given for feed"):
+            expand_grid({"feed": []})
+
+    def test_split_sweep_output(self):
+        block = split_sweep_output(np.ones((2, 1)), (2, 3))
+        assert block.shape == (2, 3)
+        split = split_sweep_output({"a": np.zeros((2, 3)), "b": np.ones((1, 3))}, (2, 3))
+        assert {key: values.shape for key, values in split.items()} == {"a": (2, 3), "b": (2, 3)}
+        assert as_row(split_sweep_output(np.arange(3), (3,))).shape == (1, 3)
+        with pytest.raises(ValueError, match="does not match"):
+            split_sweep_output(5, (2, 3))
+        with pytest.raises(ValueError, match="does not match"):
+            split_sweep_output(np.array([["a"] * 3] * 2), (2, 3))
+        with pytest.raises(ValueError, match="Only flat dicts"):
+            split_sweep_output({"a": {"b": 1}}, (2, 3))
+
+    def test_block_from_results(self):
+        valid = np.array([[True, False]])
+        block = block_from_results([[1, None]], valid)
+        assert block.dtype.kind == "i"
+        dicts = block_from_results([[{"a": 1.5}, None]], valid)
+        assert list(dicts) == ["a"]
+        objects = block_from_results([["a", None]], valid)
+        assert objects.dtype == object and objects[0, 0] == "a"
+
+    def test_assemble_blocks(self):
+        valid = np.array([[True, True], [True, False], [True, True]])
+        values = assemble_blocks([([0, 2], np.ones((2, 2), dtype=int)),
+                                  ([1], np.array([[5, 0]]))], valid)
+        np.testing.assert_array_equal(values, [[1, 1], [5, np.nan], [1, 1]])
+
+        dicts = assemble_blocks([([0, 2], {"a": np.ones((2, 2))}),
+                                 ([1], {"a": np.zeros((1, 2))})], valid)
+        np.testing.assert_array_equal(dicts["a"], [[1, 1], [0, np.nan], [1, 1]])
+
+        mixed = assemble_blocks([([0, 2], np.ones((2, 2))),
+                                 ([1], {"a": np.zeros((1, 2))})], valid)
+        assert mixed.dtype == object
+        assert mixed[1, 0] == {"a": 0.0} and mixed[1, 1] is None
+
+        empty = assemble_blocks([], np.zeros((2, 2), dtype=bool))
+        assert empty.shape == (2, 2) and np.isnan(empty).all()
+
+    def test_result(self):
+        assert self.result.shape == (2, 6)
+        assert self.result.scenario_index(feed=12, factor=1.5) == 3
+        assert self.result.get(2, feed=12, factor=1.0) == 8.0
+        assert self.result.get("2", feed=10, factor=1.5) is None
+        assert self.result.scenario(feed=10, factor=1.0) == {"1": 0.0, "2": 6.0}
+        assert self.result.array().shape == (2, 3, 2)
+        assert self.result.array()[0, 1, 1] == 3.0
+
+        with pytest.raises(ValueError, match="Give a value for each"):
+            self.result.scenario_index(feed=10)
+        with pytest.raises(ValueError, match="11 is not a value of feed"):
+            self.result.scenario_index(feed=11, factor=1.0)
+        with pytest.raises(ValueError, match="Cow 3 is not in the sweep"):
+            self.result.get(3, feed=10, factor=1.0)
+        with pytest.raises(ValueError, match="does not return dicts"):
+            self.result.array("a")
+
+    def test_result_dicts(self):
+        values = {"a": np.ones((2, 6)), "b": np.zeros((2, 6))}
+        result = SweepResult("model", "model_run", ["1", "2"], self.grid, values,
+                             self.valid, {})
+        assert result.get(1, feed=14, factor=1.5) == {"a": 1.0, "b": 0.0}
+        assert result.array("b").shape == (2, 3, 2)
+        with pytest.raises(ValueError, match="Choose a key"):
+            result.array()
+
+    def test_pickle(self):
+        self.result.get(1, feed=10, factor=1.0)
+        loaded = pickle.loads(pickle.dumps(self.result))
+        assert loaded._positions is None
+        assert loaded.get(1, feed=14, factor=1.5) == 5.0
+
+    def test_import_without_numpy(self):
+        # Annotations must not need numpy, herd imports this module unconditionally
+        code = "import sys; sys.modules['numpy'] = None; import simoolator"
+        result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True)
+        assert result.returncode == 0, result.stderr